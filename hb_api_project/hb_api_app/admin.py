@@ -1,8 +1,29 @@
 from django.contrib import admin
-from .models import Account, Transaction, TransactionCategory, PlanningTransaction
+from .models import Account, Transaction, TransactionCategory, PlanningTransaction, TransactionRollup, \
+    TransactionTombstone, BalanceCheckpoint
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """
+    Lists the rows without add, change and delete. The transactions and planned transactions are written through
+    the API, which keeps the account balance, the rollup, the balance checkpoints and the sync tombstones in step,
+    and those are only written together with them.
+    """
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 # Register your models here.
 admin.site.register(Account)
-admin.site.register(Transaction)
+admin.site.register(Transaction, ReadOnlyAdmin)
 admin.site.register(TransactionCategory)
-admin.site.register(PlanningTransaction)
+admin.site.register(PlanningTransaction, ReadOnlyAdmin)
+admin.site.register(TransactionRollup, ReadOnlyAdmin)
+admin.site.register(TransactionTombstone, ReadOnlyAdmin)
+admin.site.register(BalanceCheckpoint, ReadOnlyAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HbApiAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "hb_api_app"
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
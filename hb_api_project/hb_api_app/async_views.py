@@ -0,0 +1,225 @@
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse, HttpRequest, HttpResponseNotAllowed, Http404
+from django.utils.cache import get_conditional_response
+
+from .balance_history import RUNNING_BALANCE_FIELDS, aadd_running_balances
+from .category_cache import aget_catalog
+from .models import Account, Transaction, PlanningTransaction
+from .pagination import CursorError, page_params, akeyset_page
+from .projection import TRANSACTION_FIELDS, ProjectionError, projection_params, aprojected_data
+from .response_cache import cache_per_account, conditional_per_account
+from .responses import JsonResponse
+from .routers import route_database
+from .stats import atransaction_statistic_data, aplanned_transaction_statistic_data
+from .views import filter_transactions
+
+# Async versions of the read-only views, used instead of the views in views.py when HB_ASYNC_VIEWS is set (the
+# default of asgi.py). They return the same responses, but wait for the database without holding a worker thread
+# per request. The decorators of Django 4.1 only wrap sync views, hence the async counterparts below.
+
+
+async def request_user(request: HttpRequest):
+    """
+    Loads the user of the request without blocking the event loop.
+    """
+    if hasattr(request, 'auser'):
+        return await request.auser()
+    # Django < 5.0 only has the lazy request.user, evaluate it in a worker thread
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+def async_login_required(view):
+    """
+    Async counterpart of login_required(login_url='/auth_error'). The loaded user is stored in request.user, so
+    the view can use it without a database query.
+    """
+
+    @wraps(view)
+    async def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        request.user = await request_user(request)
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), '/auth_error')
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_require_http_methods(methods: list):
+    """
+    Async counterpart of require_http_methods.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def user_account_data(user) -> Account:
+    """
+    Async counterpart of get_object_or_404(Account, account_owner=user).
+    """
+    try:
+        return await Account.objects.aget(account_owner=user)
+    except Account.DoesNotExist:
+        raise Http404('No Account matches the given query.')
+
+
+@async_login_required
+@async_require_http_methods(["GET"])
+@route_database
+@conditional_per_account
+@cache_per_account('user_account')
+async def user_account(request: HttpRequest) -> JsonResponse:
+    """
+    Async version of views.user_account.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: A JSON response with account data.
+    :rtype: JsonResponse
+    """
+    account_data = Account.objects.filter(account_owner=request.user)
+    account_data = [row async for row in account_data.values('account_owner__username', 'account_number',
+                                                              'account_balance')]
+    return JsonResponse(status=200, data={"Account": account_data})
+
+
+@async_login_required
+@async_require_http_methods(["GET"])
+@route_database
+@conditional_per_account
+@cache_per_account('transaction_latest')
+async def transaction_latest(request: HttpRequest) -> JsonResponse:
+    """
+    Async version of views.transaction_latest.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JSON object containing the latest transactions and the cursor of the next page.
+    :rtype: JsonResponse
+    """
+    account_data = await user_account_data(request.user)
+    running_balance = request.GET.get("running_balance") == "true"
+    try:
+        limit, after = page_params(request)
+        projection = projection_params(request, TRANSACTION_FIELDS, 'transaction_category',
+                                       ('id', 'transaction_date') + (RUNNING_BALANCE_FIELDS if running_balance else ()))
+    except (CursorError, ProjectionError):
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    transactions = Transaction.objects.filter(transaction_account=account_data)
+    transactions, next_cursor = await akeyset_page(transactions, 'transaction_date', limit, after,
+                                                   *projection.query_fields)
+    if running_balance:
+        projection = await aadd_running_balances(account_data.id, transactions, projection)
+    return JsonResponse(status=200, data={**await aprojected_data('transactions', transactions, projection),
+                                          "next_cursor": next_cursor})
+
+
+@async_login_required
+@async_require_http_methods(["GET"])
+@route_database
+@conditional_per_account
+async def transaction_filter(request: HttpRequest) -> JsonResponse:
+    """
+    Async version of views.transaction_filter.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: A JSON response containing a list of filtered transactions and the cursor of the next page.
+    :rtype: JsonResponse
+    """
+    account_data = await user_account_data(request.user)
+    try:
+        limit, after = page_params(request)
+        projection = projection_params(request, TRANSACTION_FIELDS, 'transaction_category',
+                                       ('id', 'transaction_date'))
+    except (CursorError, ProjectionError):
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    transactions = filter_transactions(request, Transaction.objects.filter(transaction_account=account_data))
+    transactions, next_cursor = await akeyset_page(transactions, 'transaction_date', limit, after,
+                                                   *projection.query_fields)
+    return JsonResponse(status=200, data={**await aprojected_data('transactions', transactions, projection),
+                                          "next_cursor": next_cursor})
+
+
+@async_require_http_methods(["GET"])
+async def categories(request: HttpRequest) -> HttpResponse:
+    """
+    Async version of views.categories.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JsonResponse object with data on transaction categories
+    :rtype: HttpResponse
+    """
+    catalog = await aget_catalog()
+    etag = f'"{catalog.version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(status=200, data={'data': catalog.rows})
+    response['ETag'] = etag
+    return response
+
+
+@async_login_required
+@async_require_http_methods(["GET"])
+@route_database
+@cache_per_account('transaction_statistic')
+async def transaction_statistic(request: HttpRequest) -> JsonResponse:
+    """
+    Async version of views.transaction_statistic.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JsonResponse object with transaction statistics.
+    :rtype: JsonResponse
+    """
+    account_data = await user_account_data(request.user)
+
+    transaction_start_date = request.GET.get("transaction_start_date")
+    transaction_end_date = request.GET.get("transaction_end_date")
+
+    if transaction_start_date and transaction_end_date:
+        transaction_start_date = datetime.strptime(transaction_start_date, '%Y-%m-%d').date()
+        transaction_end_date = datetime.strptime(transaction_end_date, '%Y-%m-%d').date()
+    else:
+        return JsonResponse(status=400, data={"error": "Bad request"})
+
+    statistic_data = await atransaction_statistic_data(account_data, transaction_start_date, transaction_end_date)
+    return JsonResponse(status=200, data={"statistic_data": statistic_data})
+
+
+@async_login_required
+@async_require_http_methods(["GET"])
+@route_database
+@cache_per_account('planned_transaction_statistic')
+async def planned_transaction_statistic(request: HttpRequest) -> JsonResponse:
+    """
+    Async version of views.planned_transaction_statistic.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JsonResponse object with transaction statistics.
+    :rtype: JsonResponse
+    """
+    account_data = await user_account_data(request.user)
+    transactions = PlanningTransaction.objects.filter(transaction_account_plan=account_data)
+
+    transaction_start_date = request.GET.get("transaction_start_date")
+    transaction_end_date = request.GET.get("transaction_end_date")
+
+    if transaction_start_date and transaction_end_date:
+        transaction_start_date = datetime.strptime(transaction_start_date, '%Y-%m-%d').date()
+        transaction_end_date = datetime.strptime(transaction_end_date, '%Y-%m-%d').date()
+    else:
+        return JsonResponse(status=400, data={"error": "Bad request"})
+
+    statistic_data = await aplanned_transaction_statistic_data(transactions, transaction_start_date,
+                                                               transaction_end_date)
+    return JsonResponse(status=200, data={"statistic_data": statistic_data})
@@ -0,0 +1,81 @@
+from decimal import Decimal
+
+from django.db.models import F, Sum, Case, When, DecimalField, QuerySet
+from django.utils import timezone
+
+from .models import Account, TransactionRollup
+
+
+def balance_delta(transaction_type: int, transaction_sum: Decimal) -> Decimal:
+    """
+    Returns the change of the account balance caused by a transaction.
+    :param transaction_type: 0 - Expense, 1 - Income.
+    :type transaction_type: int
+    :param transaction_sum: The positive transaction sum.
+    :type transaction_sum: Decimal
+    :return: The signed balance change.
+    :rtype: Decimal
+    """
+    return transaction_sum if transaction_type == 1 else -transaction_sum
+
+
+def apply_balance_delta(account_id: int, delta: Decimal) -> None:
+    """
+    Changes the account balance with an atomic UPDATE ... SET account_balance = account_balance + delta, so
+    concurrent requests can not overwrite each other's changes and no other column is written. The same UPDATE
+    increments the account version, see touch_account.
+    :param account_id: The id of the account.
+    :type account_id: int
+    :param delta: The signed balance change.
+    :type delta: Decimal
+    """
+    Account.objects.filter(pk=account_id).update(account_balance=F('account_balance') + delta,
+                                                 account_version=F('account_version') + 1,
+                                                 account_modified=timezone.now())
+
+
+def touch_account(account_id: int) -> None:
+    """
+    Increments the version of an account and sets its modification time, for writes that do not change the
+    balance. Call it in the database transaction of the write.
+    :param account_id: The id of the account.
+    :type account_id: int
+    """
+    Account.objects.filter(pk=account_id).update(account_version=F('account_version') + 1,
+                                                 account_modified=timezone.now())
+
+
+def touch_accounts(accounts: QuerySet) -> int:
+    """
+    Increments the version of every account of a queryset with one UPDATE, see touch_account.
+    :param accounts: The accounts.
+    :type accounts: QuerySet
+    :return: Number of updated accounts.
+    :rtype: int
+    """
+    return accounts.update(account_version=F('account_version') + 1, account_modified=timezone.now())
+
+
+def recalculate_balances(accounts: list = None) -> int:
+    """
+    Sets account balances to the income minus the expense of their transactions, read from the monthly rollup with
+    one grouped query. The rollup has to be up to date, e.g. after rebuild_rollup.
+    :param accounts: The accounts to recalculate, every account if None.
+    :type accounts: list
+    :return: Number of updated accounts.
+    :rtype: int
+    """
+    if accounts is None:
+        accounts = list(Account.objects.all())
+    output_field = DecimalField(max_digits=20, decimal_places=2)
+    rows = TransactionRollup.objects.filter(rollup_account__in=accounts).order_by().values(
+        'rollup_account_id').annotate(balance=Sum(Case(When(rollup_type=1, then='rollup_sum'),
+                                                       default=-F('rollup_sum'), output_field=output_field)))
+    balances = {row['rollup_account_id']: row['balance'] for row in rows}
+    modified = timezone.now()
+    for account in accounts:
+        account.account_balance = balances.get(account.pk, Decimal(0))
+        account.account_version = F('account_version') + 1
+        account.account_modified = modified
+    return Account.objects.bulk_update(accounts, ['account_balance', 'account_version', 'account_modified'],
+                                       batch_size=1000)
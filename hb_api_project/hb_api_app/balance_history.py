@@ -0,0 +1,99 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import F, Sum, Case, When, QuerySet, DecimalField
+
+from .balance import balance_delta
+from .models import Transaction
+from .projection import Projection
+from .rollup import month_start, previous_checkpoint
+
+# The fields transaction_latest reads for the running_balance column
+RUNNING_BALANCE_FIELDS = ('transaction_type', 'transaction_sum')
+ZERO = Decimal('0.00')
+
+
+def month_transactions(account_id: int, day: date, last_id: int = None) -> QuerySet:
+    """
+    Returns the transactions of an account from the first day of the month of the given date up to the date, on the
+    date itself only up to the transaction last_id when it is given.
+    """
+    transactions = Transaction.objects.filter(transaction_account_id=account_id,
+                                              transaction_date__range=[month_start(day), day])
+    if last_id is not None:
+        transactions = transactions.exclude(transaction_date=day, id__gt=last_id)
+    return transactions
+
+
+def net_sum() -> Sum:
+    return Sum(Case(When(transaction_type=1, then='transaction_sum'), default=-F('transaction_sum'),
+                    output_field=DecimalField(max_digits=20, decimal_places=2)))
+
+
+def balance_on(account_id: int, day: date, last_id: int = None) -> Decimal:
+    """
+    Returns the balance of an account at the end of a day: the checkpoint of the previous month plus the
+    transactions of the month up to the day, so it costs two indexed queries over at most one month of rows.
+    Like recalculate_balances the balance is the income minus the expense of the transactions.
+    :param account_id: The id of the account.
+    :type account_id: int
+    :param day: The date.
+    :type day: date
+    :param last_id: Count the transactions of the day only up to this id (the order of transaction_latest).
+    :type last_id: int
+    :return: The balance.
+    :rtype: Decimal
+    """
+    checkpoint = previous_checkpoint(account_id, month_start(day)).first()
+    delta = month_transactions(account_id, day, last_id).aggregate(delta=net_sum())['delta']
+    return (checkpoint or ZERO) + (delta or ZERO)
+
+
+async def abalance_on(account_id: int, day: date, last_id: int = None) -> Decimal:
+    """
+    Async version of balance_on.
+    :rtype: Decimal
+    """
+    checkpoint = await previous_checkpoint(account_id, month_start(day)).afirst()
+    delta = (await month_transactions(account_id, day, last_id).aaggregate(delta=net_sum()))['delta']
+    return (checkpoint or ZERO) + (delta or ZERO)
+
+
+def set_running_balances(rows: list, balance: Decimal, projection: Projection) -> Projection:
+    """
+    Adds the balance after every transaction to the rows of a transaction_latest page, ordered newest first and
+    read with RUNNING_BALANCE_FIELDS. The balance of the first row is given, the next ones are computed backwards.
+    :return: The projection with the running_balance column.
+    :rtype: Projection
+    """
+    for row in rows:
+        row['running_balance'] = balance
+        balance -= balance_delta(row['transaction_type'], row['transaction_sum'])
+    return projection._replace(fields=projection.fields + ('running_balance',),
+                               query_fields=projection.query_fields + ('running_balance',))
+
+
+def add_running_balances(account_id: int, rows: list, projection: Projection) -> Projection:
+    """
+    Adds the running_balance column to a page of transaction_latest, see set_running_balances. Costs the two
+    queries of balance_on for the first row.
+    :param account_id: The id of the account.
+    :type account_id: int
+    :param rows: The rows of the page.
+    :type rows: list
+    :param projection: The projection of the request.
+    :type projection: Projection
+    :return: The projection with the running_balance column.
+    :rtype: Projection
+    """
+    balance = balance_on(account_id, rows[0]['transaction_date'], rows[0]['id']) if rows else ZERO
+    return set_running_balances(rows, balance, projection)
+
+
+async def aadd_running_balances(account_id: int, rows: list, projection: Projection) -> Projection:
+    """
+    Async version of add_running_balances.
+    :rtype: Projection
+    """
+    balance = await abalance_on(account_id, rows[0]['transaction_date'], rows[0]['id']) if rows else ZERO
+    return set_running_balances(rows, balance, projection)
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import TransactionCategory
+
+CategoryCatalog = namedtuple('CategoryCatalog', ['rows', 'by_name', 'by_id', 'version', 'loaded_at'])
+
+_lock = threading.Lock()
+_catalog = None
+
+
+def load_catalog() -> CategoryCatalog:
+    """
+    Reads all categories with one query. The version is a hash of the catalog content, so every process computes
+    the same version for the same categories.
+    :return: The category catalog.
+    :rtype: CategoryCatalog
+    """
+    rows = list(TransactionCategory.objects.order_by('id').values('id', 'category_type', 'category_name'))
+    by_name = {}
+    for row in rows:
+        # With duplicate names the oldest category wins
+        by_name.setdefault(row['category_name'], row['id'])
+    by_id = {row['id']: row['category_name'] for row in rows}
+    version = hashlib.sha1(json.dumps(rows).encode()).hexdigest()[:16]
+    return CategoryCatalog([{'category_type': row['category_type'], 'category_name': row['category_name']}
+                            for row in rows], by_name, by_id, version, time.monotonic())
+
+
+def is_fresh(catalog: CategoryCatalog) -> bool:
+    return catalog is not None and time.monotonic() - catalog.loaded_at <= getattr(
+        settings, 'HB_CATEGORY_CACHE_TIMEOUT', 300)
+
+
+def get_catalog() -> CategoryCatalog:
+    """
+    Returns the cached category catalog, loading it on first use, after an invalidation or when it is older than
+    HB_CATEGORY_CACHE_TIMEOUT seconds (changes made by other processes are only seen then).
+    :return: The category catalog.
+    :rtype: CategoryCatalog
+    """
+    global _catalog
+    catalog = _catalog
+    if not is_fresh(catalog):
+        with _lock:
+            if _catalog is catalog:
+                _catalog = load_catalog()
+            catalog = _catalog
+    return catalog
+
+
+async def aget_catalog() -> CategoryCatalog:
+    """
+    Async version of get_catalog, the catalog is only loaded in a worker thread when the cached one is stale.
+    :rtype: CategoryCatalog
+    """
+    catalog = _catalog
+    if is_fresh(catalog):
+        return catalog
+    return await sync_to_async(get_catalog)()
+
+
+def invalidate_catalog(**kwargs) -> None:
+    """
+    Drops the cached catalog. Connected to post_save and post_delete of TransactionCategory.
+    """
+    global _catalog
+    with _lock:
+        _catalog = None
+
+
+def reload_catalog(catalog: CategoryCatalog) -> CategoryCatalog:
+    """
+    Reloads the catalog after a lookup missed it, in case the category was created by another process. A catalog
+    loaded less than HB_CATEGORY_RELOAD_INTERVAL seconds ago is returned as it is, so requests with unknown names or
+    ids cost at most one reload per interval instead of one full catalog query each.
+    :param catalog: The catalog the lookup missed.
+    :type catalog: CategoryCatalog
+    :return: The reloaded catalog, or the given one if it is too recent.
+    :rtype: CategoryCatalog
+    """
+    global _catalog
+    if time.monotonic() - catalog.loaded_at < getattr(settings, 'HB_CATEGORY_RELOAD_INTERVAL', 5):
+        return catalog
+    with _lock:
+        # Another thread may have reloaded it while this one waited for the lock
+        if _catalog is catalog or _catalog is None:
+            _catalog = load_catalog()
+        return _catalog
+
+
+async def areload_catalog(catalog: CategoryCatalog) -> CategoryCatalog:
+    """
+    Async version of reload_catalog, the catalog is only loaded in a worker thread when it is not too recent.
+    :rtype: CategoryCatalog
+    """
+    if time.monotonic() - catalog.loaded_at < getattr(settings, 'HB_CATEGORY_RELOAD_INTERVAL', 5):
+        return catalog
+    return await sync_to_async(reload_catalog)(catalog)
+
+
+def category_id(category_name: str) -> int:
+    """
+    Returns the id of the category with the given name. An unknown name reloads the catalog once, see
+    reload_catalog.
+    :param category_name: The category name.
+    :type category_name: str
+    :return: The category id.
+    :rtype: int
+    :raises KeyError: If there is no such category.
+    """
+    catalog = get_catalog()
+    if category_name not in catalog.by_name:
+        catalog = reload_catalog(catalog)
+    return catalog.by_name[category_name]
+
+
+def category_ids(category_names: set) -> dict:
+    """
+    Returns the name to id mapping of the catalog, reloaded once if any of the given names is unknown.
+    :param category_names: The names that are about to be looked up.
+    :type category_names: set
+    :return: A dict mapping category names to ids.
+    :rtype: dict
+    """
+    catalog = get_catalog()
+    if not category_names <= catalog.by_name.keys():
+        catalog = reload_catalog(catalog)
+    return catalog.by_name
+
+
+def category_names(ids: set) -> dict:
+    """
+    Returns the names of the given category ids, the catalog is reloaded once if any of them is unknown.
+    :param ids: The category ids.
+    :type ids: set
+    :return: A dict mapping the ids to category names, None for ids without a category.
+    :rtype: dict
+    """
+    catalog = get_catalog()
+    if not ids <= catalog.by_id.keys():
+        catalog = reload_catalog(catalog)
+    return {category: catalog.by_id.get(category) for category in ids}
+
+
+async def acategory_names(ids: set) -> dict:
+    """
+    Async version of category_names.
+    :rtype: dict
+    """
+    catalog = await aget_catalog()
+    if not ids <= catalog.by_id.keys():
+        catalog = await areload_catalog(catalog)
+    return {category: catalog.by_id.get(category) for category in ids}
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Cache backends whose entries are only visible to the process that wrote them
+PROCESS_LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def cache_backend(alias: str) -> str:
+    return settings.CACHES.get(alias, {}).get('BACKEND', '')
+
+
+@register()
+def check_replica_sticky_cache(app_configs, **kwargs) -> list:
+    """
+    Fails when a read replica is configured and the sticky flags of routers.use_replica are kept in a cache that is
+    not shared by all worker processes (or in DummyCache, which keeps nothing): a write served by one process would
+    not send the next reads of the user, served by another process, to the primary.
+    """
+    alias = getattr(settings, 'HB_RESPONSE_CACHE_ALIAS', 'default')
+    backend = cache_backend(alias)
+    if getattr(settings, 'HB_REPLICA_DATABASE', None) and (
+            backend in PROCESS_LOCAL_BACKENDS or backend == 'django.core.cache.backends.dummy.DummyCache'):
+        return [Error(f'HB_REPLICA_DATABASE is set, but the sticky flags in the cache {alias!r} use {backend}.',
+                      hint='Use a cache shared by all worker processes (Redis, Memcached, database or file based).',
+                      id='hb_api_app.E002')]
+    return []
@@ -0,0 +1,26 @@
+from django.conf import settings
+
+# Defaults of HB_SQLITE_PRAGMAS. WAL lets readers work while one writer commits, synchronous=NORMAL is safe in WAL
+# mode and syncs only at checkpoints, busy_timeout (ms) makes a writer wait for the lock instead of failing with
+# "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+
+def configure_connection(connection) -> None:
+    """
+    Applies the HB_SQLITE_PRAGMAS setting to a new SQLite connection, other databases are left as they are.
+    Connected to connection_created in signals.py.
+    :param connection: The new database connection.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'HB_SQLITE_PRAGMAS', SQLITE_PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
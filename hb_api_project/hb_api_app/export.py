@@ -0,0 +1,53 @@
+import csv
+
+from .responses import json_encoder
+
+EXPORT_FIELDS = ('id', 'transaction_date', 'transaction_type', 'transaction_category__category_name',
+                 'transaction_sum', 'transaction_comment')
+
+# Rows encoded per yielded chunk, so the response is not sent one tiny write per row
+ROWS_PER_CHUNK = 500
+
+
+class LineBuffer:
+    """A write-only file object that returns the written value, used to let csv.writer encode single rows."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_csv(rows):
+    """
+    Encodes rows of EXPORT_FIELDS values as CSV with a header line.
+    :param rows: An iterable of value tuples.
+    """
+    writer = csv.writer(LineBuffer())
+    yield writer.writerow(EXPORT_FIELDS)
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def iter_ndjson(rows):
+    """
+    Encodes rows of EXPORT_FIELDS values as newline delimited JSON objects, with the same keys and value format as
+    the transaction_filter response.
+    :param rows: An iterable of value tuples.
+    """
+    encode = json_encoder()
+    chunk = []
+    for row in rows:
+        chunk.append(encode(dict(zip(EXPORT_FIELDS, row))))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield b'\n'.join(chunk) + b'\n'
+            chunk = []
+    if chunk:
+        yield b'\n'.join(chunk) + b'\n'
+
+
+EXPORT_FORMATS = {'csv': (iter_csv, 'text/csv'), 'ndjson': (iter_ndjson, 'application/x-ndjson')}
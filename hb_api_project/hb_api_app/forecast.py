@@ -0,0 +1,199 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.db.models.functions import ExtractIsoWeekDay
+from django.http import HttpRequest
+from django.utils import timezone
+
+from .category_cache import category_names
+from .models import Account, Transaction, PlanningTransaction
+from .recurrence import DAILY, WEEKLY, STEP_DAYS, in_window, index_range, iter_occurrences
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_DAYS = 90
+MAX_DAYS = 1830
+HISTORY_DAYS = 365
+MAX_HISTORY_DAYS = 3660
+TYPE_NAMES = {0: 'Expense', 1: 'Income'}
+ZERO = Decimal('0.00')
+
+
+class ForecastError(ValueError):
+    """Raised when the days or history parameter of a forecast request is invalid."""
+
+
+def forecast_params(request: HttpRequest) -> tuple:
+    """
+    Reads the days (length of the forecast, at most HB_FORECAST_MAX_DAYS) and history (days of transactions the
+    weekday patterns are computed from, at most HB_FORECAST_MAX_HISTORY_DAYS) parameters of a forecast request.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: The days and history.
+    :rtype: tuple
+    :raises ForecastError: If a parameter is not a positive number or is too large.
+    """
+    try:
+        days = int(request.GET.get('days', DEFAULT_DAYS))
+        history = int(request.GET.get('history', getattr(settings, 'HB_FORECAST_HISTORY_DAYS', HISTORY_DAYS)))
+    except ValueError as e:
+        raise ForecastError('Invalid parameter') from e
+    if (not 1 <= days <= getattr(settings, 'HB_FORECAST_MAX_DAYS', MAX_DAYS) or
+            not 1 <= history <= getattr(settings, 'HB_FORECAST_MAX_HISTORY_DAYS', MAX_HISTORY_DAYS)):
+        raise ForecastError('Invalid parameter')
+    return days, history
+
+
+def signed(transaction_type: int, amount) -> float:
+    return float(amount) if transaction_type == 1 else -float(amount)
+
+
+def money(value: float) -> Decimal:
+    """
+    Converts an amount computed in floats to a Decimal rounded to cents, without a negative zero.
+    """
+    return Decimal(f'{value:.2f}') or ZERO
+
+
+def planned_buckets(rows, start: date, days: int) -> tuple:
+    """
+    Places the planned transactions of the forecast window into day buckets (offsets from start). Daily and weekly
+    schedules become slices, so they are added to the buckets as one array operation however many occurrences they
+    have, single planned transactions and monthly occurrences become (offset, amount) points.
+    :param rows: PlanningTransaction value rows selected with in_window.
+    :param start: The first day of the forecast.
+    :type start: date
+    :param days: The number of days.
+    :type days: int
+    :return: The list of (slice, amount) pairs, the list of offsets and the list of their amounts.
+    :rtype: tuple
+    """
+    end = start + timedelta(days=days - 1)
+    progressions, offsets, amounts = [], [], []
+    for row in rows:
+        first_day = row['transaction_date_plan']
+        recurrence = row['transaction_recurrence_plan']
+        amount = signed(row['transaction_type_plan'], row['transaction_sum_plan'])
+        if recurrence in (DAILY, WEEKLY):
+            indexes = index_range(first_day, recurrence, row['transaction_recurrence_end_plan'], start, end)
+            if indexes:
+                step = STEP_DAYS[recurrence]
+                offset = (first_day - start).days
+                progressions.append((slice(offset + step * indexes.start, offset + step * indexes.stop, step),
+                                     amount))
+            continue
+        for day in iter_occurrences(first_day, recurrence, row['transaction_recurrence_end_plan'], start, end):
+            offsets.append((day - start).days)
+            amounts.append(amount)
+    return progressions, offsets, amounts
+
+
+def weekday_patterns(account: Account, today: date, history: int, excluded: set) -> dict:
+    """
+    Returns the average amount per weekday of every (type, category id) pair over the history window that ends
+    today, computed with one grouped query. The pairs in excluded (the categories of the planned transactions of the
+    forecast) are left out, the plan replaces their history.
+    :return: Maps (type, category id) to the seven signed daily averages, Monday first.
+    :rtype: dict
+    """
+    history_start = today - timedelta(days=history - 1)
+    # Number of Mondays, Tuesdays, ... in the history window
+    weekday_counts = [history // 7 + ((weekday - history_start.weekday()) % 7 < history % 7) for weekday in range(7)]
+    rows = Transaction.objects.filter(
+        transaction_account=account, transaction_date__range=[history_start, today]
+    ).order_by().values(weekday=ExtractIsoWeekDay('transaction_date'), type=F('transaction_type'),
+                        category=F('transaction_category')).annotate(total=Sum('transaction_sum'))
+    patterns = {}
+    for row in rows:
+        if (row['type'], row['category']) in excluded:
+            continue
+        weekday = row['weekday'] - 1
+        patterns.setdefault((row['type'], row['category']), [0.0] * 7)[weekday] += (
+            signed(row['type'], row['total']) / weekday_counts[weekday])
+    return patterns
+
+
+def project(balance: float, days: int, first_weekday: int, profile: list, progressions: list, offsets: list,
+            amounts: list) -> tuple:
+    """
+    Computes the planned and expected amounts and the balance of every day with array operations over the day
+    buckets, with NumPy when it is installed and the same steps in pure Python otherwise.
+    :param balance: The current balance.
+    :type balance: float
+    :param days: The number of days.
+    :type days: int
+    :param first_weekday: The weekday of the first day, 0 for Monday.
+    :type first_weekday: int
+    :param profile: The expected amount of every weekday, Monday first.
+    :type profile: list
+    :return: The planned, expected and balance lists, rounded to cents.
+    :rtype: tuple
+    """
+    if numpy is not None:
+        planned = numpy.zeros(days)
+        for part, amount in progressions:
+            planned[part] += amount
+        numpy.add.at(planned, numpy.asarray(offsets, dtype=numpy.intp), numpy.asarray(amounts, dtype=float))
+        expected = numpy.resize(numpy.roll(numpy.asarray(profile, dtype=float), -first_weekday), days)
+        balances = balance + numpy.cumsum(planned + expected)
+        return tuple(column.round(2).tolist() for column in (planned, expected, balances))
+
+    planned = [0.0] * days
+    for part, amount in progressions:
+        for index in range(days)[part]:
+            planned[index] += amount
+    for offset, amount in zip(offsets, amounts):
+        planned[offset] += amount
+    week = profile[first_weekday:] + profile[:first_weekday]
+    expected = [week[index % 7] for index in range(days)]
+    balances = list(accumulate((p + e for p, e in zip(planned, expected)), initial=balance))[1:]
+    return tuple([round(value, 2) for value in column] for column in (planned, expected, balances))
+
+
+def forecast_data(account: Account, days: int, history: int) -> dict:
+    """
+    Projects the daily balance of an account from tomorrow on: the current balance plus the planned transactions
+    (with every occurrence of the schedules) plus the average amount of the other categories on the same weekday in
+    the history window. Costs two queries, the work per day is done with array operations.
+    :param account: The account of the user.
+    :type account: Account
+    :param days: The number of forecast days.
+    :type days: int
+    :param history: The number of days of transaction history, ending today.
+    :type history: int
+    :return: The forecast with one list entry per day and the weekday patterns, the amounts as Decimal.
+    :rtype: dict
+    """
+    today = timezone.localdate()
+    start = today + timedelta(days=1)
+    end = start + timedelta(days=days - 1)
+    rows = list(PlanningTransaction.objects.filter(
+        in_window(start, end), transaction_account_plan=account
+    ).values('transaction_date_plan', 'transaction_recurrence_plan', 'transaction_recurrence_end_plan',
+             'transaction_type_plan', 'transaction_category_plan', 'transaction_sum_plan'))
+    progressions, offsets, amounts = planned_buckets(rows, start, days)
+    excluded = {(row['transaction_type_plan'], row['transaction_category_plan']) for row in rows}
+    patterns = weekday_patterns(account, today, history, excluded)
+    profile = [sum(pattern[weekday] for pattern in patterns.values()) for weekday in range(7)]
+
+    planned, expected, balances = project(float(account.account_balance), days, start.weekday(), profile,
+                                          progressions, offsets, amounts)
+    names = category_names({category for _, category in patterns})
+    return {
+        'start_date': start,
+        'end_date': end,
+        'current_balance': account.account_balance,
+        'planned': [money(value) for value in planned],
+        'expected': [money(value) for value in expected],
+        'balance': [money(value) for value in balances],
+        'patterns': sorted(({'category': names[category], 'type': TYPE_NAMES[transaction_type],
+                             'weekdays': [money(value) for value in pattern]}
+                            for (transaction_type, category), pattern in patterns.items()),
+                           key=lambda row: (row['type'], row['category'] or '')),
+    }
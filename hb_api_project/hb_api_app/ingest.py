@@ -0,0 +1,97 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+
+from .balance import balance_delta, apply_balance_delta
+from .models import Account, Transaction
+from .rollup import apply_rollup_deltas, month_start
+
+CENT = Decimal('0.01')
+# The range of Transaction.transaction_sum: its MinValueValidator and max_digits=10 with two decimal places
+MAX_SUM = Decimal('99999999.99')
+
+
+def parse_date(value: str) -> date:
+    """
+    Parses a YYYY-MM-DD date like datetime.strptime(value, '%Y-%m-%d'), using the much faster date.fromisoformat
+    for zero padded values.
+    """
+    if isinstance(value, str) and len(value) == 10 and value[4] == value[7] == '-':
+        return date.fromisoformat(value)
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def parse_transaction_item(item: dict, category_ids: dict) -> dict:
+    """
+    Validates one transaction of a bulk request or an import and converts it to Transaction field values.
+    :param item: The transaction data, with the same keys as in transaction_add.
+    :type item: dict
+    :param category_ids: A dict mapping category names to category ids.
+    :type category_ids: dict
+    :return: The Transaction field values.
+    :rtype: dict
+    :raises ValueError: With a description of the first invalid field.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Transaction must be an object")
+    missing = [key for key in ('transaction_type', 'transaction_category', 'transaction_date', 'transaction_sum',
+                               'transaction_comment') if key not in item]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    try:
+        # bool is an int and int() truncates floats, both would pass as a type
+        transaction_type = None if isinstance(item['transaction_type'], (bool, float)) else \
+            int(item['transaction_type'])
+    except (TypeError, ValueError):
+        transaction_type = None
+    if transaction_type not in (0, 1):
+        raise ValueError("Invalid transaction_type")
+    category_id = category_ids.get(str(item['transaction_category']))
+    if category_id is None:
+        raise ValueError("Unknown transaction_category")
+    try:
+        transaction_date = parse_date(item['transaction_date'])
+    except (TypeError, ValueError):
+        raise ValueError("Invalid transaction_date")
+    try:
+        # A JSON float may already be rounded, the sum has to be sent as a string or an integer
+        if isinstance(item['transaction_sum'], (bool, float)):
+            raise ArithmeticError
+        transaction_sum = abs(Decimal(str(item['transaction_sum'])))
+        # Comparing NaN raises InvalidOperation, more than two decimal places would be rounded by the field
+        if not CENT <= transaction_sum <= MAX_SUM or transaction_sum != transaction_sum.quantize(CENT):
+            transaction_sum = None
+    except ArithmeticError:
+        transaction_sum = None
+    if transaction_sum is None:
+        raise ValueError("Invalid transaction_sum")
+    return dict(transaction_type=transaction_type, transaction_category_id=category_id,
+                transaction_date=transaction_date, transaction_sum=transaction_sum,
+                transaction_comment=str(item['transaction_comment']))
+
+
+def save_transactions(account: Account, transactions: list, batch_size: int = 1000) -> None:
+    """
+    Inserts a list of transactions of one account with bulk_create and applies the net balance change and the
+    rollup changes once, all in one database transaction.
+    :param account: The account the transactions belong to.
+    :type account: Account
+    :param transactions: Unsaved Transaction objects.
+    :type transactions: list
+    :param batch_size: Number of rows per INSERT.
+    :type batch_size: int
+    """
+    balance = Decimal(0)
+    rollup_deltas = {}
+    for transaction in transactions:
+        balance += balance_delta(transaction.transaction_type, transaction.transaction_sum)
+        key = (month_start(transaction.transaction_date), transaction.transaction_type,
+               transaction.transaction_category_id)
+        rollup_sum, rollup_count = rollup_deltas.get(key, (Decimal(0), 0))
+        rollup_deltas[key] = (rollup_sum + transaction.transaction_sum, rollup_count + 1)
+
+    with db_transaction.atomic():
+        Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+        apply_balance_delta(account.id, balance)
+        apply_rollup_deltas(account.id, rollup_deltas)
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+class RequestMetrics:
+    """Query count and timings of one request, collected while the request is handled."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+
+
+_current = ContextVar('hb_request_metrics', default=None)
+
+
+def start_request() -> tuple:
+    """
+    Starts collecting metrics for the current request (or task, under ASGI).
+    :return: The metrics object and the token to pass to finish_request.
+    :rtype: tuple
+    """
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token) -> None:
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper that counts the queries and their time for the current request. The metrics object is
+    looked up in a context variable, so queries of async views run through sync_to_async are counted as well.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.sql_time += time.perf_counter() - started
+
+
+def install_query_wrapper(sender, connection, **kwargs) -> None:
+    """
+    connection_created receiver that adds record_query to every new database connection.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_serialization(seconds: float) -> None:
+    """
+    Adds the time spent encoding a response body to the metrics of the current request.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.serialize_time += seconds
+
+
+class RouteHistograms:
+    """Keeps the most recent samples of every route and computes latency percentiles from them."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=self.size))
+
+    def add(self, route: str, total: float, sql: float, queries: int) -> None:
+        with self.lock:
+            self.samples[route].append((total, sql, queries))
+
+    def summary(self) -> dict:
+        """
+        Returns the sample count and the p50, p95 and p99 of the total time, the SQL time (both in milliseconds) and
+        the query count for every route.
+        :rtype: dict
+        """
+        with self.lock:
+            samples = {route: list(values) for route, values in self.samples.items()}
+        result = {}
+        for route, values in samples.items():
+            result[route] = {'count': len(values)}
+            for index, name in enumerate(('total_ms', 'sql_ms', 'queries')):
+                ordered = sorted(value[index] for value in values)
+                result[route][name] = {f'p{p}': round(percentile(ordered, p), 3) for p in (50, 95, 99)}
+        return result
+
+    def clear(self) -> None:
+        with self.lock:
+            self.samples.clear()
+
+
+def percentile(ordered: list, p: int) -> float:
+    """
+    Returns the p-th percentile of a sorted list with the nearest-rank method.
+    """
+    rank = max(1, -(-p * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+histograms = RouteHistograms(getattr(settings, 'HB_INSTRUMENTATION_SAMPLES', 1000))
@@ -0,0 +1,239 @@
+import json
+import random
+import statistics
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from hb_api_app import urls
+from hb_api_app.instrumentation import percentile
+from hb_api_app.models import Transaction, PlanningTransaction
+from hb_api_app.rollup import rebuild_rollup
+from hb_api_app.seeding import (DEFAULT_CATEGORIES, seed_categories, seed_accounts, iter_transactions,
+                                iter_planning_transactions, bulk_insert)
+
+PASSWORD = 'bench-password-123'
+
+
+class Command(BaseCommand):
+    help = ("Seeds a throwaway test database, drives every route of hb_api_app through the Django test client and "
+            "reports throughput and latency percentiles. Saves the results as a JSON baseline and compares them with "
+            "an earlier baseline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5, help='Number of seeded users.')
+        parser.add_argument('--transactions', type=int, default=20000, help='Transactions per user.')
+        parser.add_argument('--categories', type=int, default=20, help='Number of categories.')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per route.')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per route.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the generated data.')
+        parser.add_argument('--with-cache', action='store_true',
+                            help='Keep the per-account response cache enabled (disabled by default, so the read '
+                                 'routes measure the database work).')
+        parser.add_argument('--output', help='Write the results as a JSON baseline to this file.')
+        parser.add_argument('--compare', help='Compare the results with the JSON baseline in this file.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative p95 latency increase per route in --compare mode.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        setup_test_environment()
+        try:
+            overrides = {}
+            if not options['with_cache']:
+                overrides = dict(CACHES={**settings.CACHES, 'benchmark': {
+                    'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}, HB_RESPONSE_CACHE_ALIAS='benchmark')
+            with override_settings(**overrides):
+                self.seed(options)
+                results = self.run(options)
+        finally:
+            teardown_test_environment()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {'config': {key: options[key] for key in ('users', 'transactions', 'categories', 'requests',
+                                                            'seed', 'with_cache')},
+                  'routes': results}
+        self.print_results(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline written to {options['output']}")
+        if baseline is not None:
+            regressions = self.regressions(results, baseline['routes'], options['threshold'])
+            if regressions:
+                raise CommandError('Regressed routes: ' + ', '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No route regressed past the threshold.'))
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        names = DEFAULT_CATEGORIES + [(i % 2, f'category_{i}') for i in range(options['categories'])]
+        self.categories = seed_categories(names[:options['categories']])
+        accounts = seed_accounts(options['users'], prefix='bench_user')
+        for account in accounts:
+            bulk_insert(Transaction, iter_transactions(account, self.categories, options['transactions'], rng,
+                                                       date(2020, 1, 1), 1460))
+            bulk_insert(PlanningTransaction, iter_planning_transactions(
+                account, self.categories, options['transactions'] // 20, rng, date(2024, 1, 1), 365))
+        rebuild_rollup()
+        self.account = accounts[0]
+        self.user = self.account.account_owner
+        self.user.set_password(PASSWORD)
+        self.user.save()
+
+    def deletable_ids(self, options) -> tuple:
+        """
+        Inserts one transaction and one planned transaction per request of the delete routes, so they never run out
+        of rows whatever the size of the seeded data, and returns their ids.
+        :return: The transaction ids and the planned transaction ids.
+        :rtype: tuple
+        """
+        count = options['warmup'] + options['requests']
+        rng = random.Random(options['seed'])
+        last_transaction = Transaction.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        last_planned = PlanningTransaction.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        bulk_insert(Transaction, iter_transactions(self.account, self.categories, count, rng, date(2020, 1, 1), 1460))
+        bulk_insert(PlanningTransaction, iter_planning_transactions(self.account, self.categories, count, rng,
+                                                                   date(2024, 1, 1), 365))
+        rebuild_rollup(self.account)
+        return (list(Transaction.objects.filter(id__gt=last_transaction).values_list('id', flat=True)),
+                list(PlanningTransaction.objects.filter(id__gt=last_planned).values_list('id', flat=True)))
+
+    def scenarios(self, options) -> dict:
+        """
+        Returns a function per route name that sends one request with the given client and iteration number.
+        """
+        category = self.categories[0].category_name
+        item = {'transaction_type': '0', 'transaction_category': category, 'transaction_date': '2023-06-15',
+                'transaction_sum': '12.34', 'transaction_comment': 'benchmark'}
+        period = {'transaction_start_date': '2022-01-15', 'transaction_end_date': '2023-03-10'}
+        transaction_ids, planned_ids = self.deletable_ids(options)
+        csv_statement = 'date,amount,category,comment\n' + ''.join(
+            f'2023-07-{1 + i % 28:02d},-{i + 1}.00,{category},import {i}\n' for i in range(100))
+
+        def login(client, i):
+            return client.post('/api/user/login', {'username': self.user.username, 'password': PASSWORD},
+                               content_type='application/json')
+
+        def logout(client, i):
+            response = client.get('/api/user/logout')
+            client.force_login(self.user)
+            return response
+
+        def export(client, i):
+            response = client.get('/api/transaction/export', {**period, 'format': 'ndjson'})
+            # the rows are produced while the body is consumed, so it is part of the measured time
+            b''.join(response.streaming_content)
+            return response
+
+        def upload(client, i):
+            return client.post('/api/transaction/import', {'file': SimpleUploadedFile(
+                'statement.csv', csv_statement.replace('import', f'import {i}').encode())})
+
+        return {
+            'index': lambda client, i: client.get('/'),
+            'auth_error': lambda client, i: client.get('/auth_error'),
+            'user_login': login,
+            'user_logout': logout,
+            'user_register': lambda client, i: client.post('/api/user/register', {
+                'username': f'bench_register_{i}', 'password': PASSWORD, 'email': 'bench@example.com'},
+                content_type='application/json'),
+            'user_account': lambda client, i: client.get('/api/user/account'),
+            'account_balance': lambda client, i: client.get('/api/user/account/balance', {'date': '2023-06-15'}),
+            'transaction_latest': lambda client, i: client.get('/api/transaction/latest'),
+            'transaction_filter': lambda client, i: client.get('/api/transaction/filter', {
+                **period, 'transaction_type': 'Expense', 'transaction_category': category}),
+            'transaction_export': export,
+            'transaction_add': lambda client, i: client.post('/api/transaction/add', item,
+                                                             content_type='application/json'),
+            'transaction_bulk_add': lambda client, i: client.post('/api/transaction/bulk_add', [item] * 100,
+                                                                  content_type='application/json'),
+            'transaction_import': upload,
+            'transaction_delete': lambda client, i: client.post(
+                f'/api/transaction/{transaction_ids.pop()}/delete'),
+            'categories': lambda client, i: client.get('/api/categories'),
+            'transaction_statistic': lambda client, i: client.get('/api/transaction/statistic', period),
+            'transaction_timeseries': lambda client, i: client.get('/api/transaction/timeseries', {
+                'start': '2022-01-01', 'end': '2024-08-31', 'bucket': 'week', 'group_by': 'category'}),
+            'planned_transactions': lambda client, i: client.get('/api/planning/planned_transactions'),
+            'planned_transaction_add': lambda client, i: client.post('/api/planning/transaction/add', item,
+                                                                     content_type='application/json'),
+            'planned_transaction_delete': lambda client, i: client.post(
+                f'/api/planning/transaction/{planned_ids.pop()}/delete'),
+            'planned_transaction_statistic': lambda client, i: client.get('/api/planning/transaction/statistic', {
+                'transaction_start_date': '2024-02-01', 'transaction_end_date': '2024-08-31'}),
+            'planned_variance': lambda client, i: client.get('/api/planning/variance', {
+                'start': '2022-01-15', 'end': '2024-08-31', 'granularity': 'month'}),
+            'forecast': lambda client, i: client.get('/api/forecast', {'days': 1825}),
+            'sync': lambda client, i: client.get('/api/sync'),
+        }
+
+    def run(self, options) -> dict:
+        scenarios = self.scenarios(options)
+        staff = {'response_cache_stats', 'request_timings'}
+        results = {}
+        for pattern in urls.urlpatterns:
+            name = pattern.name
+            client = Client()
+            client.force_login(self.user)
+            if name in staff:
+                self.user.is_staff = True
+                self.user.save()
+                scenario = (lambda route: lambda client, i: client.get('/' + route))(str(pattern.pattern))
+            elif name in scenarios:
+                scenario = scenarios[name]
+            else:
+                self.stderr.write(f'No benchmark scenario for route {name}, skipped')
+                continue
+            for i in range(options['warmup']):
+                scenario(client, -1 - i)
+            timings = []
+            statuses = set()
+            started = time.perf_counter()
+            for i in range(options['requests']):
+                request_started = time.perf_counter()
+                response = scenario(client, i)
+                timings.append((time.perf_counter() - request_started) * 1000)
+                statuses.add(response.status_code)
+            elapsed = time.perf_counter() - started
+            if name in staff:
+                self.user.is_staff = False
+                self.user.save()
+            timings.sort()
+            results[name] = {
+                'requests': len(timings), 'rps': round(len(timings) / elapsed, 1),
+                'p50_ms': round(percentile(timings, 50), 3), 'p95_ms': round(percentile(timings, 95), 3),
+                'p99_ms': round(percentile(timings, 99), 3), 'mean_ms': round(statistics.fmean(timings), 3),
+                'statuses': sorted(statuses),
+            }
+        return results
+
+    def print_results(self, results: dict, baseline: dict = None):
+        self.stdout.write(f"{'route':32} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'status':>10}"
+                          + (f" {'base p95':>9} {'change':>8}" if baseline else ''))
+        for name, result in results.items():
+            line = (f"{name:32} {result['rps']:9.1f} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} "
+                    f"{result['p99_ms']:9.2f} {','.join(map(str, result['statuses'])):>10}")
+            base = (baseline or {}).get('routes', {}).get(name)
+            if base:
+                line += f" {base['p95_ms']:9.2f} {(result['p95_ms'] / base['p95_ms'] - 1) * 100:+7.1f}%"
+            self.stdout.write(line)
+
+    @staticmethod
+    def regressions(results: dict, baseline: dict, threshold: float) -> list:
+        """
+        Returns the routes whose p95 latency grew by more than the threshold compared with the baseline.
+        """
+        return [name for name, result in results.items()
+                if name in baseline and result['p95_ms'] > baseline[name]['p95_ms'] * (1 + threshold)]
+
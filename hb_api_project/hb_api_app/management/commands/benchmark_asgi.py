@@ -0,0 +1,165 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from hb_api_app import async_views, urls, views
+from hb_api_app.instrumentation import percentile
+from hb_api_app.models import Transaction, PlanningTransaction
+from hb_api_app.rollup import rebuild_rollup
+from hb_api_app.seeding import (seed_categories, seed_accounts, iter_realistic_transactions,
+                                as_planning_transactions, bulk_insert)
+
+REQUESTS = [
+    ('/api/user/account', {}),
+    ('/api/transaction/latest', {}),
+    ('/api/transaction/filter', {'transaction_start_date': '2022-03-01', 'transaction_end_date': '2022-09-30',
+                                 'transaction_type': 'Expense'}),
+    ('/api/categories', {}),
+    ('/api/transaction/statistic', {'transaction_start_date': '2021-01-15', 'transaction_end_date': '2022-12-10'}),
+    ('/api/planning/transaction/statistic', {'transaction_start_date': '2023-01-01',
+                                             'transaction_end_date': '2023-06-30'}),
+]
+
+
+class SyncReadUrls:
+    urlpatterns = urls.url_patterns(views)
+
+
+class AsyncReadUrls:
+    urlpatterns = urls.url_patterns(async_views)
+
+
+class ThreadSampler:
+    """Records the highest number of live threads while it runs."""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while self.running:
+            self.peak = max(self.peak, threading.active_count())
+            time.sleep(0.001)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.running = False
+        self.thread.join()
+
+
+class Command(BaseCommand):
+    help = ("Seeds a throwaway test database and sends concurrent requests to the read endpoints, once to the sync "
+            "views from a thread pool as a threaded WSGI server would, once to the async views on one event loop as "
+            "under ASGI. Reports throughput, latency percentiles and the peak number of threads.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of seeded users.')
+        parser.add_argument('--transactions', type=int, default=5000, help='Transactions per user.')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50],
+                            help='Numbers of concurrent requests to measure.')
+        parser.add_argument('--requests', type=int, default=300, help='Requests per measurement.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the generated data.')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        setup_test_environment()
+        try:
+            # Measure the views, not the response cache
+            with override_settings(CACHES={**settings.CACHES, 'benchmark': {
+                    'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}, HB_RESPONSE_CACHE_ALIAS='benchmark'):
+                self.users = self.seed(options)
+                self.stdout.write(f"{'server':6} {'concurrency':>11} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+                                  f"{'p99 ms':>9} {'threads':>8}")
+                for concurrency in options['concurrency']:
+                    with override_settings(ROOT_URLCONF=SyncReadUrls):
+                        self.report('WSGI', concurrency, *self.run_threaded(concurrency, options['requests']))
+                    with override_settings(ROOT_URLCONF=AsyncReadUrls):
+                        self.report('ASGI', concurrency, *asyncio.run(self.run_async(concurrency,
+                                                                                     options['requests'])))
+        finally:
+            teardown_test_environment()
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, options) -> list:
+        rng = random.Random(options['seed'])
+        categories = seed_categories()
+        accounts = seed_accounts(options['users'], prefix='bench_user')
+        for account in accounts:
+            bulk_insert(Transaction, iter_realistic_transactions(account, categories, options['transactions'], rng,
+                                                                 date(2020, 1, 1), date(2022, 12, 31)))
+            bulk_insert(PlanningTransaction, as_planning_transactions(iter_realistic_transactions(
+                account, categories, 100, rng, date(2023, 1, 1), date(2023, 12, 31))))
+        rebuild_rollup()
+        return [account.account_owner for account in accounts]
+
+    def run_threaded(self, concurrency: int, count: int) -> tuple:
+        """
+        Sends count requests to the sync views from concurrency threads, each with its own client.
+        """
+        local = threading.local()
+
+        def send(i):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(self.users[i % len(self.users)])
+            url, data = REQUESTS[i % len(REQUESTS)]
+            started = time.perf_counter()
+            local.client.get(url, data)
+            return (time.perf_counter() - started) * 1000
+
+        def close(_):
+            connections.close_all()
+
+        with ThreadSampler() as sampler, ThreadPoolExecutor(concurrency) as executor:
+            started = time.perf_counter()
+            timings = list(executor.map(send, range(count)))
+            elapsed = time.perf_counter() - started
+            list(executor.map(close, range(concurrency)))
+        return timings, elapsed, sampler.peak
+
+    async def run_async(self, concurrency: int, count: int) -> tuple:
+        """
+        Sends count requests to the async views, at most concurrency at a time, from one event loop.
+        """
+        clients = []
+        for user in self.users[:concurrency]:
+            client = AsyncClient()
+            if hasattr(client, 'aforce_login'):
+                await client.aforce_login(user)
+            else:
+                await sync_to_async(client.force_login)(user)
+            clients.append(client)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(i):
+            url, data = REQUESTS[i % len(REQUESTS)]
+            async with semaphore:
+                started = time.perf_counter()
+                await clients[i % len(clients)].get(url, data)
+                return (time.perf_counter() - started) * 1000
+
+        with ThreadSampler() as sampler:
+            started = time.perf_counter()
+            timings = await asyncio.gather(*(send(i) for i in range(count)))
+            elapsed = time.perf_counter() - started
+        return timings, elapsed, sampler.peak
+
+    def report(self, server: str, concurrency: int, timings: list, elapsed: float, threads: int):
+        timings = sorted(timings)
+        self.stdout.write(f'{server:6} {concurrency:11} {len(timings) / elapsed:9.1f} {percentile(timings, 50):9.2f} '
+                          f'{percentile(timings, 95):9.2f} {percentile(timings, 99):9.2f} {threads:8}')
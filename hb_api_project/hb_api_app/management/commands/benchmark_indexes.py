@@ -0,0 +1,107 @@
+import random
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+
+from hb_api_app.models import Transaction, PlanningTransaction
+from hb_api_app.seeding import (seed_categories, seed_accounts, iter_transactions, iter_planning_transactions,
+                                bulk_insert)
+
+
+class Command(BaseCommand):
+    help = ("Seeds a throwaway test database and compares query plans and latency of the per-account "
+            "transaction queries without and with the composite indexes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Number of transactions to seed.')
+        parser.add_argument('--accounts', type=int, default=10, help='Number of accounts to spread the rows over.')
+        parser.add_argument('--repeat', type=int, default=20, help='Number of timed runs per query.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the generated data.')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        categories = seed_categories()
+        accounts = seed_accounts(options['accounts'], prefix='bench_user')
+        per_account = options['rows'] // len(accounts)
+        start_date = date(2015, 1, 1)
+        for account in accounts:
+            bulk_insert(Transaction, iter_transactions(account, categories, per_account, rng, start_date, 3650))
+            bulk_insert(PlanningTransaction,
+                        iter_planning_transactions(account, categories, per_account // 10, rng, start_date, 3650))
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+        self.stdout.write(f'Seeded {per_account * len(accounts)} transactions over {len(accounts)} accounts.')
+
+        queries = self.queries(accounts[len(accounts) // 2], categories[0])
+        indexes = [(model, index) for model in (Transaction, PlanningTransaction) for index in model._meta.indexes]
+
+        with connection.schema_editor() as schema_editor:
+            for model, index in indexes:
+                schema_editor.remove_index(model, index)
+        before = self.measure(queries, options['repeat'])
+
+        with connection.schema_editor() as schema_editor:
+            for model, index in indexes:
+                schema_editor.add_index(model, index)
+        after = self.measure(queries, options['repeat'])
+
+        for name in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f'  before: {before[name][0]:.2f} ms\n    ' + before[name][1].replace('\n', '\n    '))
+            self.stdout.write(f'  after:  {after[name][0]:.2f} ms\n    ' + after[name][1].replace('\n', '\n    '))
+
+    @staticmethod
+    def queries(account, category) -> dict:
+        """
+        Returns the querysets issued by the views for one account, keyed by a readable name.
+        """
+        start, end = date(2020, 1, 1), date(2020, 3, 31)
+        transactions = Transaction.objects.filter(transaction_account=account)
+        planned = PlanningTransaction.objects.filter(transaction_account_plan=account)
+        return {
+            'transaction_latest': transactions.order_by('-transaction_date').values(
+                'id', 'transaction_date', 'transaction_sum')[:100],
+            'transaction_filter (type + range)': transactions.filter(
+                transaction_type=0, transaction_date__range=[start, end]).order_by('-transaction_date').values(
+                'id', 'transaction_date', 'transaction_sum'),
+            'transaction_filter (category + range)': transactions.filter(
+                transaction_category=category, transaction_date__range=[start, end]).order_by(
+                '-transaction_date').values('id', 'transaction_date', 'transaction_sum'),
+            'transaction_statistic (income)': transactions.filter(
+                transaction_type=1, transaction_date__range=[start, end]).values('transaction_type').order_by(
+                'transaction_type').annotate(total=Sum('transaction_sum')),
+            'planned_transactions': planned.order_by('-transaction_date_plan').values(
+                'id', 'transaction_date_plan', 'transaction_sum_plan')[:100],
+            'planned_transaction_statistic': planned.filter(
+                transaction_type_plan=0, transaction_date_plan__range=[start, end]).values(
+                'transaction_type_plan').order_by('transaction_type_plan').annotate(
+                total=Sum('transaction_sum_plan')),
+        }
+
+    @staticmethod
+    def measure(queries: dict, repeat: int) -> dict:
+        """
+        Runs every query `repeat` times and returns the median latency in milliseconds and the query plan.
+        """
+        results = {}
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = (statistics.median(timings), queryset.explain())
+        return results
+
@@ -0,0 +1,50 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hb_api_app.responses import JSON_ENCODERS, available_encoders
+from hb_api_app.seeding import DEFAULT_CATEGORIES
+
+
+class Command(BaseCommand):
+    help = ("Compares the JSON encoders of the API on a transaction_latest shaped payload and checks that they "
+            "produce the same bytes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Number of transactions in the payload.')
+        parser.add_argument('--repeat', type=int, default=200, help='Number of timed encodings per encoder.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the generated payload.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        payload = {'transactions': [{
+            'id': i, 'transaction_date': date(2023, 1, 1) - timedelta(days=i // 3),
+            'transaction_type': category_type, 'transaction_category__category_name': name,
+            'transaction_sum': Decimal(rng.randint(1, 100000)) / 100, 'transaction_comment': f'{name} №{i}',
+        } for i, (category_type, name) in enumerate(rng.choice(DEFAULT_CATEGORIES) for _ in range(options['rows']))],
+            'next_cursor': None}
+
+        encoders = available_encoders()
+        outputs = {name: JSON_ENCODERS[name](payload) for name in encoders}
+        if len(set(outputs.values())) > 1:
+            raise CommandError('The encoders produced different output')
+
+        timings = {}
+        for name in encoders:
+            encode = JSON_ENCODERS[name]
+            runs = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                encode(payload)
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(runs)
+
+        self.stdout.write(f"{options['rows']} rows, {len(outputs['stdlib'])} bytes, identical output")
+        for name in encoders:
+            self.stdout.write(f"  {name:8} {timings[name]:8.3f} ms  {timings['stdlib'] / timings[name]:5.1f}x")
+        if 'orjson' not in encoders:
+            self.stdout.write('orjson is not installed, only the stdlib encoder was measured.')
@@ -0,0 +1,95 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, OperationalError
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from hb_api_app.instrumentation import percentile
+from hb_api_app.seeding import seed_categories, seed_accounts
+
+
+class Command(BaseCommand):
+    help = ("Seeds a throwaway test database and sends transaction_add requests (with a transaction_latest read every "
+            "fifth request) from concurrent threads. On SQLite the run is repeated with the default connection "
+            "settings and with the configured profile (WAL, busy timeout, immediate transactions).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Number of concurrent clients.')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per client.')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        setup_test_environment()
+        database = connections.settings['default']
+        configured_options = database.get('OPTIONS', {})
+        try:
+            self.users = [account.account_owner for account in seed_accounts(options['threads'], 'bench_user')]
+            seed_categories()
+            profiles = {'configured': (getattr(settings, 'HB_SQLITE_PRAGMAS', {}), configured_options)}
+            if connection.vendor == 'sqlite':
+                # Django's defaults: rollback journal, full sync, 5 second lock timeout, deferred transactions
+                profiles = {'default': ({'journal_mode': 'DELETE', 'synchronous': 'FULL'}, {}), **profiles}
+            self.stdout.write(f"{'profile':11} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+            for name, (pragmas, database_options) in profiles.items():
+                connections.close_all()
+                database['OPTIONS'] = database_options
+                with override_settings(HB_SQLITE_PRAGMAS=pragmas):
+                    # Switch the journal mode of the file before the clients connect, it needs exclusive access
+                    connection.ensure_connection()
+                    with override_settings(HB_SQLITE_PRAGMAS={key: value for key, value in pragmas.items()
+                                                              if key != 'journal_mode'}):
+                        self.report(name, *self.run(options['threads'], options['requests']))
+        finally:
+            database['OPTIONS'] = configured_options
+            teardown_test_environment()
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, threads: int, count: int) -> tuple:
+        errors = []
+        lock = threading.Lock()
+
+        clients = []
+        for user in self.users[:threads]:
+            clients.append(Client())
+            clients[-1].force_login(user)
+
+        def client_run(client):
+            timings = []
+            for i in range(count):
+                started = time.perf_counter()
+                try:
+                    if i % 5 == 4:
+                        response = client.get('/api/transaction/latest')
+                    else:
+                        response = client.post('/api/transaction/add', {
+                            'transaction_type': '0', 'transaction_category': 'food',
+                            'transaction_date': '2023-05-01', 'transaction_sum': '1.25',
+                            'transaction_comment': 'benchmark'}, content_type='application/json')
+                    error = None if response.status_code == 200 else f'status {response.status_code}'
+                except OperationalError as e:
+                    error = str(e)
+                timings.append((time.perf_counter() - started) * 1000)
+                if error:
+                    with lock:
+                        errors.append(error)
+            connections.close_all()
+            return timings
+
+        with ThreadPoolExecutor(threads) as executor:
+            started = time.perf_counter()
+            timings = [timing for client_timings in executor.map(client_run, clients)
+                       for timing in client_timings]
+            elapsed = time.perf_counter() - started
+        return timings, elapsed, errors
+
+    def report(self, name: str, timings: list, elapsed: float, errors: list):
+        timings = sorted(timings)
+        self.stdout.write(f'{name:11} {len(timings) / elapsed:9.1f} {percentile(timings, 50):9.2f} '
+                          f'{percentile(timings, 95):9.2f} {percentile(timings, 99):9.2f} {len(errors):7}')
+        for error in sorted(set(errors)):
+            self.stdout.write(f'  {errors.count(error)} x {error}')
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from hb_api_app.models import Account
+from hb_api_app.statement_import import STATEMENT_FORMATS, StatementError, import_transactions
+
+
+class Command(BaseCommand):
+    help = "Imports a CSV or OFX bank statement into the account of a user, streaming the file in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Owner of the account.')
+        parser.add_argument('path', help='Path of the statement file.')
+        parser.add_argument('--format', choices=sorted(STATEMENT_FORMATS),
+                            help='Statement format, taken from the file extension if omitted.')
+        parser.add_argument('--default-category', default='None',
+                            help='Category of rows without a category.')
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'HB_IMPORT_BATCH_SIZE', 1000),
+                            help='Number of rows per batch.')
+
+    def handle(self, *args, **options):
+        try:
+            account = Account.objects.get(account_owner__username=options['username'])
+        except Account.DoesNotExist:
+            raise CommandError(f"User {options['username']} has no account")
+        statement_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if statement_format not in STATEMENT_FORMATS:
+            raise CommandError(f'Unsupported format {statement_format}')
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+            try:
+                result = import_transactions(account, STATEMENT_FORMATS[statement_format](
+                    lines, options['default_category']), options['batch_size'])
+            except StatementError as e:
+                raise CommandError(f"{e}, imported {e.result['imported']} transactions before the error")
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['imported']} transactions, skipped {result['duplicates']} duplicates and "
+            f"{result['failed']} invalid rows."))
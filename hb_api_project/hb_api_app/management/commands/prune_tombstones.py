@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from hb_api_app.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = ("Deletes the tombstones of deleted transactions older than HB_SYNC_TOMBSTONE_DAYS. Run it periodically, "
+            "sync tokens older than the retention get a 410 response.")
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hb_api_app.models import Account
+from hb_api_app.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = ("Rebuilds the monthly transaction rollup and the balance checkpoints from the raw transactions, for "
+            "backfill and repair.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', type=int, help='Rebuild only the account with this id.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rollup rows per INSERT.')
+
+    def handle(self, *args, **options):
+        account = None
+        if options['account'] is not None:
+            try:
+                account = Account.objects.get(pk=options['account'])
+            except Account.DoesNotExist:
+                raise CommandError(f"Account {options['account']} does not exist")
+        created = rebuild_rollup(account, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Created {created} rollup rows.'))
@@ -0,0 +1,62 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+
+from hb_api_app.balance import recalculate_balances
+from hb_api_app.models import Transaction, PlanningTransaction
+from hb_api_app.rollup import rebuild_rollup
+from hb_api_app.seeding import (DEFAULT_CATEGORIES, seed_categories, seed_accounts, iter_realistic_transactions,
+                                as_planning_transactions, bulk_insert)
+
+
+class Command(BaseCommand):
+    help = ("Fills the configured database with generated users, accounts, categories, transactions and planned "
+            "transactions with realistic dates and sums, then builds the monthly rollup and the account balances. "
+            "The same options and seed always generate the same data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Number of users, each with one account.')
+        parser.add_argument('--transactions', type=int, default=10000,
+                            help='Average number of transactions per account, the actual number varies by +-50%%.')
+        parser.add_argument('--planned', type=int, default=100, help='Average number of planned transactions per '
+                                                                     'account, spread over the next year.')
+        parser.add_argument('--categories', type=int, default=0,
+                            help='Number of extra expense categories besides the default ones.')
+        parser.add_argument('--years', type=int, default=5, help='Length of the transaction history in years.')
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None,
+                            help='Date of the newest transaction (YYYY-MM-DD), today if omitted.')
+        parser.add_argument('--prefix', default='seed_user', help='Username prefix of the generated users.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the generated data.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of rows per INSERT.')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(f"Users with the prefix {options['prefix']} already exist, choose another --prefix")
+        rng = random.Random(options['seed'])
+        end_date = options['end_date'] or date.today()
+        start_date = end_date - timedelta(days=365 * options['years'] - 1)
+        started = time.perf_counter()
+
+        categories = seed_categories(DEFAULT_CATEGORIES + [(0, f'category_{i}') for i in range(options['categories'])])
+        accounts = seed_accounts(options['users'], prefix=options['prefix'])
+        transactions = planned = 0
+        for number, account in enumerate(accounts, start=1):
+            with db_transaction.atomic():
+                transactions += bulk_insert(Transaction, iter_realistic_transactions(
+                    account, categories, round(options['transactions'] * rng.uniform(0.5, 1.5)), rng, start_date,
+                    end_date), options['batch_size'])
+                planned += bulk_insert(PlanningTransaction, as_planning_transactions(iter_realistic_transactions(
+                    account, categories, round(options['planned'] * rng.uniform(0.5, 1.5)), rng,
+                    end_date + timedelta(days=1), end_date + timedelta(days=365))), options['batch_size'])
+                rebuild_rollup(account)
+            if number % 10 == 0 or number == len(accounts):
+                self.stdout.write(f'{number}/{len(accounts)} accounts, {transactions} transactions, '
+                                  f'{planned} planned transactions, {time.perf_counter() - started:.1f} s')
+        recalculate_balances(accounts)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(accounts)} accounts with {transactions} transactions and {planned} planned transactions '
+            f'in {time.perf_counter() - started:.1f} s.'))
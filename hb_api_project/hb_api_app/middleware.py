@@ -0,0 +1,71 @@
+import asyncio
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+from .instrumentation import start_request, finish_request, install_query_wrapper, histograms
+
+logger = logging.getLogger('hb_api_app.instrumentation')
+
+
+def report(request: HttpRequest, response: HttpResponse, metrics, started: float) -> None:
+    """
+    Adds the Server-Timing header, writes the structured log line and records the route histogram sample.
+    """
+    total = time.perf_counter() - started
+    view = max(total - metrics.sql_time - metrics.serialize_time, 0.0)
+    match = request.resolver_match
+    route = match.route if match is not None else 'unmatched'
+    response['Server-Timing'] = (f'db;dur={metrics.sql_time * 1000:.2f};desc="{metrics.queries} queries", '
+                                 f'view;dur={view * 1000:.2f}, ser;dur={metrics.serialize_time * 1000:.2f}, '
+                                 f'total;dur={total * 1000:.2f}')
+    histograms.add(route, total * 1000, metrics.sql_time * 1000, metrics.queries)
+    logger.info(json.dumps({
+        'route': route, 'method': request.method, 'status': response.status_code, 'queries': metrics.queries,
+        'sql_ms': round(metrics.sql_time * 1000, 3), 'view_ms': round(view * 1000, 3),
+        'serialize_ms': round(metrics.serialize_time * 1000, 3), 'total_ms': round(total * 1000, 3)}))
+
+
+@sync_and_async_middleware
+def instrumentation_middleware(get_response):
+    """
+    Opt-in middleware (HB_INSTRUMENTATION setting) that measures the query count, SQL time, view time and
+    serialization time of every request. The values are sent in a Server-Timing header, logged as JSON by the
+    hb_api_app.instrumentation logger and kept in per route histograms for api/stats/timings. The body of
+    streaming responses is produced after the middleware returns and is not included.
+    """
+    if not getattr(settings, 'HB_INSTRUMENTATION', False):
+        raise MiddlewareNotUsed
+    connection_created.connect(install_query_wrapper)
+    for connection in connections.all():
+        install_query_wrapper(None, connection)
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request: HttpRequest) -> HttpResponse:
+            metrics, token = start_request()
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                finish_request(token)
+            report(request, response, metrics, started)
+            return response
+    else:
+        def middleware(request: HttpRequest) -> HttpResponse:
+            metrics, token = start_request()
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                finish_request(token)
+            report(request, response, metrics, started)
+            return response
+
+    return middleware
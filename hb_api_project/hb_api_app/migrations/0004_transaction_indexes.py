@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hb_api_app", "0003_rename_planingtransaction_planningtransaction"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="planningtransaction",
+            index=models.Index(
+                fields=["transaction_account_plan", "-transaction_date_plan"],
+                name="planning_acc_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="planningtransaction",
+            index=models.Index(
+                fields=["transaction_account_plan", "transaction_type_plan", "transaction_date_plan"],
+                name="planning_acc_type_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["transaction_account", "-transaction_date"],
+                name="transaction_acc_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["transaction_account", "transaction_type", "transaction_date"],
+                name="transaction_acc_type_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["transaction_account", "transaction_category", "transaction_date"],
+                name="transaction_acc_cat_date_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollup(apps, schema_editor):
+    """
+    Fills the rollup with the monthly sums of the existing transactions, grouped like rollup.rebuild_rollup.
+    """
+    transaction_model = apps.get_model("hb_api_app", "Transaction")
+    rollup_model = apps.get_model("hb_api_app", "TransactionRollup")
+    groups = (
+        transaction_model.objects.order_by()
+        .annotate(month=TruncMonth("transaction_date"))
+        .values("transaction_account_id", "month", "transaction_type", "transaction_category_id")
+        .annotate(total=Sum("transaction_sum"), count=Count("id"))
+    )
+    batch = []
+    for group in groups.iterator(chunk_size=1000):
+        batch.append(
+            rollup_model(
+                rollup_account_id=group["transaction_account_id"],
+                rollup_month=group["month"],
+                rollup_type=group["transaction_type"],
+                rollup_category_id=group["transaction_category_id"],
+                rollup_sum=group["total"],
+                rollup_count=group["count"],
+            )
+        )
+        if len(batch) >= 1000:
+            rollup_model.objects.bulk_create(batch)
+            batch = []
+    rollup_model.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hb_api_app", "0004_transaction_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransactionRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rollup_month", models.DateField()),
+                (
+                    "rollup_type",
+                    models.IntegerField(
+                        choices=[(0, "Expense"), (1, "Income")], default=0
+                    ),
+                ),
+                (
+                    "rollup_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("rollup_count", models.IntegerField(default=0)),
+                (
+                    "rollup_account",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="hb_api_app.account",
+                    ),
+                ),
+                (
+                    "rollup_category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="hb_api_app.transactioncategory",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "rollup_account",
+                            "rollup_month",
+                            "rollup_type",
+                            "rollup_category",
+                        ),
+                        name="rollup_acc_month_type_cat_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
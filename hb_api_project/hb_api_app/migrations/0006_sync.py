@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hb_api_app", "0005_transactionrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransactionTombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "tombstone_kind",
+                    models.IntegerField(
+                        choices=[(0, "Transaction"), (1, "PlanningTransaction")],
+                        default=0,
+                    ),
+                ),
+                ("tombstone_object_id", models.IntegerField()),
+                (
+                    "tombstone_deleted",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="planningtransaction",
+            name="transaction_modified_plan",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="transaction_modified",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="planningtransaction",
+            index=models.Index(
+                fields=["transaction_account_plan", "transaction_modified_plan", "id"],
+                name="planning_acc_modified_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["transaction_account", "transaction_modified", "id"],
+                name="transaction_acc_modified_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="transactiontombstone",
+            name="tombstone_account",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="hb_api_app.account"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transactiontombstone",
+            index=models.Index(
+                fields=["tombstone_account", "tombstone_deleted", "id"],
+                name="tombstone_acc_deleted_idx",
+            ),
+        ),
+    ]
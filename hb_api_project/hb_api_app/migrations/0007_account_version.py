@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hb_api_app", "0006_sync"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="account",
+            name="account_modified",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="account",
+            name="account_version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
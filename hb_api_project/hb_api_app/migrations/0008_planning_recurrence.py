@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hb_api_app", "0007_account_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="planningtransaction",
+            name="transaction_recurrence_end_plan",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="planningtransaction",
+            name="transaction_recurrence_plan",
+            field=models.IntegerField(
+                choices=[(0, "None"), (1, "Daily"), (2, "Weekly"), (3, "Monthly")],
+                default=0,
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hb_api_app", "0009_balance_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="transactionrollup",
+            name="rollup_category",
+            field=models.ForeignKey(
+                default=0,
+                on_delete=django.db.models.deletion.SET_DEFAULT,
+                to="hb_api_app.transactioncategory",
+            ),
+        ),
+    ]
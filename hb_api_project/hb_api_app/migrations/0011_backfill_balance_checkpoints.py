@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Case, DecimalField, F, Sum, When
+from django.db.models.functions import TruncMonth
+
+
+def backfill_checkpoints(apps, schema_editor):
+    """
+    Creates the balance checkpoints from the transactions: the balance of every account at the end of every month
+    with transactions, computed like rollup.rebuild_checkpoints but without the current models.
+    """
+    transaction_model = apps.get_model("hb_api_app", "Transaction")
+    checkpoint_model = apps.get_model("hb_api_app", "BalanceCheckpoint")
+    output_field = DecimalField(max_digits=20, decimal_places=2)
+    months = (
+        transaction_model.objects.order_by()
+        .annotate(month=TruncMonth("transaction_date"))
+        .values("transaction_account_id", "month")
+        .annotate(
+            balance=Sum(
+                Case(
+                    When(transaction_type=1, then="transaction_sum"),
+                    default=-F("transaction_sum"),
+                    output_field=output_field,
+                )
+            )
+        )
+        .order_by("transaction_account_id", "month")
+    )
+    checkpoint_model.objects.all().delete()
+    batch = []
+    account_id, balance = None, Decimal(0)
+    for month in months.iterator(chunk_size=1000):
+        if month["transaction_account_id"] != account_id:
+            account_id, balance = month["transaction_account_id"], Decimal(0)
+        balance += month["balance"]
+        batch.append(
+            checkpoint_model(
+                checkpoint_account_id=account_id,
+                checkpoint_month=month["month"],
+                checkpoint_balance=balance,
+            )
+        )
+        if len(batch) >= 1000:
+            checkpoint_model.objects.bulk_create(batch)
+            batch = []
+    checkpoint_model.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("hb_api_app", "0010_rollup_category_set_default"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_checkpoints, migrations.RunPython.noop),
+    ]
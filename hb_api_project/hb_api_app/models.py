@@ -11,6 +11,10 @@ class Account(models.Model):
     account_owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     account_number = models.CharField(max_length=200, null=False, blank=False)
     account_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Changed with every write to the transactions or planned transactions of the account, the validators of the
+    # conditional GET requests (ETag and Last-Modified)
+    account_version = models.PositiveBigIntegerField(default=0)
+    account_modified = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f'{self.account_owner} {self.account_number} {self.account_balance}'
@@ -34,6 +38,19 @@ class Transaction(models.Model):
     transaction_sum = models.DecimalField(max_digits=10, decimal_places=2,
                                           validators=[MinValueValidator(Decimal('0.01'))])
     transaction_comment = models.CharField(max_length=255)
+    # Time of the last change, the incremental sync (api/sync) returns the rows changed after its token
+    transaction_modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['transaction_account', '-transaction_date'], name='transaction_acc_date_idx'),
+            models.Index(fields=['transaction_account', 'transaction_type', 'transaction_date'],
+                         name='transaction_acc_type_date_idx'),
+            models.Index(fields=['transaction_account', 'transaction_category', 'transaction_date'],
+                         name='transaction_acc_cat_date_idx'),
+            models.Index(fields=['transaction_account', 'transaction_modified', 'id'],
+                         name='transaction_acc_modified_idx'),
+        ]
 
     def __str__(self):
         return f"Username: {self.transaction_account.account_owner.username}; Type: {self.transaction_type_choices[self.transaction_type][1]}; Sum:{self.transaction_sum}; Date:{self.transaction_date}"
@@ -48,6 +65,79 @@ class PlanningTransaction(models.Model):
     transaction_sum_plan = models.DecimalField(max_digits=10, decimal_places=2,
                                                validators=[MinValueValidator(Decimal('0.01'))])
     transaction_comment_plan = models.CharField(max_length=255)
+    # A recurring planned transaction is stored once, transaction_date_plan is its first occurrence and
+    # transaction_recurrence_end_plan the last possible day (None: no end), see recurrence.py
+    transaction_recurrence_choices_plan = [(0, 'None'), (1, 'Daily'), (2, 'Weekly'), (3, 'Monthly')]
+    transaction_recurrence_plan = models.IntegerField(choices=transaction_recurrence_choices_plan, default=0)
+    transaction_recurrence_end_plan = models.DateField(null=True, blank=True)
+    transaction_modified_plan = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['transaction_account_plan', '-transaction_date_plan'], name='planning_acc_date_idx'),
+            models.Index(fields=['transaction_account_plan', 'transaction_type_plan', 'transaction_date_plan'],
+                         name='planning_acc_type_date_idx'),
+            models.Index(fields=['transaction_account_plan', 'transaction_modified_plan', 'id'],
+                         name='planning_acc_modified_idx'),
+        ]
 
     def __str__(self):
         return f"Username: {self.transaction_account_plan.account_owner.username}; Type: {self.transaction_type_choices_plan[self.transaction_type_plan][1]}; Sum:{self.transaction_sum_plan}; Date:{self.transaction_date_plan}"
+
+
+class TransactionRollup(models.Model):
+    rollup_account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    rollup_month = models.DateField()
+    rollup_type_choices = [(0, 'Expense'), (1, 'Income')]
+    rollup_type = models.IntegerField(choices=rollup_type_choices, default=0)
+    rollup_category = models.ForeignKey(TransactionCategory, on_delete=models.SET_DEFAULT, default=0)
+    rollup_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    rollup_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['rollup_account', 'rollup_month', 'rollup_type', 'rollup_category'],
+                                    name='rollup_acc_month_type_cat_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Account: {self.rollup_account_id}; Month: {self.rollup_month:%Y-%m}; Type: {self.rollup_type_choices[self.rollup_type][1]}; Sum:{self.rollup_sum}; Count:{self.rollup_count}"
+
+
+class BalanceCheckpoint(models.Model):
+    """
+    The balance of an account at the end of a month: income minus expense of all its transactions up to the last
+    day of the month. Kept for the months with transactions, a balance on any date is the checkpoint of the previous
+    month plus the transactions of one month.
+    """
+    checkpoint_account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    checkpoint_month = models.DateField()
+    checkpoint_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['checkpoint_account', 'checkpoint_month'],
+                                    name='checkpoint_acc_month_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Account: {self.checkpoint_account_id}; Month: {self.checkpoint_month:%Y-%m}; Balance: {self.checkpoint_balance}"
+
+
+class TransactionTombstone(models.Model):
+    """
+    Records the deletion of a Transaction or PlanningTransaction, so the incremental sync can report it.
+    """
+    tombstone_account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    tombstone_kind_choices = [(0, 'Transaction'), (1, 'PlanningTransaction')]
+    tombstone_kind = models.IntegerField(choices=tombstone_kind_choices, default=0)
+    tombstone_object_id = models.IntegerField()
+    tombstone_deleted = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tombstone_account', 'tombstone_deleted', 'id'], name='tombstone_acc_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Account: {self.tombstone_account_id}; Kind: {self.tombstone_kind_choices[self.tombstone_kind][1]}; Id: {self.tombstone_object_id}; Deleted: {self.tombstone_deleted}"
@@ -0,0 +1,126 @@
+import base64
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class CursorError(ValueError):
+    """Raised when the limit or after parameter of a paginated request can not be parsed."""
+
+
+def encode_cursor(row_date: date, row_id: int) -> str:
+    """
+    Encodes the position of a row into an opaque cursor.
+    :param row_date: The date of the last row on the page.
+    :type row_date: date
+    :param row_id: The id of the last row on the page.
+    :type row_id: int
+    :return: URL safe cursor string.
+    :rtype: str
+    """
+    return base64.urlsafe_b64encode(f'{row_date.isoformat()}|{row_id}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decodes a cursor created by encode_cursor.
+    :param cursor: The cursor string.
+    :type cursor: str
+    :return: The (date, id) pair of the last row of the previous page.
+    :rtype: tuple
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        row_date, row_id = raw.split('|')
+        return date.fromisoformat(row_date), int(row_id)
+    except ValueError as e:
+        raise CursorError('Invalid cursor') from e
+
+
+def page_limit(request: HttpRequest) -> int:
+    """
+    Reads the limit parameter of a paginated request, capped at HB_MAX_PAGE_SIZE.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: The page size.
+    :rtype: int
+    """
+    max_page_size = getattr(settings, 'HB_MAX_PAGE_SIZE', MAX_PAGE_SIZE)
+    try:
+        limit = int(request.GET.get('limit', getattr(settings, 'HB_PAGE_SIZE', DEFAULT_PAGE_SIZE)))
+    except ValueError as e:
+        raise CursorError('Invalid limit') from e
+    if limit < 1:
+        raise CursorError('Invalid limit')
+    return min(limit, max_page_size)
+
+
+def page_params(request: HttpRequest) -> tuple:
+    """
+    Reads the limit and after parameters of a paginated request.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: The page size and the decoded cursor, None for the first page.
+    :rtype: tuple
+    """
+    after = request.GET.get('after')
+    return page_limit(request), decode_cursor(after) if after else None
+
+
+def keyset_queryset(queryset: QuerySet, date_field: str, limit: int, after: tuple, *fields: str) -> QuerySet:
+    """
+    Returns the query of one page of rows ordered by (date_field, id) descending, starting after the given cursor.
+    The rows are selected with a WHERE condition on the cursor instead of an OFFSET, so every page costs the same.
+    One row more than the page size is selected to find out whether there is a next page.
+    :param queryset: The filtered queryset.
+    :type queryset: QuerySet
+    :param date_field: Name of the date field the rows are ordered by.
+    :type date_field: str
+    :param limit: Page size.
+    :type limit: int
+    :param after: The (date, id) pair of the last row of the previous page or None.
+    :type after: tuple
+    :param fields: Fields passed to values(), must contain 'id' and date_field.
+    :type fields: str
+    :return: The sliced values queryset.
+    :rtype: QuerySet
+    """
+    if after:
+        after_date, after_id = after
+        queryset = queryset.filter(Q(**{f'{date_field}__lt': after_date}) | Q(**{date_field: after_date,
+                                                                                'id__lt': after_id}))
+    return queryset.order_by(f'-{date_field}', '-id').values(*fields)[:limit + 1]
+
+
+def page_rows(rows: list, date_field: str, limit: int) -> tuple:
+    """
+    Cuts the rows of keyset_queryset to the page size.
+    :return: The list of rows and the cursor of the next page, None on the last page.
+    :rtype: tuple
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][date_field], rows[-1]['id'])
+
+
+def keyset_page(queryset: QuerySet, date_field: str, limit: int, after: tuple, *fields: str) -> tuple:
+    """
+    Returns one page of rows and the cursor of the next page, see keyset_queryset for the parameters.
+    :rtype: tuple
+    """
+    return page_rows(list(keyset_queryset(queryset, date_field, limit, after, *fields)), date_field, limit)
+
+
+async def akeyset_page(queryset: QuerySet, date_field: str, limit: int, after: tuple, *fields: str) -> tuple:
+    """
+    Async version of keyset_page.
+    :rtype: tuple
+    """
+    rows = [row async for row in keyset_queryset(queryset, date_field, limit, after, *fields)]
+    return page_rows(rows, date_field, limit)
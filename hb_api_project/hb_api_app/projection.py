@@ -0,0 +1,96 @@
+from collections import namedtuple
+
+from django.http import HttpRequest
+
+from .category_cache import category_names, acategory_names
+
+TRANSACTION_FIELDS = ('id', 'transaction_date', 'transaction_type', 'transaction_category__category_name',
+                      'transaction_sum', 'transaction_comment')
+PLANNED_TRANSACTION_FIELDS = ('id', 'transaction_date_plan', 'transaction_type_plan',
+                              'transaction_category_plan__category_name', 'transaction_sum_plan',
+                              'transaction_comment_plan', 'transaction_recurrence_plan',
+                              'transaction_recurrence_end_plan')
+RESPONSE_FORMATS = ('rows', 'columnar')
+
+# fields: the returned fields, query_fields: the fields passed to values(), columnar: format=columnar,
+# category_field: the category foreign key of the model
+Projection = namedtuple('Projection', ['fields', 'query_fields', 'columnar', 'category_field'])
+
+
+class ProjectionError(ValueError):
+    """Raised when the fields or format parameter of a list request can not be parsed."""
+
+
+def projection_params(request: HttpRequest, fields: tuple, category_field: str, required: tuple = ()) -> Projection:
+    """
+    Reads the fields (comma separated, default all) and format (rows or columnar) parameters of a list request.
+    In the columnar format the category name is replaced by the category id, the names are sent once in a
+    category dictionary, so the rows are read without the join on the category table.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :param fields: The fields the view returns by default.
+    :type fields: tuple
+    :param category_field: The category foreign key, fields contains its __category_name.
+    :type category_field: str
+    :param required: Fields the view needs in the rows (like the keys of the pagination), also when not requested.
+    :type required: tuple
+    :return: The projection of the request.
+    :rtype: Projection
+    :raises ProjectionError: If a field or the format is unknown.
+    """
+    names = request.GET.get('fields')
+    selected = tuple(dict.fromkeys(names.split(','))) if names else fields
+    if not set(selected) <= set(fields):
+        raise ProjectionError('Unknown field')
+    response_format = request.GET.get('format', 'rows')
+    if response_format not in RESPONSE_FORMATS:
+        raise ProjectionError('Unknown format')
+    columnar = response_format == 'columnar'
+    if columnar:
+        selected = tuple(category_field if field == f'{category_field}__category_name' else field
+                         for field in selected)
+    return Projection(selected, selected + tuple(field for field in required if field not in selected), columnar,
+                      category_field)
+
+
+def project_rows(rows: list, projection: Projection) -> tuple:
+    """
+    Shapes the rows read with projection.query_fields for the response.
+    :return: The rows (or the dict of column lists in the columnar format) and the set of category ids to resolve.
+    :rtype: tuple
+    """
+    if projection.columnar:
+        columns = {field: [row[field] for row in rows] for field in projection.fields}
+        return columns, set(columns.get(projection.category_field, ()))
+    if len(projection.query_fields) > len(projection.fields):
+        rows = [{field: row[field] for field in projection.fields} for row in rows]
+    return rows, set()
+
+
+def projected_data(name: str, rows: list, projection: Projection) -> dict:
+    """
+    Returns the response data for a list of rows: {name: rows}, in the columnar format with the category dictionary
+    {"categories": {id: name}} when the category is selected.
+    :param name: The key of the rows in the response.
+    :type name: str
+    :param rows: The rows read with projection.query_fields.
+    :type rows: list
+    :param projection: The projection of the request.
+    :type projection: Projection
+    :rtype: dict
+    """
+    rows, categories = project_rows(rows, projection)
+    if projection.columnar and projection.category_field in projection.fields:
+        return {name: rows, "categories": category_names(categories)}
+    return {name: rows}
+
+
+async def aprojected_data(name: str, rows: list, projection: Projection) -> dict:
+    """
+    Async version of projected_data.
+    :rtype: dict
+    """
+    rows, categories = project_rows(rows, projection)
+    if projection.columnar and projection.category_field in projection.fields:
+        return {name: rows, "categories": await acategory_names(categories)}
+    return {name: rows}
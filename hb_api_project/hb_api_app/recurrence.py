@@ -0,0 +1,134 @@
+import calendar
+from datetime import date, timedelta
+
+from django.db.models import Q, QuerySet
+
+NONE = 0
+DAILY = 1
+WEEKLY = 2
+MONTHLY = 3
+
+RECURRENCE_NAMES = {'none': NONE, 'daily': DAILY, 'weekly': WEEKLY, 'monthly': MONTHLY}
+STEP_DAYS = {NONE: 0, DAILY: 1, WEEKLY: 7}
+# The PlanningTransaction fields expand_rows needs
+SCHEDULE_FIELDS = ('id', 'transaction_date_plan', 'transaction_recurrence_plan', 'transaction_recurrence_end_plan')
+
+
+def add_months(day: date, months: int) -> date:
+    """
+    Returns the date the given number of months later, on the same day of the month or on the last day of shorter
+    months (January 31 + 1 month is February 28 or 29).
+    """
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    return date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def occurrence(start: date, recurrence: int, index: int) -> date:
+    """
+    Returns the date of the occurrence with the given index (0 for the start date) of a schedule. Monthly
+    occurrences are computed from the start date, so a schedule starting on the 31st returns to the 31st.
+    """
+    if recurrence == MONTHLY:
+        return add_months(start, index)
+    return start + timedelta(days=STEP_DAYS[recurrence] * index)
+
+
+def first_index(start: date, recurrence: int, day: date) -> int:
+    """
+    Returns the index of the first occurrence on or after the given day, computed without iterating.
+    """
+    if day <= start:
+        return 0
+    if recurrence == MONTHLY:
+        index = (day.year - start.year) * 12 + day.month - start.month
+        return index if occurrence(start, recurrence, index) >= day else index + 1
+    return -(-(day - start).days // STEP_DAYS[recurrence])
+
+
+def last_index(start: date, recurrence: int, day: date) -> int:
+    """
+    Returns the index of the last occurrence on or before the given day, -1 if the schedule starts later.
+    """
+    if day < start:
+        return -1
+    if recurrence == MONTHLY:
+        index = (day.year - start.year) * 12 + day.month - start.month
+        return index if occurrence(start, recurrence, index) <= day else index - 1
+    return (day - start).days // STEP_DAYS[recurrence]
+
+
+def index_range(start: date, recurrence: int, end: date, window_start: date, window_end: date) -> range:
+    """
+    Returns the range of the occurrence indexes of a schedule that fall into the window (both days inclusive).
+    :param start: The date of the first occurrence.
+    :type start: date
+    :param recurrence: NONE, DAILY, WEEKLY or MONTHLY.
+    :type recurrence: int
+    :param end: The last day of the schedule or None for an open end.
+    :type end: date
+    :param window_start: The first day of the window.
+    :type window_start: date
+    :param window_end: The last day of the window.
+    :type window_end: date
+    :rtype: range
+    """
+    if recurrence == NONE:
+        return range(1) if window_start <= start <= window_end else range(0)
+    if end is not None:
+        window_end = min(window_end, end)
+    return range(first_index(start, recurrence, window_start), last_index(start, recurrence, window_end) + 1)
+
+
+def count_occurrences(start: date, recurrence: int, end: date, window_start: date, window_end: date) -> int:
+    """
+    Returns the number of occurrences of a schedule in the window in constant time, see index_range.
+    """
+    return len(index_range(start, recurrence, end, window_start, window_end))
+
+
+def iter_occurrences(start: date, recurrence: int, end: date, window_start: date, window_end: date):
+    """
+    Yields the dates of the occurrences of a schedule in the window in ascending order, see index_range. The
+    occurrences before the window are skipped arithmetically.
+    """
+    for index in index_range(start, recurrence, end, window_start, window_end):
+        yield occurrence(start, recurrence, index)
+
+
+def in_window(window_start: date, window_end: date) -> Q:
+    """
+    Returns the condition on PlanningTransaction rows that may have occurrences in the window: single planned
+    transactions dated in the window and schedules that started before its end and did not end before its start.
+    """
+    return (Q(transaction_recurrence_plan=NONE, transaction_date_plan__range=[window_start, window_end]) |
+            (~Q(transaction_recurrence_plan=NONE) & Q(transaction_date_plan__lte=window_end) &
+             (Q(transaction_recurrence_end_plan__isnull=True) | Q(transaction_recurrence_end_plan__gte=window_start))))
+
+
+def expand_rows(rows: list, window_start: date, window_end: date) -> list:
+    """
+    Expands PlanningTransaction value rows (with the date and recurrence fields) into one row per occurrence in the
+    window, newest first. The rows of an occurrence are copies of the schedule row with the occurrence date.
+    :param rows: The rows selected with in_window.
+    :type rows: list
+    :return: The occurrence rows.
+    :rtype: list
+    """
+    occurrences = []
+    for row in rows:
+        for day in iter_occurrences(row['transaction_date_plan'], row['transaction_recurrence_plan'],
+                                    row['transaction_recurrence_end_plan'], window_start, window_end):
+            occurrences.append({**row, 'transaction_date_plan': day})
+    occurrences.sort(key=lambda row: (row['transaction_date_plan'], row['id']), reverse=True)
+    return occurrences
+
+
+def schedule_rows(transactions: QuerySet, window_start: date, window_end: date, *fields: str) -> QuerySet:
+    """
+    Returns the value rows of the schedules (recurring planned transactions) of a queryset that may have
+    occurrences in the window, with the given fields and the fields needed to expand them.
+    """
+    return transactions.exclude(transaction_recurrence_plan=NONE).filter(
+        in_window(window_start, window_end)).values('transaction_date_plan', 'transaction_recurrence_plan',
+                                                    'transaction_recurrence_end_plan', *fields)
@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import threading
+from collections import defaultdict
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .category_cache import get_catalog, aget_catalog
+from .models import Account
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+
+def response_cache():
+    return caches[getattr(settings, 'HB_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+# Request attribute holding the account row read by conditional_per_account, reused by cache_per_account
+ACCOUNT_ROW_ATTRIBUTE = 'hb_account_row'
+
+
+def account_row(request: HttpRequest):
+    """
+    Returns the (account_version, account_modified) row of the user's account, read with one query per request and
+    kept on the request, so conditional_per_account and cache_per_account share it.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: The row, None if the user has no account.
+    :rtype: tuple
+    """
+    if not hasattr(request, ACCOUNT_ROW_ATTRIBUTE):
+        setattr(request, ACCOUNT_ROW_ATTRIBUTE, Account.objects.filter(account_owner_id=request.user.pk).values_list(
+            'account_version', 'account_modified').first())
+    return getattr(request, ACCOUNT_ROW_ATTRIBUTE)
+
+
+async def aaccount_row(request: HttpRequest):
+    """
+    Async version of account_row.
+    :rtype: tuple
+    """
+    if not hasattr(request, ACCOUNT_ROW_ATTRIBUTE):
+        setattr(request, ACCOUNT_ROW_ATTRIBUTE, await Account.objects.filter(
+            account_owner_id=request.user.pk).values_list('account_version', 'account_modified').afirst())
+    return getattr(request, ACCOUNT_ROW_ATTRIBUTE)
+
+
+def row_version(row: tuple):
+    return None if row is None else row[0]
+
+
+def build_response_key(endpoint: str, request: HttpRequest, version: int, catalog_version: str) -> str:
+    """
+    Builds the cache key of a response from the endpoint, Account.account_version, the category catalog version and
+    the query parameters in a normalized order. Every write that changes the account increments account_version
+    (see apply_balance_delta and touch_account), so the responses cached before it are never read again.
+    """
+    query = urlencode(sorted((key, value) for key, values in request.GET.lists() for value in values))
+    query_hash = hashlib.sha1(query.encode()).hexdigest()
+    return f'hb:response:{endpoint}:{request.user.pk}:{version}:{catalog_version}:{query_hash}'
+
+
+def response_key(endpoint: str, request: HttpRequest) -> str:
+    return build_response_key(endpoint, request, row_version(account_row(request)), get_catalog().version)
+
+
+async def aresponse_key(endpoint: str, request: HttpRequest) -> str:
+    return build_response_key(endpoint, request, row_version(await aaccount_row(request)),
+                              (await aget_catalog()).version)
+
+
+def record(endpoint: str, hit: bool) -> None:
+    with _stats_lock:
+        _stats[endpoint]['hits' if hit else 'misses'] += 1
+
+
+def cache_stats() -> dict:
+    """
+    Returns the hit and miss counters of this process per endpoint.
+    :rtype: dict
+    """
+    with _stats_lock:
+        return {endpoint: dict(counters) for endpoint, counters in _stats.items()}
+
+
+def cached_response(endpoint: str, cached: tuple) -> HttpResponse:
+    record(endpoint, hit=True)
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def cache_per_account(endpoint: str):
+    """
+    Caches successful GET responses of a sync or async view per account version and query string, so a cached
+    response costs the query of the account row. Responses carry an X-Cache header with HIT or MISS.
+    :param endpoint: The name of the endpoint used in the cache keys and statistics.
+    :type endpoint: str
+    """
+
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+                if request.method != 'GET':
+                    return await view(request, *args, **kwargs)
+                cache = response_cache()
+                key = await aresponse_key(endpoint, request)
+                cached = await cache.aget(key)
+                if cached is not None:
+                    return cached_response(endpoint, cached)
+                record(endpoint, hit=False)
+                response = await view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    await cache.aset(key, (response.content, response['Content-Type']),
+                                     getattr(settings, 'HB_RESPONSE_CACHE_TIMEOUT', 300))
+                response['X-Cache'] = 'MISS'
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            cache = response_cache()
+            key = response_key(endpoint, request)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached_response(endpoint, cached)
+            record(endpoint, hit=False)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type']),
+                          getattr(settings, 'HB_RESPONSE_CACHE_TIMEOUT', 300))
+            response['X-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def build_validators(row: tuple, catalog_version: str) -> tuple:
+    """
+    Builds the ETag and the Last-Modified timestamp of an account's responses from its (account_version,
+    account_modified) row and the category catalog version, None without an account.
+    """
+    if row is None:
+        return None
+    version, modified = row
+    return f'"{version}-{catalog_version}"', int(modified.timestamp())
+
+
+def set_validators(response: HttpResponse, validators: tuple) -> HttpResponse:
+    if response.status_code in (200, 304):
+        etag, last_modified = validators
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Clients may store the response, but have to revalidate it before every use
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_per_account(view):
+    """
+    Answers conditional GET requests of a sync or async view with 304 Not Modified, before the view (and the
+    response cache) runs, when the If-None-Match or If-Modified-Since header matches the account version. Successful
+    responses carry the ETag and Last-Modified headers. Last-Modified has a resolution of one second, clients should
+    revalidate with the ETag.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method != 'GET':
+                return await view(request, *args, **kwargs)
+            validators = build_validators(await aaccount_row(request), (await aget_catalog()).version)
+            if validators is None:
+                return await view(request, *args, **kwargs)
+            etag, last_modified = validators
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return set_validators(response, validators)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+        validators = build_validators(account_row(request), get_catalog().version)
+        if validators is None:
+            return view(request, *args, **kwargs)
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return set_validators(response, validators)
+
+    return wrapper
@@ -0,0 +1,98 @@
+import json
+import time
+from datetime import date
+from decimal import Decimal
+
+from django import http
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .instrumentation import record_serialization
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_django_default = DjangoJSONEncoder().default
+
+
+def stdlib_dumps(data) -> bytes:
+    """
+    Encodes data with the json module and DjangoJSONEncoder in the compact format shared by all encoders: no spaces
+    after separators and non-ASCII characters written as UTF-8.
+    """
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def orjson_default(value):
+    """
+    Formats the values orjson does not encode itself the way DjangoJSONEncoder does. Decimal and date, the types of
+    every transaction row, are checked first.
+    """
+    value_type = type(value)
+    if value_type is Decimal:
+        return str(value)
+    if value_type is date:
+        return value.isoformat()
+    return _django_default(value)
+
+
+def orjson_dumps(data) -> bytes:
+    """
+    Encodes data with orjson, the same bytes as stdlib_dumps except for floats: orjson writes exponents without the
+    sign and padding of repr (1e16, not 1e+16) and non-finite floats as null instead of NaN or Infinity. Dates and
+    datetimes are passed to orjson_default, because orjson writes datetimes with microseconds where
+    DjangoJSONEncoder writes milliseconds.
+    """
+    return orjson.dumps(data, default=orjson_default,
+                        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+
+JSON_ENCODERS = {'stdlib': stdlib_dumps, 'orjson': orjson_dumps}
+
+
+def available_encoders() -> list:
+    return [name for name in JSON_ENCODERS if name != 'orjson' or orjson is not None]
+
+
+def json_encoder():
+    """
+    Returns the encoder function chosen by the HB_JSON_ENCODER setting: stdlib, orjson or auto (orjson when it is
+    installed, stdlib otherwise).
+    """
+    name = getattr(settings, 'HB_JSON_ENCODER', 'auto')
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+    if name not in available_encoders():
+        raise ImproperlyConfigured(f'HB_JSON_ENCODER {name!r} is unknown or its package is not installed')
+    return JSON_ENCODERS[name]
+
+
+def dumps(data) -> bytes:
+    """
+    Encodes data with the configured encoder.
+    :return: The UTF-8 encoded JSON document.
+    :rtype: bytes
+    """
+    return json_encoder()(data)
+
+
+class JsonResponse(http.HttpResponse):
+    """
+    Drop-in replacement of django.http.JsonResponse that encodes with dumps and reports the time spent encoding to
+    the instrumentation middleware. A custom encoder or json_dumps_params fall back to json.dumps.
+    """
+
+    def __init__(self, data, encoder=None, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        started = time.perf_counter()
+        if encoder is None and json_dumps_params is None:
+            content = dumps(data)
+        else:
+            content = json.dumps(data, cls=encoder or DjangoJSONEncoder, **(json_dumps_params or {}))
+        record_serialization(time.perf_counter() - started)
+        super().__init__(content=content, **kwargs)
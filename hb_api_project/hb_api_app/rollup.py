@@ -0,0 +1,259 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F, Sum, Count, Case, When, Value, DecimalField, QuerySet
+from django.db.models.functions import TruncMonth
+
+from .balance import touch_accounts
+from .models import Account, Transaction, TransactionRollup, BalanceCheckpoint
+
+
+def month_start(day: date) -> date:
+    """
+    Returns the first day of the month of the given date.
+    """
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    """
+    Returns the first day of the month following the given date.
+    """
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def apply_rollup_deltas(account_id: int, deltas: dict) -> None:
+    """
+    Adds sums and counts to the monthly rollup rows of an account, creating missing rows. Must be called inside the
+    database transaction that writes the transactions.
+    :param account_id: The id of the account.
+    :type account_id: int
+    :param deltas: A dict mapping (month, transaction_type, category_id) to a (sum, count) pair. Negative values
+    remove transactions from the rollup.
+    :type deltas: dict
+    """
+    deltas = {(month_start(month), transaction_type, category_id): delta
+              for (month, transaction_type, category_id), delta in deltas.items()}
+    balance_deltas = defaultdict(Decimal)
+    for (month, transaction_type, _), (sum_delta, _) in deltas.items():
+        balance_deltas[month] += sum_delta if transaction_type == 1 else -sum_delta
+    if len(deltas) > 1:
+        # Create all missing rows with one INSERT, the per row path below only updates existing rows then
+        existing = set(TransactionRollup.objects.filter(
+            rollup_account_id=account_id, rollup_month__in={key[0] for key in deltas}).values_list(
+            'rollup_month', 'rollup_type', 'rollup_category_id'))
+        missing = [key for key in deltas if key not in existing]
+        try:
+            with db_transaction.atomic():
+                TransactionRollup.objects.bulk_create([
+                    TransactionRollup(rollup_account_id=account_id, rollup_month=month, rollup_type=transaction_type,
+                                      rollup_category_id=category_id, rollup_sum=deltas[month, transaction_type,
+                                                                                        category_id][0],
+                                      rollup_count=deltas[month, transaction_type, category_id][1])
+                    for month, transaction_type, category_id in missing])
+        except IntegrityError:
+            # A concurrent request created some of the rows first, fall back to the per row upsert
+            pass
+        else:
+            deltas = {key: delta for key, delta in deltas.items() if key in existing}
+
+    for (month, transaction_type, category_id), (sum_delta, count_delta) in deltas.items():
+        key = dict(rollup_account_id=account_id, rollup_month=month, rollup_type=transaction_type,
+                   rollup_category_id=category_id)
+        updated = TransactionRollup.objects.filter(**key).update(rollup_sum=F('rollup_sum') + sum_delta,
+                                                                 rollup_count=F('rollup_count') + count_delta)
+        if updated:
+            continue
+        try:
+            with db_transaction.atomic():
+                TransactionRollup.objects.create(rollup_sum=sum_delta, rollup_count=count_delta, **key)
+        except IntegrityError:
+            # A concurrent request created the row first
+            TransactionRollup.objects.filter(**key).update(rollup_sum=F('rollup_sum') + sum_delta,
+                                                           rollup_count=F('rollup_count') + count_delta)
+    apply_checkpoint_deltas(account_id, balance_deltas)
+
+
+def previous_checkpoint(account_id: int, month: date) -> QuerySet:
+    """
+    Returns the query of the balance at the end of the last month with a checkpoint before the given month, read it
+    with first(), None means 0.
+    """
+    return BalanceCheckpoint.objects.filter(checkpoint_account_id=account_id, checkpoint_month__lt=month).order_by(
+        '-checkpoint_month').values_list('checkpoint_balance', flat=True)
+
+
+def apply_checkpoint_deltas(account_id: int, deltas: dict) -> None:
+    """
+    Adds balance changes to the monthly balance checkpoints of an account. A change moves the balance at the end of
+    its month and of every later month, all of them are updated with one UPDATE. Missing checkpoints are created
+    with the balance of the previous checkpoint first, read from the checkpoints between the changed months and
+    at most one previous_checkpoint query. Called by apply_rollup_deltas, in the database transaction of the write
+    after the account balance was updated, whose row lock serializes the writes of an account.
+    :param account_id: The id of the account.
+    :type account_id: int
+    :param deltas: A dict mapping the first days of months to signed balance changes.
+    :type deltas: dict
+    """
+    deltas = {month: delta for month, delta in sorted(deltas.items()) if delta}
+    if not deltas:
+        return
+    months = list(deltas)
+    checkpoints = BalanceCheckpoint.objects.filter(checkpoint_account_id=account_id)
+    existing = dict(checkpoints.filter(checkpoint_month__range=[months[0], months[-1]]).order_by(
+        'checkpoint_month').values_list('checkpoint_month', 'checkpoint_balance'))
+    created = []
+    # balance: the balance of the last checkpoint before the month, None until it is known
+    balance, earlier = None, iter(existing.items())
+    following = next(earlier, None)
+    for month in months:
+        while following is not None and following[0] < month:
+            balance = following[1]
+            following = next(earlier, None)
+        if month in existing:
+            continue
+        if balance is None:
+            balance = previous_checkpoint(account_id, month).first() or Decimal(0)
+        created.append(BalanceCheckpoint(checkpoint_account_id=account_id, checkpoint_month=month,
+                                         checkpoint_balance=balance))
+    BalanceCheckpoint.objects.bulk_create(created, ignore_conflicts=True)
+
+    # Every checkpoint gets the sum of the changes of its month and the months before
+    cumulative = Decimal(0)
+    conditions = []
+    for month, delta in deltas.items():
+        cumulative += delta
+        conditions.append(When(checkpoint_month__gte=month, then=Value(cumulative)))
+    output_field = DecimalField(max_digits=14, decimal_places=2)
+    checkpoints.filter(checkpoint_month__gte=next(iter(deltas))).update(
+        checkpoint_balance=F('checkpoint_balance') + Case(*reversed(conditions), output_field=output_field))
+
+
+def rebuild_checkpoints(account: Account = None, batch_size: int = 1000) -> int:
+    """
+    Recreates the balance checkpoints from the monthly rollup with one grouped query, the rollup has to be up to
+    date. Called by rebuild_rollup.
+    :param account: Rebuild only this account, every account if None.
+    :type account: Account
+    :param batch_size: Number of checkpoints per INSERT.
+    :type batch_size: int
+    :return: Number of created checkpoints.
+    :rtype: int
+    """
+    checkpoints = BalanceCheckpoint.objects.all()
+    rollups = TransactionRollup.objects.all()
+    if account is not None:
+        checkpoints = checkpoints.filter(checkpoint_account=account)
+        rollups = rollups.filter(rollup_account=account)
+    output_field = DecimalField(max_digits=20, decimal_places=2)
+    months = rollups.order_by().values('rollup_account_id', 'rollup_month').annotate(
+        balance=Sum(Case(When(rollup_type=1, then='rollup_sum'), default=-F('rollup_sum'),
+                         output_field=output_field))).order_by('rollup_account_id', 'rollup_month')
+
+    created = 0
+    with db_transaction.atomic():
+        checkpoints.delete()
+        batch = []
+        account_id, balance = None, Decimal(0)
+        for month in months.iterator(chunk_size=batch_size):
+            if month['rollup_account_id'] != account_id:
+                account_id, balance = month['rollup_account_id'], Decimal(0)
+            balance += month['balance']
+            batch.append(BalanceCheckpoint(checkpoint_account_id=account_id, checkpoint_month=month['rollup_month'],
+                                           checkpoint_balance=balance))
+            if len(batch) >= batch_size:
+                BalanceCheckpoint.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        BalanceCheckpoint.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def add_to_rollup(transaction: Transaction, sign: int = 1) -> None:
+    """
+    Adds a single transaction to the rollup, or removes it with sign=-1.
+    :param transaction: The saved transaction.
+    :type transaction: Transaction
+    :param sign: 1 to add the transaction, -1 to remove it.
+    :type sign: int
+    """
+    apply_rollup_deltas(transaction.transaction_account_id, {
+        (transaction.transaction_date, transaction.transaction_type, transaction.transaction_category_id):
+            (sign * transaction.transaction_sum, sign)})
+
+
+def rebuild_rollup(account: Account = None, batch_size: int = 1000) -> int:
+    """
+    Recreates the rollup rows from the raw transactions, and the balance checkpoints from the rollup, and increments
+    the versions of the accounts.
+    :param account: Rebuild only this account, every account if None.
+    :type account: Account
+    :param batch_size: Number of rollup rows per INSERT.
+    :type batch_size: int
+    :return: Number of created rollup rows.
+    :rtype: int
+    """
+    rollups = TransactionRollup.objects.all()
+    transactions = Transaction.objects.all()
+    if account is not None:
+        rollups = rollups.filter(rollup_account=account)
+        transactions = transactions.filter(transaction_account=account)
+    groups = transactions.order_by().annotate(month=TruncMonth('transaction_date')).values(
+        'transaction_account_id', 'month', 'transaction_type', 'transaction_category_id').annotate(
+        total=Sum('transaction_sum'), count=Count('id'))
+
+    created = 0
+    with db_transaction.atomic():
+        rollups.delete()
+        batch = []
+        for group in groups.iterator(chunk_size=batch_size):
+            batch.append(TransactionRollup(rollup_account_id=group['transaction_account_id'],
+                                           rollup_month=group['month'], rollup_type=group['transaction_type'],
+                                           rollup_category_id=group['transaction_category_id'],
+                                           rollup_sum=group['total'], rollup_count=group['count']))
+            if len(batch) >= batch_size:
+                TransactionRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        TransactionRollup.objects.bulk_create(batch)
+        created += len(batch)
+        rebuild_checkpoints(account, batch_size)
+        # The statistics read from the rollup may change, invalidate the cached responses
+        touch_accounts(Account.objects.all() if account is None else Account.objects.filter(pk=account.pk))
+    return created
+
+
+def split_range(start: date, end: date) -> tuple:
+    """
+    Splits a date range into the full months that can be answered from the rollup and the partial months at the
+    edges that need the raw transactions.
+    :param start: First day of the range.
+    :type start: date
+    :param end: Last day of the range, inclusive.
+    :type end: date
+    :return: The (first_month, end_month) half-open range of full months, None if there is no full month, and a
+    list of inclusive (start, end) ranges that must be read from the raw transactions.
+    :rtype: tuple
+    """
+    try:
+        full_start = start if start.day == 1 else next_month(start)
+    except OverflowError:
+        # The range starts within December 9999, the last month of date
+        return None, [(start, end)]
+    try:
+        full_end = next_month(end) if next_month(end) - timedelta(days=1) == end else month_start(end)
+    except OverflowError:
+        # December 9999 has no following month to end a half-open range, it is read from the raw transactions
+        full_end = month_start(end)
+    if full_start >= full_end:
+        return None, [(start, end)]
+    edges = []
+    if start < full_start:
+        edges.append((start, full_start - timedelta(days=1)))
+    if full_end <= end:
+        edges.append((full_end, end))
+    return (full_start, full_end), edges
+
@@ -0,0 +1,117 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+
+# True while a read-only view runs, its queries may then be sent to the replica
+_replica_reads = ContextVar('hb_replica_reads', default=False)
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def replica_alias():
+    """
+    Returns the alias of the replica database (HB_REPLICA_DATABASE setting), None without a replica.
+    """
+    return getattr(settings, 'HB_REPLICA_DATABASE', None)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends the reads of views decorated with route_database to the replica and everything else to the primary
+    (default) database. Without HB_REPLICA_DATABASE every query goes to the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        if {obj1._state.db, obj2._state.db} <= {'default', replica_alias()}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary
+        if db == replica_alias():
+            return False
+        return None
+
+
+@contextmanager
+def replica_reads(enabled: bool = True):
+    """
+    Sends the reads of the block to the replica (or, with enabled=False, to the primary).
+    """
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def sticky_key(user_id: int) -> str:
+    return f'hb:replica-sticky:{user_id}'
+
+
+def sticky_seconds() -> int:
+    return getattr(settings, 'HB_REPLICA_STICKY_SECONDS', 10)
+
+
+def sticky_cache():
+    return caches[getattr(settings, 'HB_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def use_replica(request: HttpRequest) -> bool:
+    """
+    Decides where the reads of a request go. Writes mark the user as sticky before the view runs, so the user's own
+    reads are served by the primary until the replica has caught up (HB_REPLICA_STICKY_SECONDS).
+    """
+    if replica_alias() is None:
+        return False
+    if request.method not in READ_METHODS:
+        sticky_cache().set(sticky_key(request.user.pk), True, sticky_seconds())
+        return False
+    return sticky_cache().get(sticky_key(request.user.pk)) is None
+
+
+async def ause_replica(request: HttpRequest) -> bool:
+    """
+    Async version of use_replica.
+    """
+    if replica_alias() is None:
+        return False
+    if request.method not in READ_METHODS:
+        await sticky_cache().aset(sticky_key(request.user.pk), True, sticky_seconds())
+        return False
+    return await sticky_cache().aget(sticky_key(request.user.pk)) is None
+
+
+def route_database(view):
+    """
+    Routes the queries of a sync or async view for an authenticated user: GET requests read from the replica unless
+    the user wrote within the last HB_REPLICA_STICKY_SECONDS, other requests use the primary and start that window.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            with replica_reads(await ause_replica(request)):
+                return await view(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        with replica_reads(use_replica(request)):
+            return view(request, *args, **kwargs)
+
+    return wrapper
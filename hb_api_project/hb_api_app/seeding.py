@@ -0,0 +1,177 @@
+import math
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+
+from .models import Account, Transaction, TransactionCategory, PlanningTransaction
+
+DEFAULT_CATEGORIES = [(0, 'food'), (0, 'transport'), (0, 'rent'), (0, 'health'), (0, 'entertainment'),
+                      (0, 'clothes'), (0, 'utilities'), (1, 'salary'), (1, 'gift'), (1, 'interest')]
+
+
+def seed_categories(names: list = None) -> list:
+    """
+    Creates the transaction categories that do not exist yet.
+    :param names: A list of (category_type, category_name) pairs, DEFAULT_CATEGORIES if omitted.
+    :type names: list
+    :return: All categories with the given names.
+    :rtype: list
+    """
+    names = names or DEFAULT_CATEGORIES
+    existing = set(TransactionCategory.objects.filter(
+        category_name__in=[name for _, name in names]).values_list('category_name', flat=True))
+    TransactionCategory.objects.bulk_create(
+        [TransactionCategory(category_type=category_type, category_name=name)
+         for category_type, name in names if name not in existing])
+    return list(TransactionCategory.objects.filter(category_name__in=[name for _, name in names]).order_by('pk'))
+
+
+def seed_accounts(count: int, prefix: str = 'seed_user') -> list:
+    """
+    Creates users with one account each. Passwords are unusable, the users are meant for benchmarks only.
+    :param count: Number of users to create.
+    :type count: int
+    :param prefix: Username prefix.
+    :type prefix: str
+    :return: The created accounts.
+    :rtype: list
+    """
+    users = User.objects.bulk_create([User(username=f'{prefix}_{i}', password='!') for i in range(count)])
+    if not all(user.pk for user in users):
+        users = list(User.objects.filter(username__in=[user.username for user in users]))
+    return Account.objects.bulk_create([Account(account_owner=user, account_number=str(user.pk)) for user in users])
+
+
+def iter_transactions(account: Account, categories: list, count: int, rng: random.Random, start_date: date,
+                      days: int):
+    """
+    Generates unsaved Transaction objects with random dates, categories and sums.
+    :param account: The account the transactions belong to.
+    :param categories: Categories to choose from, the transaction type follows the category type.
+    :param count: Number of transactions to generate.
+    :param rng: Random generator, seeded by the caller.
+    :param start_date: The date of the oldest transaction.
+    :param days: Length of the generated history in days.
+    """
+    for _ in range(count):
+        category = rng.choice(categories)
+        yield Transaction(transaction_account=account, transaction_type=category.category_type,
+                          transaction_category=category,
+                          transaction_date=start_date + timedelta(days=rng.randrange(days)),
+                          transaction_sum=Decimal(rng.randint(1, 100000)) / 100,
+                          transaction_comment=category.category_name)
+
+
+def iter_planning_transactions(account: Account, categories: list, count: int, rng: random.Random, start_date: date,
+                               days: int):
+    """
+    Generates unsaved PlanningTransaction objects, see iter_transactions.
+    """
+    for _ in range(count):
+        category = rng.choice(categories)
+        yield PlanningTransaction(transaction_account_plan=account, transaction_type_plan=category.category_type,
+                                  transaction_category_plan=category,
+                                  transaction_date_plan=start_date + timedelta(days=rng.randrange(days)),
+                                  transaction_sum_plan=Decimal(rng.randint(1, 100000)) / 100,
+                                  transaction_comment_plan=category.category_name)
+
+
+# category name: (share of the irregular transactions, median sum, spread of the log-normal sum distribution)
+CATEGORY_PROFILES = {'food': (45, 18, 0.7), 'transport': (25, 6, 0.5), 'entertainment': (10, 35, 0.8),
+                     'health': (5, 40, 0.9), 'clothes': (6, 60, 0.7), 'utilities': (2, 90, 0.4),
+                     'gift': (1, 100, 0.8)}
+# category name: (median sum, spread), booked once a month on a fixed day of the account
+MONTHLY_PROFILES = {'salary': (2500, 0.15), 'rent': (900, 0.0), 'interest': (4, 0.5)}
+DEFAULT_PROFILE = (3, 30, 0.8)
+# Relative number of transactions from Monday to Sunday
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 1.1, 1.3, 1.6, 1.2)
+
+
+def lognormal_sum(rng: random.Random, median: float, spread: float) -> Decimal:
+    """
+    Returns a random positive transaction sum with the given median.
+    """
+    value = rng.lognormvariate(math.log(median), spread) if spread else median
+    return max(Decimal('0.01'), min(Decimal(round(value, 2)).quantize(Decimal('0.01')), Decimal('99999.99')))
+
+
+def iter_realistic_transactions(account: Account, categories: list, count: int, rng: random.Random,
+                                start_date: date, end_date: date):
+    """
+    Generates about count unsaved Transaction objects between start_date and end_date month by month. Salary, rent
+    and interest are booked once a month on a fixed day, the other categories are spread over the days with more
+    transactions on weekends and log-normal sums (CATEGORY_PROFILES). Foreign keys are set by id only.
+    :param account: The account the transactions belong to.
+    :param categories: Categories to choose from, the transaction type follows the category type.
+    :param count: Number of transactions to generate.
+    :param rng: Random generator, seeded by the caller.
+    :param start_date: The date of the oldest transaction.
+    :param end_date: The date of the newest transaction.
+    """
+    monthly = [(category, rng.randint(1, 28)) for category in categories if category.category_name in MONTHLY_PROFILES]
+    irregular = [category for category in categories if category.category_name not in MONTHLY_PROFILES]
+    weights = [CATEGORY_PROFILES.get(category.category_name, DEFAULT_PROFILE)[0] for category in irregular]
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    months = {}
+    for day in days:
+        months.setdefault((day.year, day.month), []).append(day)
+    remaining = max(count - len(monthly) * len(months), 0)
+
+    for index, month_days in enumerate(months.values()):
+        by_day = {day.day: day for day in month_days}
+        for category, day in monthly:
+            if day in by_day:
+                yield Transaction(transaction_account_id=account.pk, transaction_type=category.category_type,
+                                  transaction_category_id=category.pk, transaction_date=by_day[day],
+                                  transaction_sum=lognormal_sum(rng, *MONTHLY_PROFILES[category.category_name]),
+                                  transaction_comment=category.category_name)
+        if not irregular:
+            continue
+        # Spread the remaining transactions evenly, the earlier months get the rounding remainder
+        month_count = remaining // len(months) + (index < remaining % len(months))
+        month_categories = rng.choices(irregular, weights, k=month_count)
+        month_dates = rng.choices(month_days, [WEEKDAY_WEIGHTS[day.weekday()] for day in month_days], k=month_count)
+        for category, transaction_date in zip(month_categories, month_dates):
+            _, median, spread = CATEGORY_PROFILES.get(category.category_name, DEFAULT_PROFILE)
+            yield Transaction(transaction_account_id=account.pk, transaction_type=category.category_type,
+                              transaction_category_id=category.pk, transaction_date=transaction_date,
+                              transaction_sum=lognormal_sum(rng, median, spread),
+                              transaction_comment=category.category_name)
+
+
+def as_planning_transactions(transactions):
+    """
+    Converts unsaved Transaction objects to unsaved PlanningTransaction objects with the same values.
+    """
+    for transaction in transactions:
+        yield PlanningTransaction(transaction_account_plan_id=transaction.transaction_account_id,
+                                  transaction_type_plan=transaction.transaction_type,
+                                  transaction_category_plan_id=transaction.transaction_category_id,
+                                  transaction_date_plan=transaction.transaction_date,
+                                  transaction_sum_plan=transaction.transaction_sum,
+                                  transaction_comment_plan=transaction.transaction_comment)
+
+
+def bulk_insert(model, objects, batch_size: int = 5000) -> int:
+    """
+    Inserts objects from an iterable in batches without materializing the whole iterable.
+    :param model: The model class of the objects.
+    :param objects: An iterable of unsaved model instances.
+    :param batch_size: Number of rows per INSERT.
+    :return: Number of inserted rows.
+    :rtype: int
+    """
+    inserted = 0
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        inserted += len(batch)
+    return inserted
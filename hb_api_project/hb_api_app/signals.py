@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .balance import touch_account
+from .category_cache import invalidate_catalog
+from .db import configure_connection
+from .models import TransactionCategory, TransactionRollup, PlanningTransaction
+from .rollup import apply_rollup_deltas
+
+
+@receiver(post_save, sender=TransactionCategory)
+@receiver(post_delete, sender=TransactionCategory)
+def category_changed(sender, **kwargs):
+    invalidate_catalog()
+    # Drop the catalog again after commit, in case another thread reloaded it before the change was visible
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(pre_delete, sender=TransactionCategory)
+def category_deleted(sender, instance, **kwargs):
+    """
+    Moves the rollup rows of a deleted category to the default category 0, like the transactions (SET_DEFAULT). The
+    rows are merged into the existing rows of category 0 first, SET_DEFAULT alone would break the unique constraint.
+    """
+    if instance.pk == 0:
+        return
+    rows = TransactionRollup.objects.filter(rollup_category=instance)
+    deltas = {}
+    for row in rows:
+        account_deltas = deltas.setdefault(row.rollup_account_id, {})
+        account_deltas[row.rollup_month, row.rollup_type, instance.pk] = (-row.rollup_sum, -row.rollup_count)
+        account_deltas[row.rollup_month, row.rollup_type, 0] = (row.rollup_sum, row.rollup_count)
+    for account_id, account_deltas in deltas.items():
+        apply_rollup_deltas(account_id, account_deltas)
+    rows.delete()
+
+
+@receiver(post_save, sender=PlanningTransaction)
+@receiver(post_delete, sender=PlanningTransaction)
+def planning_transaction_changed(sender, instance, raw=False, **kwargs):
+    """
+    Increments the account version on every save and delete of a planned transaction, the planning views rely on
+    it. The transaction writes increment it in apply_balance_delta, together with the balance.
+    """
+    if not raw:
+        touch_account(instance.transaction_account_plan_id)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    configure_connection(connection)
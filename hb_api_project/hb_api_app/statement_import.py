@@ -0,0 +1,191 @@
+import csv
+import hashlib
+import re
+from datetime import date
+from decimal import Decimal
+
+from .category_cache import get_catalog
+from .ingest import parse_transaction_item, save_transactions
+from .models import Account, Transaction
+
+MAX_REPORTED_ERRORS = 100
+
+TYPE_NAMES = {'expense': 0, '0': 0, 'income': 1, '1': 1}
+
+
+class StatementError(ValueError):
+    """
+    Raised when a statement cannot be read to the end, e.g. because it is not UTF-8 or not valid CSV. The result
+    attribute holds the counts of the batches saved before the error.
+    """
+
+    def __init__(self, message: str, result: dict):
+        super().__init__(message)
+        self.result = result
+
+
+# An integer part with thousands separators: 1,234 or 1.234.567
+GROUPED = {separator: re.compile(rf'[-+]?\d{{1,3}}(?:{re.escape(separator)}\d{{3}})+') for separator in ',.'}
+
+
+def normalize_amount(amount: str) -> str:
+    """
+    Converts a statement amount to the notation of Decimal. Spaces and apostrophes are thousands separators. With
+    both a comma and a dot the last one is the decimal separator ("1,234.56", "1.234,56"). A single kind of
+    separator is a thousands separator when it groups the digits by three ("1,234", "1.234.567"), otherwise the
+    decimal separator ("12,50"), so "1,234" is 1234 and not 1.234. Amounts that do not fit these rules are returned
+    unchanged and fail as invalid.
+    :param amount: The amount column of the statement.
+    :type amount: str
+    :rtype: str
+    """
+    amount = re.sub(r"[\s']", '', amount or '')
+    if ',' in amount and '.' in amount:
+        decimal_separator = ',' if amount.rfind(',') > amount.rfind('.') else '.'
+    elif ',' in amount:
+        decimal_separator = '.' if GROUPED[','].fullmatch(amount) else ','
+    elif amount.count('.') > 1 and GROUPED['.'].fullmatch(amount):
+        decimal_separator = ','
+    else:
+        return amount
+    thousands_separator = '.' if decimal_separator == ',' else ','
+    integer, _, fraction = amount.partition(decimal_separator)
+    if (decimal_separator in fraction or thousands_separator in fraction or
+            (thousands_separator in integer and not GROUPED[thousands_separator].fullmatch(integer))):
+        return amount
+    integer = integer.replace(thousands_separator, '')
+    return f'{integer}.{fraction}' if fraction else integer
+
+
+def signed_item(line: int, transaction_date: str, amount: str, category: str, comment: str,
+                transaction_type: str = None) -> tuple:
+    """
+    Converts a statement row to a transaction item. Without an explicit type the sign of the amount decides
+    between income and expense.
+    :return: The line number and the item in the format of parse_transaction_item.
+    :rtype: tuple
+    """
+    amount = normalize_amount(amount)
+    if transaction_type:
+        transaction_type = TYPE_NAMES.get(transaction_type.strip().lower(), transaction_type)
+    else:
+        transaction_type = 0 if amount.startswith('-') else 1
+    return line, {'transaction_type': transaction_type, 'transaction_category': category,
+                  'transaction_date': transaction_date, 'transaction_sum': amount,
+                  'transaction_comment': (comment or '').strip()[:255]}
+
+
+def iter_csv_rows(lines, default_category: str):
+    """
+    Yields transaction items from a CSV statement with a header row. Recognized columns are date, amount (or sum),
+    type, category and comment (or description). Rows are read one at a time.
+    :param lines: An iterable of text lines, e.g. a file opened in text mode.
+    :param default_category: Category of rows without a category column.
+    :type default_category: str
+    """
+    reader = csv.DictReader(lines)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        yield signed_item(reader.line_num, (row.get('date') or '').strip(), row.get('amount', row.get('sum')),
+                          (row.get('category') or '').strip() or default_category,
+                          row.get('comment', row.get('description')), row.get('type'))
+
+
+OFX_TAG = re.compile(r'<(/?)(\w+)>([^<\r\n]*)')
+
+
+def iter_ofx_rows(lines, default_category: str):
+    """
+    Yields transaction items from the STMTTRN blocks of an OFX (SGML or XML) statement, reading it line by line.
+    :param lines: An iterable of text lines.
+    :param default_category: Category of every row, OFX has no categories.
+    :type default_category: str
+    """
+    current = None
+    for line_number, line in enumerate(lines, start=1):
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    posted = current.get('DTPOSTED', '')[:8]
+                    posted = f'{posted[:4]}-{posted[4:6]}-{posted[6:8]}' if len(posted) == 8 else posted
+                    yield signed_item(current['line'], posted, current.get('TRNAMT'), default_category,
+                                      current.get('MEMO') or current.get('NAME'))
+                    current = None
+                elif not closing:
+                    current = {'line': line_number}
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+
+
+STATEMENT_FORMATS = {'csv': iter_csv_rows, 'ofx': iter_ofx_rows}
+
+
+def row_hash(transaction_date: date, transaction_sum: Decimal, transaction_comment: str) -> bytes:
+    """
+    Returns the deduplication key of a transaction.
+    """
+    transaction_sum = Decimal(transaction_sum).quantize(Decimal('0.01'))
+    return hashlib.sha1(f'{transaction_date.isoformat()}|{transaction_sum}|{transaction_comment}'.encode()).digest()
+
+
+def import_transactions(account: Account, rows, batch_size: int = 1000) -> dict:
+    """
+    Imports statement rows in batches. Categories are resolved from the category cache. Every batch is deduplicated
+    against the transactions already stored for its dates (including the earlier batches) and against itself, then
+    saved with save_transactions in its own database transaction. Memory use depends on the batch size, not on the
+    size of the statement.
+    :param account: The account the transactions are imported to.
+    :type account: Account
+    :param rows: An iterable of (line, item) pairs as yielded by iter_csv_rows or iter_ofx_rows.
+    :param batch_size: Number of rows per batch.
+    :type batch_size: int
+    :return: The number of imported, duplicate and invalid rows and the first MAX_REPORTED_ERRORS errors.
+    :rtype: dict
+    :raises StatementError: If the statement cannot be decoded or parsed, the rows of the unsaved batch are dropped.
+    """
+    category_ids = get_catalog().by_name
+    result = {'imported': 0, 'duplicates': 0, 'failed': 0, 'errors': []}
+
+    def flush(batch):
+        dates = {transaction.transaction_date for transaction in batch}
+        seen = {row_hash(*values) for values in Transaction.objects.filter(
+            transaction_account=account, transaction_date__in=dates).values_list(
+            'transaction_date', 'transaction_sum', 'transaction_comment').iterator()}
+        new = []
+        for transaction in batch:
+            key = row_hash(transaction.transaction_date, transaction.transaction_sum, transaction.transaction_comment)
+            if key in seen:
+                result['duplicates'] += 1
+            else:
+                seen.add(key)
+                new.append(transaction)
+        if new:
+            save_transactions(account, new, batch_size)
+        result['imported'] += len(new)
+
+    batch = []
+    rows = iter(rows)
+    while True:
+        try:
+            line, item = next(rows)
+        except StopIteration:
+            break
+        except UnicodeDecodeError as e:
+            raise StatementError('Statement is not UTF-8 encoded', result) from e
+        except csv.Error as e:
+            raise StatementError(f'Invalid statement: {e}', result) from e
+        try:
+            batch.append(Transaction(transaction_account=account, **parse_transaction_item(item, category_ids)))
+        except ValueError as e:
+            result['failed'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append({'line': line, 'error': str(e)})
+            continue
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return result
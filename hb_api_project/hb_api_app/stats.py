@@ -0,0 +1,198 @@
+from datetime import date
+
+from django.db.models import Sum, Case, When, Q, QuerySet, DecimalField, FloatField
+
+from .models import Account, Transaction, TransactionRollup
+from .recurrence import NONE, count_occurrences, schedule_rows
+from .rollup import split_range
+
+
+def category_totals_query(transactions: QuerySet, type_field: str, sum_field: str, category_field: str) -> QuerySet:
+    """
+    Returns the grouped query of income, expense and total sums per category.
+    :param transactions: The already filtered queryset of Transaction, PlanningTransaction or TransactionRollup.
+    :type transactions: QuerySet
+    :param type_field: Name of the transaction type field (0 - Expense, 1 - Income).
+    :type type_field: str
+    :param sum_field: Name of the transaction sum field.
+    :type sum_field: str
+    :param category_field: Lookup of the category name.
+    :type category_field: str
+    :return: A values queryset with category_field, income, expense and total keys, ordered by category name.
+    :rtype: QuerySet
+    """
+    output_field = DecimalField(max_digits=20, decimal_places=2)
+    return transactions.order_by().values(category_field).annotate(
+        income=Sum(Case(When(**{type_field: 1}, then=sum_field), output_field=output_field)),
+        expense=Sum(Case(When(**{type_field: 0}, then=sum_field), output_field=output_field)),
+        total=Sum(sum_field, output_field=output_field),
+    ).order_by(category_field)
+
+
+def category_rows(rows, category_field: str) -> list:
+    """
+    Converts the rows of category_totals_query to dicts with category, income, expense and total keys.
+    :rtype: list
+    """
+    return [{'category': row[category_field], 'income': row['income'], 'expense': row['expense'],
+             'total': row['total']} for row in rows]
+
+
+def overall_totals(rows: list) -> tuple:
+    """
+    Sums income and expense over the category rows returned by category_rows.
+    :param rows: The category rows.
+    :type rows: list
+    :return: Overall income and expense as floats, None if there were no rows of that type.
+    :rtype: tuple
+    """
+    incomes = [row['income'] for row in rows if row['income'] is not None]
+    expenses = [row['expense'] for row in rows if row['expense'] is not None]
+    return (float(sum(incomes)) if incomes else None,
+            float(sum(expenses)) if expenses else None)
+
+
+def merge_category_totals(*row_lists: list) -> list:
+    """
+    Merges category rows of several queries, adding up the sums of equal categories.
+    :return: The merged rows ordered by category name.
+    :rtype: list
+    """
+    merged = {}
+    for rows in row_lists:
+        for row in rows:
+            target = merged.setdefault(row['category'], {'category': row['category'], 'income': None,
+                                                         'expense': None, 'total': 0})
+            for key in ('income', 'expense', 'total'):
+                if row[key] is not None:
+                    target[key] = (target[key] or 0) + row[key]
+    return [merged[category] for category in sorted(merged)]
+
+
+ROLLUP_CATEGORY = 'rollup_category__category_name'
+TRANSACTION_CATEGORY = 'transaction_category__category_name'
+
+
+def transaction_statistic_queries(account: Account, start: date, end: date) -> list:
+    """
+    Returns the grouped queries of transaction_statistic_data. Full months are read from the monthly rollup, only
+    the partial months at the edges of the range are aggregated from the raw transactions.
+    :return: A list of (query, category field) pairs, at most two.
+    :rtype: list
+    """
+    months, edges = split_range(start, end)
+    queries = []
+    if months:
+        rollups = TransactionRollup.objects.filter(rollup_account=account, rollup_month__gte=months[0],
+                                                   rollup_month__lt=months[1], rollup_count__gt=0)
+        queries.append((category_totals_query(rollups, 'rollup_type', 'rollup_sum', ROLLUP_CATEGORY),
+                        ROLLUP_CATEGORY))
+    if edges:
+        edge_filter = Q()
+        for edge in edges:
+            edge_filter |= Q(transaction_date__range=edge)
+        transactions = Transaction.objects.filter(edge_filter, transaction_account=account)
+        queries.append((category_totals_query(transactions, 'transaction_type', 'transaction_sum',
+                                              TRANSACTION_CATEGORY), TRANSACTION_CATEGORY))
+    return queries
+
+
+def statistic_data_from_rows(row_lists: list) -> list:
+    """
+    Builds the statistic_data list from the category rows of the transaction_statistic_queries.
+    :rtype: list
+    """
+    rows = merge_category_totals(*row_lists)
+    overall_income, overall_expense = overall_totals(rows)
+    statistic_data = [{'overall_income': overall_income}, {'overall_expense': overall_expense}]
+    statistic_data.extend({row['category']: float(row['total'])} for row in rows)
+    return statistic_data
+
+
+def transaction_statistic_data(account: Account, start: date, end: date) -> list:
+    """
+    Builds the transaction_statistic response: overall income, overall expense and the sum for each category.
+    Full months are read from the monthly rollup, only the partial months at the edges of the range are aggregated
+    from the raw transactions, so the view costs at most two grouped queries.
+    :param account: The account of the user.
+    :type account: Account
+    :param start: First day of the period.
+    :type start: date
+    :param end: Last day of the period, inclusive.
+    :type end: date
+    :return: The statistic_data list.
+    :rtype: list
+    """
+    return statistic_data_from_rows([category_rows(query, category_field) for query, category_field
+                                     in transaction_statistic_queries(account, start, end)])
+
+
+async def atransaction_statistic_data(account: Account, start: date, end: date) -> list:
+    """
+    Async version of transaction_statistic_data.
+    :rtype: list
+    """
+    row_lists = []
+    for query, category_field in transaction_statistic_queries(account, start, end):
+        row_lists.append(category_rows([row async for row in query], category_field))
+    return statistic_data_from_rows(row_lists)
+
+
+PLANNED_TOTALS = {
+    'planned_income': Sum(Case(When(transaction_type_plan=1, then='transaction_sum_plan'),
+                               output_field=FloatField())),
+    'planned_expense': Sum(Case(When(transaction_type_plan=0, then='transaction_sum_plan'),
+                                output_field=FloatField())),
+}
+
+
+def planned_statistic_from_rows(totals: dict, schedules: list, start: date, end: date) -> list:
+    """
+    Adds the occurrences of the schedules in the period to the totals of the single planned transactions. The
+    occurrences are counted arithmetically, so a schedule costs the same for any period length.
+    :param totals: The PLANNED_TOTALS aggregate of the single planned transactions in the period.
+    :type totals: dict
+    :param schedules: The schedule_rows with the type and sum fields.
+    :type schedules: list
+    :return: The statistic_data list.
+    :rtype: list
+    """
+    for row in schedules:
+        count = count_occurrences(row['transaction_date_plan'], row['transaction_recurrence_plan'],
+                                  row['transaction_recurrence_end_plan'], start, end)
+        if count:
+            key = 'planned_income' if row['transaction_type_plan'] == 1 else 'planned_expense'
+            totals[key] = (totals[key] or 0) + float(row['transaction_sum_plan'] * count)
+    return [{'planned_income': totals['planned_income']}, {'planned_expense': totals['planned_expense']}]
+
+
+def planned_transaction_statistic_data(transactions: QuerySet, start: date, end: date) -> list:
+    """
+    Builds the planned_transaction_statistic response: planned income and planned expense. The single planned
+    transactions are summed in the database, the schedules (recurring planned transactions) are read once each and
+    multiplied by their number of occurrences in the period.
+    :param transactions: The PlanningTransaction queryset of the account.
+    :type transactions: QuerySet
+    :param start: First day of the period.
+    :type start: date
+    :param end: Last day of the period, inclusive.
+    :type end: date
+    :return: The statistic_data list.
+    :rtype: list
+    """
+    totals = transactions.filter(transaction_recurrence_plan=NONE,
+                                 transaction_date_plan__range=[start, end]).aggregate(**PLANNED_TOTALS)
+    schedules = list(schedule_rows(transactions, start, end, 'transaction_type_plan', 'transaction_sum_plan'))
+    return planned_statistic_from_rows(totals, schedules, start, end)
+
+
+async def aplanned_transaction_statistic_data(transactions: QuerySet, start: date, end: date) -> list:
+    """
+    Async version of planned_transaction_statistic_data.
+    :rtype: list
+    """
+    totals = await transactions.filter(transaction_recurrence_plan=NONE,
+                                       transaction_date_plan__range=[start, end]).aaggregate(**PLANNED_TOTALS)
+    schedules = [row async for row in schedule_rows(transactions, start, end, 'transaction_type_plan',
+                                                    'transaction_sum_plan')]
+    return planned_statistic_from_rows(totals, schedules, start, end)
@@ -0,0 +1,157 @@
+import base64
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Account, Transaction, PlanningTransaction, TransactionTombstone
+from .pagination import CursorError
+
+TRANSACTION = 0
+PLANNING_TRANSACTION = 1
+
+# name: (model, account field, change time field, fields of the returned rows)
+SYNC_STREAMS = {
+    'transactions': (Transaction, 'transaction_account', 'transaction_modified',
+                     ('id', 'transaction_date', 'transaction_type', 'transaction_category__category_name',
+                      'transaction_sum', 'transaction_comment', 'transaction_modified')),
+    'planned_transactions': (PlanningTransaction, 'transaction_account_plan', 'transaction_modified_plan',
+                             ('id', 'transaction_date_plan', 'transaction_type_plan',
+                              'transaction_category_plan__category_name', 'transaction_sum_plan',
+                              'transaction_comment_plan', 'transaction_recurrence_plan',
+                              'transaction_recurrence_end_plan', 'transaction_modified_plan')),
+    'deleted': (TransactionTombstone, 'tombstone_account', 'tombstone_deleted',
+                ('id', 'tombstone_kind', 'tombstone_object_id', 'tombstone_deleted')),
+}
+
+
+class SyncTokenExpired(ValueError):
+    """Raised when the tombstones a sync token needs were already pruned, the client has to sync from scratch."""
+
+
+def overlap() -> timedelta:
+    """
+    Returns HB_SYNC_OVERLAP_SECONDS. Change times are taken before the commit, so a caught-up stream restarts this
+    far in the past: rows committed up to this long after their change time are not missed, but may be sent twice.
+    """
+    return timedelta(seconds=getattr(settings, 'HB_SYNC_OVERLAP_SECONDS', 5))
+
+
+def tombstone_retention() -> timedelta:
+    return timedelta(days=getattr(settings, 'HB_SYNC_TOMBSTONE_DAYS', 90))
+
+
+def encode_token(cursors: dict) -> str:
+    """
+    Encodes the (change time, id) positions of the streams of SYNC_STREAMS into an opaque token.
+    :param cursors: Maps the stream names to (datetime, id) pairs or None for the start of the stream.
+    :type cursors: dict
+    :return: URL safe token string.
+    :rtype: str
+    """
+    parts = [f'{cursor[0].isoformat()},{cursor[1]}' if cursor else '' for cursor in
+             (cursors[name] for name in SYNC_STREAMS)]
+    return base64.urlsafe_b64encode('|'.join(parts).encode()).decode().rstrip('=')
+
+
+def decode_token(token: str) -> dict:
+    """
+    Decodes a token created by encode_token.
+    :param token: The token string.
+    :type token: str
+    :return: The stream cursors.
+    :rtype: dict
+    """
+    try:
+        parts = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode().split('|')
+        if len(parts) != len(SYNC_STREAMS):
+            raise ValueError('Wrong number of streams')
+        cursors = {}
+        for name, part in zip(SYNC_STREAMS, parts):
+            if part:
+                changed, row_id = part.split(',')
+                cursors[name] = (datetime.fromisoformat(changed), int(row_id))
+            else:
+                cursors[name] = None
+        return cursors
+    except ValueError as e:
+        raise CursorError('Invalid token') from e
+
+
+def add_tombstone(account_id: int, kind: int, object_id: int) -> None:
+    """
+    Records the deletion of a transaction (kind TRANSACTION) or planned transaction (PLANNING_TRANSACTION). Call it
+    in the database transaction of the delete.
+    """
+    TransactionTombstone.objects.create(tombstone_account_id=account_id, tombstone_kind=kind,
+                                        tombstone_object_id=object_id)
+
+
+def prune_tombstones(before: datetime = None) -> int:
+    """
+    Deletes the tombstones older than HB_SYNC_TOMBSTONE_DAYS (or before the given time).
+    :return: The number of deleted tombstones.
+    :rtype: int
+    """
+    deleted, _ = TransactionTombstone.objects.filter(
+        tombstone_deleted__lt=before or timezone.now() - tombstone_retention()).delete()
+    return deleted
+
+
+def sync_changes(account: Account, token: str, limit: int) -> dict:
+    """
+    Returns the transactions and planned transactions of an account that were added or changed, and the ids of
+    those that were deleted, since the token. Every stream is read in (change time, id) order from the position
+    stored in the token with an index range scan, so the cost depends on the number of changes, not on the size of
+    the history. Without a token all rows are returned (deletions only from now on).
+    :param account: The account of the user.
+    :type account: Account
+    :param token: The next_token of the previous sync or None.
+    :type token: str
+    :param limit: Maximum number of rows per stream.
+    :type limit: int
+    :return: The changes, next_token and has_more, which is true while any stream has more rows.
+    :rtype: dict
+    :raises CursorError: If the token can not be decoded.
+    :raises SyncTokenExpired: If the token is older than the tombstone retention.
+    """
+    started = timezone.now()
+    if token:
+        cursors = decode_token(token)
+        deleted_cursor = cursors['deleted']
+        if deleted_cursor is None or deleted_cursor[0] < started - tombstone_retention():
+            raise SyncTokenExpired('Sync token expired')
+    else:
+        cursors = dict.fromkeys(SYNC_STREAMS)
+        cursors['deleted'] = (started - overlap(), 0)
+
+    data = {}
+    has_more = False
+    for name, (model, account_field, changed_field, fields) in SYNC_STREAMS.items():
+        rows = model.objects.filter(**{account_field: account})
+        if cursors[name]:
+            changed, row_id = cursors[name]
+            rows = rows.filter(Q(**{f'{changed_field}__gt': changed}) | Q(**{changed_field: changed,
+                                                                             'id__gt': row_id}))
+        rows = list(rows.order_by(changed_field, 'id').values(*fields)[:limit + 1])
+        if len(rows) > limit:
+            rows = rows[:limit]
+            has_more = True
+            cursors[name] = (rows[-1][changed_field], rows[-1]['id'])
+        else:
+            # The stream is caught up, restart it a bit in the past in case of changes that are not committed yet.
+            # The restart also advances streams without changes, a token of a client that syncs regularly keeps
+            # its deleted cursor within the tombstone retention even if nothing is ever deleted.
+            cursors[name] = (started - overlap(), 0)
+        data[name] = rows
+
+    tombstones = data.pop('deleted')
+    data['deleted'] = {
+        'transactions': [row['tombstone_object_id'] for row in tombstones if row['tombstone_kind'] == TRANSACTION],
+        'planned_transactions': [row['tombstone_object_id'] for row in tombstones
+                                 if row['tombstone_kind'] == PLANNING_TRANSACTION],
+    }
+    data['next_token'] = encode_token(cursors)
+    data['has_more'] = has_more
+    return data
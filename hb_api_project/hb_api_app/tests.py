@@ -1,9 +1,40 @@
+import json
+import tempfile
+from importlib import import_module
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal
+from unittest import mock
 
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection, connections, router
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Sum, Min, Max
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
 
-from .models import Account, TransactionCategory, Transaction, PlanningTransaction
+from . import async_views, checks, forecast, urls
+from .category_cache import get_catalog, invalidate_catalog, category_ids, category_names
+from .instrumentation import histograms
+from .management.commands import benchmark_api
+from .balance_history import balance_on
+from .models import Account, TransactionCategory, Transaction, PlanningTransaction, TransactionRollup, \
+    BalanceCheckpoint
+from .recurrence import DAILY, WEEKLY, MONTHLY, add_months, count_occurrences, iter_occurrences
+from .responses import JSON_ENCODERS, available_encoders, JsonResponse
+from .rollup import rebuild_rollup, split_range
+from .routers import PrimaryReplicaRouter, replica_reads, route_database
+from .statement_import import iter_ofx_rows, normalize_amount
+from .stats import transaction_statistic_data
+from .sync import encode_token
 from django.utils import timezone
 
 
@@ -152,4 +183,1785 @@ class PlanningTransactionModelTest(TestCase):
         """
         self.user.delete()
         self.category.delete()
-        self.account.delete()
\ No newline at end of file
+        self.account.delete()
+
+
+# The tests get their own cache instead of the one configured in the settings
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'hb_api_tests'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ViewTestCase(TestCase):
+    def setUp(self):
+        """
+        Clears the process wide caches, the rolled back data of earlier tests may still be cached under reused ids.
+        """
+        caches['default'].clear()
+        invalidate_catalog()
+
+
+class TransactionStatisticViewTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        self.client.force_login(self.user)
+
+    def add_transactions(self, category_count):
+        """
+        Creates an expense category with two transactions and one income transaction for each of category_count
+        categories.
+        """
+        salary, _ = TransactionCategory.objects.get_or_create(category_type=1, category_name='salary')
+        first = TransactionCategory.objects.filter(category_type=0).count()
+        for i in range(first, first + category_count):
+            category = TransactionCategory.objects.create(category_type=0, category_name=f'category_{i}')
+            for transaction_sum in (Decimal('10.50'), Decimal('4.50')):
+                Transaction.objects.create(transaction_account=self.account, transaction_type=0,
+                                           transaction_category=category, transaction_date=date(2023, 2, 10),
+                                           transaction_sum=transaction_sum, transaction_comment='test')
+            Transaction.objects.create(transaction_account=self.account, transaction_type=1,
+                                       transaction_category=salary, transaction_date=date(2023, 2, 11),
+                                       transaction_sum=Decimal('100.00'), transaction_comment='test')
+        rebuild_rollup(self.account)
+
+    def get_statistic(self, start='2023-02-01', end='2023-02-27'):
+        return self.client.get('/api/transaction/statistic',
+                               {'transaction_start_date': start, 'transaction_end_date': end})
+
+    def test_statistic_response(self):
+        """
+        This test checks the overall sums and the per category sums of the statistic.
+        """
+        self.add_transactions(2)
+        response = self.get_statistic()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['statistic_data'], [
+            {'overall_income': 200.0}, {'overall_expense': 30.0},
+            {'category_0': 15.0}, {'category_1': 15.0}, {'salary': 200.0}])
+
+    def test_statistic_empty_range(self):
+        """
+        This test checks that an empty period reports None for the overall sums and no categories.
+        """
+        response = self.get_statistic()
+        self.assertEqual(response.json()['statistic_data'], [{'overall_income': None}, {'overall_expense': None}])
+
+    def test_statistic_query_count_is_constant(self):
+        """
+        This test checks that the number of queries does not grow with the number of categories.
+        """
+        self.add_transactions(1)
+        with CaptureQueriesContext(connection) as few_categories:
+            self.get_statistic()
+        self.add_transactions(10)
+        with CaptureQueriesContext(connection) as many_categories:
+            self.get_statistic()
+        self.assertEqual(len(few_categories), len(many_categories))
+
+        with self.assertNumQueries(2):
+            transaction_statistic_data(self.account, date(2023, 1, 15), date(2023, 3, 15))
+
+    def test_statistic_from_rollup(self):
+        """
+        This test checks that a range made of full months and partial edges gives the same result as the raw rows.
+        """
+        self.add_transactions(2)
+        for day in (date(2023, 1, 14), date(2023, 1, 20), date(2023, 3, 15), date(2023, 3, 16)):
+            self.client.post('/api/transaction/add', {
+                'transaction_type': '0', 'transaction_category': 'category_0', 'transaction_date': day.isoformat(),
+                'transaction_sum': '1.00', 'transaction_comment': 'edge'}, content_type='application/json')
+        response = self.get_statistic('2023-01-15', '2023-03-15')
+        self.assertEqual(response.json()['statistic_data'], [
+            {'overall_income': 200.0}, {'overall_expense': 32.0},
+            {'category_0': 17.0}, {'category_1': 15.0}, {'salary': 200.0}])
+
+    def test_statistic_until_last_date(self):
+        """
+        This test checks the statistic of ranges ending in December 9999, the last month of date.
+        """
+        self.add_transactions(1)
+        for end in ('9999-12-30', '9999-12-31'):
+            response = self.get_statistic('2023-02-01', end)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['statistic_data'][:2], [{'overall_income': 100.0},
+                                                                     {'overall_expense': 15.0}])
+
+
+class TransactionRollupTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account, a category and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        self.category = TransactionCategory.objects.create(category_type=0, category_name='food')
+        self.client.force_login(self.user)
+
+    def add_transaction(self, day, transaction_sum):
+        response = self.client.post('/api/transaction/add', {
+            'transaction_type': '0', 'transaction_category': 'food', 'transaction_date': day,
+            'transaction_sum': transaction_sum, 'transaction_comment': 'test'}, content_type='application/json')
+        return response.json()['transaction']
+
+    def rollup(self):
+        return list(TransactionRollup.objects.filter(rollup_count__gt=0).order_by('rollup_month').values_list(
+            'rollup_month', 'rollup_type', 'rollup_category', 'rollup_sum', 'rollup_count'))
+
+    def test_add_and_delete_maintain_rollup(self):
+        """
+        This test checks that transaction_add and transaction_delete keep the rollup equal to a full rebuild.
+        """
+        self.add_transaction('2023-02-10', '10.00')
+        second = self.add_transaction('2023-02-20', '5.50')
+        self.add_transaction('2023-03-01', '1.00')
+        self.client.post(f'/api/transaction/{second}/delete')
+        self.assertEqual(self.rollup(), [
+            (date(2023, 2, 1), 0, self.category.id, Decimal('10.00'), 1),
+            (date(2023, 3, 1), 0, self.category.id, Decimal('1.00'), 1)])
+        maintained = self.rollup()
+        rebuild_rollup()
+        self.assertEqual(self.rollup(), maintained)
+
+    def test_category_delete_moves_rollup(self):
+        """
+        This test checks that deleting a category moves its rollup rows to the default category 0 like its
+        transactions, merged with the existing rows of category 0, and keeps the rollup equal to a full rebuild.
+        """
+        TransactionCategory.objects.create(id=0, category_type=0, category_name='other')
+        self.add_transaction('2023-02-10', '10.00')
+        self.add_transaction('2023-03-01', '1.00')
+        self.client.post('/api/transaction/add', {
+            'transaction_type': '0', 'transaction_category': 'other', 'transaction_date': '2023-02-11',
+            'transaction_sum': '2.00', 'transaction_comment': 'test'}, content_type='application/json')
+        self.category.delete()
+        self.assertEqual(self.rollup(), [(date(2023, 2, 1), 0, 0, Decimal('12.00'), 2),
+                                         (date(2023, 3, 1), 0, 0, Decimal('1.00'), 1)])
+        self.assertFalse(Transaction.objects.exclude(transaction_category=0).exists())
+        maintained = self.rollup()
+        rebuild_rollup()
+        self.assertEqual(self.rollup(), maintained)
+
+    def test_split_range(self):
+        """
+        This test checks how a period is split into full rollup months and raw edge ranges.
+        """
+        self.assertEqual(split_range(date(2023, 1, 1), date(2023, 3, 31)),
+                         ((date(2023, 1, 1), date(2023, 4, 1)), []))
+        self.assertEqual(split_range(date(2023, 1, 15), date(2023, 3, 15)),
+                         ((date(2023, 2, 1), date(2023, 3, 1)),
+                          [(date(2023, 1, 15), date(2023, 1, 31)), (date(2023, 3, 1), date(2023, 3, 15))]))
+        self.assertEqual(split_range(date(2023, 2, 2), date(2023, 2, 27)),
+                         (None, [(date(2023, 2, 2), date(2023, 2, 27))]))
+        self.assertEqual(split_range(date(9999, 11, 1), date(9999, 12, 31)),
+                         ((date(9999, 11, 1), date(9999, 12, 1)), [(date(9999, 12, 1), date(9999, 12, 31))]))
+        self.assertEqual(split_range(date(9999, 12, 2), date(9999, 12, 30)),
+                         (None, [(date(9999, 12, 2), date(9999, 12, 30))]))
+
+
+class TransactionPaginationTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with 25 transactions spread over 5 days and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        self.category = TransactionCategory.objects.create(category_type=0, category_name='food')
+        for i in range(25):
+            Transaction.objects.create(transaction_account=self.account, transaction_type=i % 2,
+                                       transaction_category=self.category, transaction_date=date(2023, 2, 1 + i % 5),
+                                       transaction_sum=Decimal('1.00'), transaction_comment=str(i))
+        self.client.force_login(self.user)
+
+    def collect_pages(self, url, params):
+        """
+        Follows next_cursor until the last page and returns all pages.
+        """
+        pages = []
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json())
+            if not pages[-1]['next_cursor']:
+                return pages
+            params = {**params, 'after': pages[-1]['next_cursor']}
+
+    def test_latest_pages(self):
+        """
+        This test checks that the pages cover every transaction once, ordered by date and id descending.
+        """
+        pages = self.collect_pages('/api/transaction/latest', {'limit': 10})
+        self.assertEqual([len(page['transactions']) for page in pages], [10, 10, 5])
+        rows = [row for page in pages for row in page['transactions']]
+        expected = list(Transaction.objects.order_by('-transaction_date', '-id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in rows], expected)
+
+    def test_filter_pages(self):
+        """
+        This test checks that the filters are applied to every page.
+        """
+        pages = self.collect_pages('/api/transaction/filter', {'limit': 4, 'transaction_type': 'Income'})
+        rows = [row for page in pages for row in page['transactions']]
+        self.assertEqual(len(rows), 12)
+        self.assertTrue(all(row['transaction_type'] == 1 for row in rows))
+
+    def test_invalid_cursor(self):
+        """
+        This test checks that a malformed cursor or limit is rejected.
+        """
+        self.assertEqual(self.client.get('/api/transaction/latest', {'after': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/transaction/latest', {'limit': '0'}).status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConcurrentBalanceTest(TransactionTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account and a session shared by all worker threads.
+        """
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890',
+                                              account_balance=Decimal('1000.00'))
+        TransactionCategory.objects.create(category_type=0, category_name='food')
+        self.client.force_login(self.user)
+        self.session_id = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def request(self, method, url, data=None):
+        """
+        Sends one request from a worker thread with its own client and database connection.
+        """
+        client = Client()
+        client.cookies[settings.SESSION_COOKIE_NAME] = self.session_id
+        try:
+            if method == 'add':
+                return client.post(url, data, content_type='application/json')
+            return client.post(url)
+        finally:
+            connections.close_all()
+
+    def test_parallel_add_and_delete(self):
+        """
+        This test fires hundreds of parallel add and delete requests and checks that the final balance equals the
+        initial balance plus the remaining transactions, and that deleting the same transaction twice in parallel
+        changes the balance once.
+        """
+        adds = [{'transaction_type': str(i % 2), 'transaction_category': 'food', 'transaction_date': '2023-02-10',
+                 'transaction_sum': f'{i + 1}.25', 'transaction_comment': str(i)} for i in range(200)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(lambda data: self.request('add', '/api/transaction/add', data), adds))
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        created = [response.json()['transaction'] for response in responses]
+
+        deletes = [f'/api/transaction/{transaction_id}/delete' for transaction_id in created[::2]] * 2
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(lambda url: self.request('delete', url), deletes))
+        self.assertEqual(sum(response.status_code == 200 for response in responses), len(created[::2]))
+        self.assertEqual(sum(response.status_code == 404 for response in responses), len(created[::2]))
+
+        remaining = Transaction.objects.filter(transaction_account=self.account)
+        self.assertEqual(remaining.count(), 100)
+        expected = Decimal('1000.00') + sum(
+            transaction.transaction_sum if transaction.transaction_type == 1 else -transaction.transaction_sum
+            for transaction in remaining)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, expected)
+        rollup = TransactionRollup.objects.aggregate(total=Sum('rollup_sum'), count=Sum('rollup_count'))
+        self.assertEqual(rollup, {'total': sum(t.transaction_sum for t in remaining), 'count': 100})
+
+
+class TransactionBulkAddTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account, two categories and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890',
+                                              account_balance=Decimal('100.00'))
+        TransactionCategory.objects.create(category_type=0, category_name='food')
+        TransactionCategory.objects.create(category_type=1, category_name='salary')
+        self.client.force_login(self.user)
+
+    def bulk_add(self, items):
+        return self.client.post('/api/transaction/bulk_add', items, content_type='application/json')
+
+    @staticmethod
+    def transaction_inserts(queries) -> list:
+        return [query for query in queries if query['sql'].startswith('INSERT INTO "hb_api_app_transaction" ')]
+
+    def test_bulk_add(self):
+        """
+        This test adds 10000 transactions and checks the stored rows, the balance, the rollup and the queries: one
+        INSERT per batch and a number of other queries that does not depend on the number of items.
+        """
+        items = [{'transaction_type': i % 2, 'transaction_category': ('food', 'salary')[i % 2],
+                  'transaction_date': f'2023-{1 + i % 12:02d}-15', 'transaction_sum': '2.50',
+                  'transaction_comment': str(i)} for i in range(10000)]
+        get_catalog()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk_add(items)
+        self.assertEqual(response.status_code, 200)
+        # One INSERT per batch (SQLite also limits the number of parameters per query)
+        fields = [field for field in Transaction._meta.concrete_fields if not field.primary_key]
+        batch_size = min(settings.HB_BULK_ADD_BATCH_SIZE, connection.ops.bulk_batch_size(fields, items))
+        inserts = self.transaction_inserts(queries)
+        self.assertEqual(len(inserts), -(-10000 // batch_size))
+        self.assertEqual(len(response.json()['transactions']), 10000)
+        self.assertEqual(Transaction.objects.filter(transaction_account=self.account).count(), 10000)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal('100.00'))
+        self.assertEqual(TransactionRollup.objects.aggregate(count=Sum('rollup_count'))['count'], 10000)
+
+        # The other queries (session, lookups, balance and rollup updates) do not depend on the number of items:
+        # the same 24 rollup keys in 24 items of another account cost exactly as many
+        user = User.objects.create_user(username='other', password='12345')
+        Account.objects.create(account_owner=user, account_number='1')
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as small_queries:
+            self.assertEqual(self.bulk_add(items[:24]).status_code, 200)
+        self.assertEqual(len(self.transaction_inserts(small_queries)), 1)
+        self.assertEqual(len(queries) - len(inserts), len(small_queries) - 1)
+
+    def test_bulk_add_reports_errors_per_item(self):
+        """
+        This test checks that invalid items are reported by index and that nothing is saved.
+        """
+        valid = {'transaction_type': '0', 'transaction_category': 'food', 'transaction_date': '2023-02-28',
+                 'transaction_sum': '20.00', 'transaction_comment': 'bus'}
+        response = self.bulk_add([valid, {**valid, 'transaction_category': 'unknown'},
+                                  {**valid, 'transaction_date': '28.02.2023'}, {'transaction_type': '0'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2, 3])
+        self.assertEqual(Transaction.objects.count(), 0)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal('100.00'))
+
+    def test_bulk_add_rejects_out_of_range_and_json_types(self):
+        """
+        This test checks that sums outside the range of the field, JSON floats and booleans are rejected.
+        """
+        valid = {'transaction_type': 0, 'transaction_category': 'food', 'transaction_date': '2023-02-28',
+                 'transaction_sum': 20, 'transaction_comment': 'bus'}
+        response = self.bulk_add([valid, {**valid, 'transaction_sum': '1e12'}, {**valid, 'transaction_sum': '0'},
+                                  {**valid, 'transaction_sum': '100000000.00'}, {**valid, 'transaction_sum': 20.5},
+                                  {**valid, 'transaction_sum': True}, {**valid, 'transaction_type': True},
+                                  {**valid, 'transaction_type': 1.0}, {**valid, 'transaction_sum': '99999999.99'}])
+        self.assertEqual([(error['index'], error['error']) for error in response.json()['errors']],
+                         [(index, 'Invalid transaction_sum') for index in range(1, 6)] +
+                         [(6, 'Invalid transaction_type'), (7, 'Invalid transaction_type')])
+        self.assertEqual(Transaction.objects.count(), 0)
+
+
+class StatementImportTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account, two categories and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        TransactionCategory.objects.create(category_type=0, category_name='food')
+        TransactionCategory.objects.create(category_type=1, category_name='None')
+        self.client.force_login(self.user)
+
+    def upload(self, name, content, **data):
+        content = content.encode() if isinstance(content, str) else content
+        return self.client.post('/api/transaction/import', {'file': SimpleUploadedFile(name, content), **data})
+
+    @staticmethod
+    def latin1_statement():
+        """
+        Returns a CSV statement of 400 rows whose last row is Latin-1 encoded, after the first read chunk of the
+        file, so that the rows before it are imported before the decoding fails.
+        """
+        rows = ''.join(f'2023-02-01,-1.{index % 100:02},food,row {index}\n' for index in range(400))
+        return ('Date,Amount,Category,Description\n' + rows).encode() + '2023-02-02,-2,food,café\n'.encode('latin-1')
+
+    def test_csv_import_skips_duplicates(self):
+        """
+        This test imports a CSV statement twice with a small batch size and checks that duplicates inside the file
+        and from the first import are skipped, and that invalid rows are reported by line.
+        """
+        content = ('Date,Amount,Category,Description\n'
+                   '2023-02-01,-12.50,food,bread\n'
+                   '2023-02-01,-12.5,food,bread\n'
+                   '2023-02-02,1000,,salary\n'
+                   'yesterday,-1,food,milk\n'
+                   '2023-02-03,"-1,25",food,milk\n')
+        with self.settings(HB_IMPORT_BATCH_SIZE=2):
+            first = self.upload('statement.csv', content).json()
+            second = self.upload('statement.csv', content).json()
+        self.assertEqual(first, {'imported': 3, 'duplicates': 1, 'failed': 1,
+                                 'errors': [{'line': 5, 'error': 'Invalid transaction_date'}]})
+        self.assertEqual(second['imported'], 0)
+        self.assertEqual(second['duplicates'], 4)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.account_balance, Decimal('986.25'))
+
+    def test_ofx_rows(self):
+        """
+        This test checks the transactions read from an SGML OFX statement.
+        """
+        content = ('OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+                   '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20230205120000\n<TRNAMT>-20.00\n<NAME>Bus\n</STMTTRN>\n'
+                   '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20230206<TRNAMT>50.00<MEMO>Refund</STMTTRN>\n'
+                   '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n')
+        rows = list(iter_ofx_rows(content.splitlines(), 'None'))
+        self.assertEqual([item for _, item in rows], [
+            {'transaction_type': 0, 'transaction_category': 'None', 'transaction_date': '2023-02-05',
+             'transaction_sum': '-20.00', 'transaction_comment': 'Bus'},
+            {'transaction_type': 1, 'transaction_category': 'None', 'transaction_date': '2023-02-06',
+             'transaction_sum': '50.00', 'transaction_comment': 'Refund'}])
+        response = self.upload('statement.ofx', content)
+        self.assertEqual(response.json()['imported'], 2)
+
+    def test_amount_separators(self):
+        """
+        This test checks that thousands separators are removed and that amounts with more than two decimal places
+        are rejected instead of rounded.
+        """
+        for amount, expected in [('1,234', '1234'), ('-1,234,567', '-1234567'), ('1.234,56', '1234.56'),
+                                 ('1,234.56', '1234.56'), ('12,5', '12.5'), ('1 234,56', '1234.56'),
+                                 ("1'234.50", '1234.50'), ('1.234.567', '1234567'), ('12.50', '12.50')]:
+            self.assertEqual(normalize_amount(amount), expected, amount)
+        content = ('Date,Amount,Category,Description\n'
+                   '2023-02-01,"-1,234",food,rent\n'
+                   '2023-02-02,-1.234,food,milk\n'
+                   '2023-02-03,"-1,2345",food,bread\n'
+                   '2023-02-04,"-1,23,4",food,tea\n'
+                   '2023-02-05,0.00,food,free\n'
+                   '2023-02-06,-1e12,food,house\n')
+        self.assertEqual(self.upload('statement.csv', content).json(), {
+            'imported': 1, 'duplicates': 0, 'failed': 5,
+            'errors': [{'line': line, 'error': 'Invalid transaction_sum'} for line in (3, 4, 5, 6, 7)]})
+        self.assertEqual(Transaction.objects.get().transaction_sum, Decimal('1234.00'))
+
+    def test_undecodable_statement(self):
+        """
+        This test checks that a statement that is not UTF-8 returns 400 with the number of rows saved before the
+        error, from the view and from the import_statement command.
+        """
+        with self.settings(HB_IMPORT_BATCH_SIZE=50):
+            response = self.upload('statement.csv', self.latin1_statement())
+        self.assertEqual(response.status_code, 400)
+        data = response.json()
+        self.assertEqual(data['error'], 'Statement is not UTF-8 encoded')
+        self.assertGreater(data['imported'], 0)
+        self.assertEqual(data['imported'], Transaction.objects.count())
+
+        Transaction.objects.all().delete()
+        with tempfile.NamedTemporaryFile(suffix='.csv') as statement:
+            statement.write(self.latin1_statement())
+            statement.flush()
+            with self.assertRaisesMessage(CommandError, 'Statement is not UTF-8 encoded, imported'):
+                call_command('import_statement', 'testuser', statement.name, batch_size=50)
+        self.assertGreater(Transaction.objects.count(), 0)
+
+
+class TransactionExportTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with three transactions and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        category = TransactionCategory.objects.create(category_type=0, category_name='food')
+        for i, transaction_type in enumerate((0, 1, 0)):
+            Transaction.objects.create(transaction_account=self.account, transaction_type=transaction_type,
+                                       transaction_category=category, transaction_date=date(2023, 2, 1 + i),
+                                       transaction_sum=Decimal('2.50'), transaction_comment=f'comment, {i}')
+        self.client.force_login(self.user)
+
+    def test_csv_export(self):
+        """
+        This test checks the streamed CSV rows, newest first.
+        """
+        response = self.client.get('/api/transaction/export', {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,transaction_date,transaction_type,transaction_category__category_name,'
+                                   'transaction_sum,transaction_comment')
+        self.assertEqual(lines[1:], [f'{transaction.id},2023-02-0{3 - i},{transaction.transaction_type},food,'
+                                     f'2.50,"comment, {2 - i}"' for i, transaction in enumerate(
+                                      Transaction.objects.order_by('-transaction_date'))])
+
+    def test_ndjson_export_with_filter(self):
+        """
+        This test checks that the transaction_filter parameters apply and that the rows match its format.
+        """
+        response = self.client.get('/api/transaction/export', {'format': 'ndjson', 'transaction_type': 'Expense'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        filtered = self.client.get('/api/transaction/filter', {'transaction_type': 'Expense'}).json()
+        self.assertEqual(rows, filtered['transactions'])
+        self.assertEqual(len(rows), 2)
+
+
+class CategoryCacheTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account and a category and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        self.category = TransactionCategory.objects.create(category_type=0, category_name='food')
+        self.client.force_login(self.user)
+
+    def test_categories_etag(self):
+        """
+        This test checks that a matching If-None-Match gets a 304 and that a category change updates the ETag.
+        """
+        response = self.client.get('/api/categories')
+        self.assertEqual(response.json(), {'data': [{'category_type': 0, 'category_name': 'food'}]})
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/categories', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        TransactionCategory.objects.create(category_type=1, category_name='salary')
+        response = self.client.get('/api/categories', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['data']), 2)
+
+    def test_add_uses_cached_category(self):
+        """
+        This test checks that transaction_add does not query the category once the catalog is loaded, and that a
+        renamed category is picked up through the post_save signal.
+        """
+        get_catalog()
+        data = {'transaction_type': '0', 'transaction_category': 'food', 'transaction_date': '2023-02-28',
+                'transaction_sum': '20.00', 'transaction_comment': 'bus'}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/transaction/add', data, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'hb_api_app_transactioncategory' in query['sql']])
+
+        self.category.category_name = 'groceries'
+        self.category.save()
+        response = self.client.post('/api/transaction/add', data, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/transaction/add', {**data, 'transaction_category': 'groceries'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_names_reload_rate_limited(self):
+        """
+        This test checks that unknown category names and ids do not reload the catalog more than once per
+        HB_CATEGORY_RELOAD_INTERVAL, and that a category created by another process is found after the interval.
+        """
+        get_catalog()
+        # bulk_create sends no post_save signal, like a category created by another process
+        TransactionCategory.objects.bulk_create([TransactionCategory(category_type=1, category_name='salary')])
+        with self.settings(HB_CATEGORY_RELOAD_INTERVAL=60), self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertNotIn('salary', category_ids({'salary'}))
+                self.assertEqual(category_names({12345}), {12345: None})
+        with self.settings(HB_CATEGORY_RELOAD_INTERVAL=0), self.assertNumQueries(1):
+            self.assertIn('salary', category_ids({'salary'}))
+
+
+class ResponseCacheTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account and a category and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        TransactionCategory.objects.create(category_type=0, category_name='food')
+        self.client.force_login(self.user)
+
+    def test_hit_and_invalidation(self):
+        """
+        This test checks that a repeated request is served from the cache, that the query parameter order does not
+        matter and that every write view invalidates the cached responses of the account with a single increment of
+        the account version.
+        """
+        data = {'transaction_type': '0', 'transaction_category': 'food', 'transaction_date': '2023-02-28',
+                'transaction_sum': '20.00', 'transaction_comment': 'bus'}
+        writes = [
+            lambda: self.client.post('/api/transaction/add', data, content_type='application/json'),
+            lambda: self.client.post('/api/transaction/bulk_add', [data], content_type='application/json'),
+            lambda: self.client.post(f'/api/transaction/{Transaction.objects.last().id}/delete'),
+            lambda: self.client.post('/api/planning/transaction/add', data, content_type='application/json'),
+            lambda: self.client.post(
+                f'/api/planning/transaction/{PlanningTransaction.objects.last().id}/delete'),
+        ]
+        for write in writes:
+            first = self.client.get('/api/transaction/latest', {'limit': 5, 'after': ''})
+            self.assertEqual(first['X-Cache'], 'MISS')
+            second = self.client.get('/api/transaction/latest', {'after': '', 'limit': 5})
+            self.assertEqual(second['X-Cache'], 'HIT')
+            self.assertEqual(second.content, first.content)
+            version = Account.objects.get(pk=self.account.pk).account_version
+            self.assertEqual(write().status_code, 200)
+            self.assertEqual(Account.objects.get(pk=self.account.pk).account_version, version + 1)
+        account = self.client.get('/api/user/account')
+        self.assertEqual(account['X-Cache'], 'MISS')
+        self.assertEqual(account.json()['Account'][0]['account_balance'], '-20.00')
+
+    def test_command_write_invalidates(self):
+        """
+        This test checks that a write made outside the views, by the import_statement command, invalidates the
+        cached responses, and that a cache hit reads the account row once for the ETag and the cache key.
+        """
+        self.assertEqual(self.client.get('/api/user/account')['X-Cache'], 'MISS')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/user/account')['X-Cache'], 'HIT')
+        self.assertEqual(len([query for query in queries if 'FROM "hb_api_app_account"' in query['sql']]), 1)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as statement:
+            statement.write('Date,Amount,Category,Description\n2023-02-01,-12.50,food,bread\n')
+            statement.flush()
+            call_command('import_statement', 'testuser', statement.name, stdout=StringIO())
+        account = self.client.get('/api/user/account')
+        self.assertEqual(account['X-Cache'], 'MISS')
+        self.assertEqual(account.json()['Account'][0]['account_balance'], '-12.50')
+
+    def test_model_and_command_writes_invalidate(self):
+        """
+        This test checks that saving a planned transaction outside the views and the rebuild_rollup command
+        invalidate the cached responses.
+        """
+        category = TransactionCategory.objects.get(category_name='food')
+        PlanningTransaction.objects.create(transaction_account_plan=self.account, transaction_type_plan=0,
+                                           transaction_category_plan=category, transaction_date_plan=date(2023, 2, 1),
+                                           transaction_sum_plan=Decimal('5.00'), transaction_comment_plan='')
+        for write in (lambda: PlanningTransaction.objects.get().save(),
+                      lambda: PlanningTransaction.objects.get().delete(),
+                      lambda: call_command('rebuild_rollup', stdout=StringIO())):
+            self.assertEqual(self.client.get('/api/transaction/latest')['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get('/api/transaction/latest')['X-Cache'], 'HIT')
+            write()
+        self.assertEqual(self.client.get('/api/transaction/latest')['X-Cache'], 'MISS')
+
+    def test_admin_transactions_read_only(self):
+        """
+        This test checks that the admin lists the transactions but can not add, change or delete them, which would
+        bypass the balance, the rollup and the tombstones.
+        """
+        self.client.post('/api/transaction/add', {
+            'transaction_type': '0', 'transaction_category': 'food', 'transaction_date': '2023-02-28',
+            'transaction_sum': '20.00', 'transaction_comment': 'bus'}, content_type='application/json')
+        transaction_id = Transaction.objects.get().id
+        self.client.force_login(User.objects.create_superuser(username='admin', password='12345'))
+        self.assertEqual(self.client.get('/admin/hb_api_app/transaction/').status_code, 200)
+        self.assertEqual(self.client.get('/admin/hb_api_app/transaction/add/').status_code, 403)
+        self.assertEqual(self.client.post(f'/admin/hb_api_app/transaction/{transaction_id}/delete/',
+                                          {'post': 'yes'}).status_code, 403)
+        self.client.post(f'/admin/hb_api_app/transaction/{transaction_id}/change/', {'transaction_sum': '1.00'})
+        self.assertEqual(Transaction.objects.get().transaction_sum, Decimal('20.00'))
+
+    def test_stats_endpoint_is_staff_only(self):
+        """
+        This test checks that the hit and miss counters are only readable by staff users.
+        """
+        self.client.get('/api/user/account')
+        self.client.get('/api/user/account')
+        self.assertEqual(self.client.get('/api/stats/cache').status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/stats/cache')
+        self.assertGreaterEqual(response.json()['cache']['user_account']['hits'], 1)
+
+
+@override_settings(HB_INSTRUMENTATION=True)
+class InstrumentationMiddlewareTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a staff test user with an account and logs the user in.
+        """
+        super().setUp()
+        histograms.clear()
+        self.user = User.objects.create_user(username='testuser', password='12345', is_staff=True)
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        self.client.force_login(self.user)
+
+    def test_server_timing_and_log(self):
+        """
+        This test checks the Server-Timing header, the structured log line and the route histogram.
+        """
+        with self.assertLogs('hb_api_app.instrumentation', level='INFO') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/transaction/filter')
+        query_count = len(queries)
+        self.assertIn(f'desc="{query_count} queries"', response['Server-Timing'])
+        for metric in ('db;dur=', 'view;dur=', 'ser;dur=', 'total;dur='):
+            self.assertIn(metric, response['Server-Timing'])
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['route'], line['status'], line['queries']),
+                         ('api/transaction/filter', 200, query_count))
+
+        with self.assertLogs('hb_api_app.instrumentation', level='INFO'):
+            timings = self.client.get('/api/stats/timings').json()
+        self.assertEqual(timings['routes']['api/transaction/filter']['count'], 1)
+        self.assertEqual(timings['routes']['api/transaction/filter']['queries']['p99'], query_count)
+
+    @override_settings(HB_INSTRUMENTATION=False)
+    def test_disabled(self):
+        """
+        This test checks that the middleware is not used unless enabled.
+        """
+        response = self.client.get('/api/transaction/filter')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class SeedBookkeepingCommandTest(TestCase):
+    def seed(self, prefix):
+        call_command('seed_bookkeeping', users=2, transactions=400, planned=20, years=1, end_date=date(2023, 6, 30),
+                     prefix=prefix, stdout=StringIO())
+        return Account.objects.filter(account_owner__username__startswith=f'{prefix}_').order_by('pk')
+
+    @staticmethod
+    def rows(account):
+        """
+        Returns the date, category and sum of the transactions of an account in insertion order.
+        """
+        return list(Transaction.objects.filter(transaction_account=account).order_by('pk').values_list(
+            'transaction_date', 'transaction_category', 'transaction_sum'))
+
+    def test_seed(self):
+        """
+        This test checks the generated transactions, rollup rows and balances and that the seed makes the data
+        reproducible.
+        """
+        accounts = self.seed('first')
+        self.assertEqual(len(accounts), 2)
+        for account in accounts:
+            transactions = Transaction.objects.filter(transaction_account=account)
+            self.assertTrue(200 <= transactions.count() <= 600 + 12 * 3)
+            self.assertEqual(transactions.filter(transaction_category__category_name='salary').count(), 12)
+            dates = transactions.aggregate(first=Min('transaction_date'), last=Max('transaction_date'))
+            self.assertGreaterEqual(dates['first'], date(2022, 7, 1))
+            self.assertLessEqual(dates['last'], date(2023, 6, 30))
+            self.assertTrue(PlanningTransaction.objects.filter(transaction_account_plan=account,
+                                                               transaction_date_plan__gt=date(2023, 6, 30)).exists())
+            self.assertEqual(TransactionRollup.objects.filter(rollup_account=account).aggregate(
+                Sum('rollup_count'))['rollup_count__sum'], transactions.count())
+            income = transactions.filter(transaction_type=1).aggregate(Sum('transaction_sum'))['transaction_sum__sum']
+            expense = transactions.filter(transaction_type=0).aggregate(Sum('transaction_sum'))['transaction_sum__sum']
+            self.assertEqual(account.account_balance, income - expense)
+
+        second = self.seed('second')
+        self.assertEqual([self.rows(account) for account in accounts], [self.rows(account) for account in second])
+
+        with self.assertRaises(CommandError):
+            self.seed('first')
+
+
+class BenchmarkApiCommandTest(TestCase):
+    @staticmethod
+    def results(p95: float) -> dict:
+        return {'requests': 10, 'rps': 100.0, 'p50_ms': p95 / 2, 'p95_ms': p95, 'p99_ms': p95, 'mean_ms': p95 / 2,
+                'statuses': [200]}
+
+    def test_compare(self):
+        """
+        This test checks that --compare fails with the routes whose p95 latency grew past the threshold and passes
+        otherwise. The throwaway database and the timed requests are replaced with fixed results.
+        """
+        baseline = {'routes': {'index': self.results(10.0), 'categories': self.results(10.0)}}
+        results = {'index': self.results(13.0), 'categories': self.results(10.5), 'sync': self.results(50.0)}
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as baseline_file, \
+                mock.patch.multiple(benchmark_api, connection=mock.DEFAULT, setup_test_environment=mock.DEFAULT,
+                                    teardown_test_environment=mock.DEFAULT), \
+                mock.patch.multiple(benchmark_api.Command, seed=mock.DEFAULT, run=mock.DEFAULT) as command:
+            json.dump(baseline, baseline_file)
+            baseline_file.flush()
+            command['run'].return_value = results
+            with self.assertRaisesMessage(CommandError, 'Regressed routes: index'):
+                call_command('benchmark_api', compare=baseline_file.name, threshold=0.2, stdout=StringIO())
+            stdout = StringIO()
+            call_command('benchmark_api', compare=baseline_file.name, threshold=0.5, stdout=stdout)
+            self.assertIn('No route regressed past the threshold.', stdout.getvalue())
+
+
+class JsonEncoderTest(TestCase):
+    def test_identical_output(self):
+        """
+        This test checks that all installed encoders produce the same bytes, including the values DjangoJSONEncoder
+        formats itself.
+        """
+        payload = {'transactions': [{'id': 1, 'transaction_date': date(2023, 1, 31), 'transaction_sum': Decimal('12.50'),
+                                     'transaction_comment': 'Молоко "2.5%"\n\t\x01'}],
+                   'floats': [0.1, 1.0, -3.25, 1234567.89], 'none': None, 'flags': [True, False],
+                   'created': datetime(2023, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+                   'naive': datetime(2023, 5, 1, 12, 30), 'nested': {'empty': [], 'dict': {}}}
+        outputs = {name: JSON_ENCODERS[name](payload) for name in available_encoders()}
+        self.assertEqual(len(set(outputs.values())), 1, outputs)
+        self.assertEqual(json.loads(outputs['stdlib'])['created'], '2023-05-01T12:30:15.123Z')
+
+    def test_float_differences(self):
+        """
+        This test checks the documented differences of orjson for large and non-finite floats.
+        """
+        payload = [1e15, 1e16, -2.5e20, float('nan'), float('inf')]
+        self.assertEqual(JSON_ENCODERS['stdlib'](payload), b'[1000000000000000.0,1e+16,-2.5e+20,NaN,Infinity]')
+        if 'orjson' in available_encoders():
+            self.assertEqual(JSON_ENCODERS['orjson'](payload), b'[1000000000000000.0,1e16,-2.5e20,null,null]')
+
+    @override_settings(HB_JSON_ENCODER='stdlib')
+    def test_response(self):
+        """
+        This test checks the content type, the safe check and the fallback for a custom encoder.
+        """
+        response = JsonResponse(data={'sum': Decimal('1.50')})
+        self.assertEqual((response['Content-Type'], response.content), ('application/json', b'{"sum":"1.50"}'))
+        with self.assertRaises(TypeError):
+            JsonResponse([1])
+        self.assertEqual(JsonResponse([1], safe=False, json_dumps_params={'indent': 1}).content, b'[\n 1\n]')
+
+
+class AsyncReadUrls:
+    """URLconf with the async read views, as served under ASGI."""
+    urlpatterns = urls.url_patterns(async_views)
+
+
+@override_settings(ROOT_URLCONF=AsyncReadUrls)
+class AsyncReadViewTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account, transactions and planned transactions and logs the user in
+        with the sync and the async test client.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        food = TransactionCategory.objects.create(category_type=0, category_name='food')
+        salary = TransactionCategory.objects.create(category_type=1, category_name='salary')
+        for day in range(1, 29, 3):
+            for month in (1, 2, 3):
+                Transaction.objects.create(transaction_account=self.account, transaction_type=0,
+                                           transaction_category=food, transaction_date=date(2023, month, day),
+                                           transaction_sum=Decimal(f'{day}.25'), transaction_comment='food')
+            PlanningTransaction.objects.create(transaction_account_plan=self.account, transaction_type_plan=1,
+                                               transaction_category_plan=salary,
+                                               transaction_date_plan=date(2023, 4, day),
+                                               transaction_sum_plan=Decimal('100.00'), transaction_comment_plan='')
+        rebuild_rollup(self.account)
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+
+    def async_get(self, url, data=None, **kwargs):
+        return async_to_sync(self.async_client.get)(url, data, **kwargs)
+
+    def test_same_responses(self):
+        """
+        This test checks that the async views return the same responses as the sync views.
+        """
+        self.assertIs(resolve('/api/transaction/latest').func, async_views.transaction_latest)
+        requests = [
+            ('/api/user/account', None),
+            ('/api/transaction/latest', {'limit': 5}),
+            ('/api/transaction/filter', {'transaction_start_date': '2023-01-10', 'transaction_end_date': '2023-02-20',
+                                         'transaction_type': 'Expense', 'limit': 4}),
+            ('/api/transaction/filter', {'transaction_type': 'Expense', 'format': 'columnar',
+                                         'fields': 'id,transaction_category__category_name'}),
+            ('/api/categories', None),
+            ('/api/transaction/statistic', {'transaction_start_date': '2023-01-10',
+                                            'transaction_end_date': '2023-03-31'}),
+            ('/api/planning/transaction/statistic', {'transaction_start_date': '2023-04-01',
+                                                     'transaction_end_date': '2023-04-15'}),
+        ]
+        for url, data in requests:
+            with self.subTest(url=url):
+                with override_settings(ROOT_URLCONF='hb_api_project.urls'):
+                    expected = self.client.get(url, data)
+                caches['default'].clear()
+                response = self.async_get(url, data)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+
+        cursor = self.async_get('/api/transaction/latest', {'limit': 5}).json()['next_cursor']
+        self.assertEqual(len(self.async_get('/api/transaction/latest', {'after': cursor}).json()['transactions']), 25)
+
+    def test_errors_and_cache(self):
+        """
+        This test checks the login redirect, the method check, bad parameters, the ETag and the response cache.
+        """
+        self.async_client.logout()
+        response = self.async_get('/api/transaction/latest')
+        self.assertEqual((response.status_code, response.url), (302, '/auth_error?next=/api/transaction/latest'))
+        self.async_client.force_login(self.user)
+
+        self.assertEqual(async_to_sync(self.async_client.post)('/api/transaction/filter').status_code, 405)
+        self.assertEqual(self.async_get('/api/transaction/filter', {'after': '!'}).status_code, 400)
+        self.assertEqual(self.async_get('/api/transaction/statistic').status_code, 400)
+
+        etag = self.async_get('/api/categories')['ETag']
+        self.assertEqual(self.async_get('/api/categories', headers={'If-None-Match': etag}).status_code, 304)
+
+        self.assertEqual(self.async_get('/api/user/account')['X-Cache'], 'MISS')
+        self.assertEqual(self.async_get('/api/user/account')['X-Cache'], 'HIT')
+
+
+class DatabaseProfileTest(TestCase):
+    def test_sqlite_pragmas(self):
+        """
+        This test checks that new SQLite connections get the PRAGMAs of HB_SQLITE_PRAGMAS.
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite profile only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.HB_SQLITE_PRAGMAS['busy_timeout'])
+
+
+@override_settings(HB_REPLICA_DATABASE='replica', HB_REPLICA_STICKY_SECONDS=60)
+class ReplicaRouterTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user and a view that reports the database its reads would use.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.factory = RequestFactory()
+
+        @route_database
+        def view(request):
+            return router.db_for_read(Transaction), router.db_for_write(Transaction)
+
+        self.view = view
+
+    def request(self, method):
+        request = getattr(self.factory, method)('/')
+        request.user = self.user
+        return self.view(request)
+
+    def test_router(self):
+        """
+        This test checks that only reads inside replica_reads go to the replica.
+        """
+        self.assertEqual(router.db_for_read(Transaction), 'default')
+        with replica_reads():
+            self.assertEqual((router.db_for_read(Transaction), router.db_for_write(Transaction)),
+                             ('replica', 'default'))
+            with replica_reads(False):
+                self.assertEqual(router.db_for_read(Transaction), 'default')
+        with override_settings(HB_REPLICA_DATABASE=None), replica_reads():
+            self.assertEqual(router.db_for_read(Transaction), 'default')
+        self.assertFalse(PrimaryReplicaRouter().allow_migrate('replica', 'hb_api_app'))
+
+    def test_read_your_writes(self):
+        """
+        This test checks that GET requests read from the replica until the user writes, then from the primary for
+        the sticky window.
+        """
+        self.assertEqual(self.request('get'), ('replica', 'default'))
+        self.assertEqual(self.request('post'), ('default', 'default'))
+        self.assertEqual(self.request('get'), ('default', 'default'))
+        caches['default'].clear()
+        self.assertEqual(self.request('get'), ('replica', 'default'))
+
+    def test_async_view(self):
+        """
+        This test checks the routing of async views.
+        """
+
+        @route_database
+        async def view(request):
+            return router.db_for_read(Transaction)
+
+        request = self.factory.get('/')
+        request.user = self.user
+        self.assertEqual(async_to_sync(view)(request), 'replica')
+
+    def test_sticky_cache_check(self):
+        """
+        This test checks that the system checks reject a replica whose sticky flags are not shared by the worker
+        processes.
+        """
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache'}}):
+            self.assertEqual(checks.check_replica_sticky_cache(None), [])
+        for backend in ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache'):
+            with self.subTest(backend=backend), self.settings(CACHES={'default': {'BACKEND': backend}}):
+                self.assertEqual([error.id for error in checks.check_replica_sticky_cache(None)], ['hb_api_app.E002'])
+                with self.settings(HB_REPLICA_DATABASE=None):
+                    self.assertEqual(checks.check_replica_sticky_cache(None), [])
+
+
+@override_settings(HB_SYNC_OVERLAP_SECONDS=0)
+class SyncTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with 25 transactions and 2 planned transactions and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        self.category = TransactionCategory.objects.create(category_type=0, category_name='food')
+        for i in range(25):
+            Transaction.objects.create(transaction_account=self.account, transaction_type=0,
+                                       transaction_category=self.category, transaction_date=date(2023, 2, 1 + i % 5),
+                                       transaction_sum=Decimal('1.00'), transaction_comment=str(i))
+        for i in range(2):
+            PlanningTransaction.objects.create(transaction_account_plan=self.account, transaction_type_plan=1,
+                                               transaction_category_plan=self.category,
+                                               transaction_date_plan=date(2023, 3, 1 + i),
+                                               transaction_sum_plan=Decimal('5.00'), transaction_comment_plan=str(i))
+        self.client.force_login(self.user)
+
+    def sync(self, token=None):
+        """
+        Follows next_token while has_more is set and returns the pages and the last token.
+        """
+        pages = []
+        while True:
+            response = self.client.get('/api/sync', {'since': token, 'limit': 10} if token else {'limit': 10})
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json())
+            token = pages[-1]['next_token']
+            if not pages[-1]['has_more']:
+                return pages, token
+
+    def test_initial_and_incremental_sync(self):
+        """
+        This test checks that the first sync returns every row once and that later syncs only return the changes,
+        including deletions.
+        """
+        pages, token = self.sync()
+        self.assertEqual([len(page['transactions']) for page in pages], [10, 10, 5])
+        self.assertEqual(sorted(row['id'] for page in pages for row in page['transactions']),
+                         sorted(Transaction.objects.values_list('id', flat=True)))
+        self.assertEqual(len(pages[0]['planned_transactions']), 2)
+
+        pages, token = self.sync(token)
+        self.assertEqual(pages, [{'transactions': [], 'planned_transactions': [],
+                                  'deleted': {'transactions': [], 'planned_transactions': []},
+                                  'next_token': token, 'has_more': False}])
+
+        added = self.client.post('/api/transaction/add', {
+            'transaction_type': '1', 'transaction_category': 'food', 'transaction_date': '2023-02-10',
+            'transaction_sum': '3.00', 'transaction_comment': 'new'}, content_type='application/json').json()
+        deleted = Transaction.objects.exclude(pk=added['transaction']).first().id
+        planned = PlanningTransaction.objects.first().id
+        self.client.post(f'/api/transaction/{deleted}/delete')
+        self.client.post(f'/api/planning/transaction/{planned}/delete')
+        pages, token = self.sync(token)
+        self.assertEqual([row['id'] for row in pages[0]['transactions']], [added['transaction']])
+        self.assertEqual(pages[0]['deleted'], {'transactions': [deleted], 'planned_transactions': [planned]})
+
+    def test_bad_and_expired_token(self):
+        """
+        This test checks the responses for an invalid token and for a token older than the tombstone retention.
+        """
+        self.assertEqual(self.client.get('/api/sync', {'since': 'not a token'}).status_code, 400)
+        old = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+        token = encode_token({'transactions': (old, 1), 'planned_transactions': None, 'deleted': (old, 0)})
+        self.assertEqual(self.client.get('/api/sync', {'since': token}).status_code, 410)
+
+    def test_long_lived_token_without_deletions(self):
+        """
+        This test checks that a client that syncs every 60 days keeps a valid token for longer than the tombstone
+        retention when nothing is deleted.
+        """
+        _, token = self.sync()
+        now = timezone.now()
+        for days in (60, 120, 180):
+            with mock.patch('hb_api_app.sync.timezone') as sync_timezone:
+                sync_timezone.now.return_value = now + timedelta(days=days)
+                pages, token = self.sync(token)
+            self.assertEqual(pages[0]['transactions'], [])
+
+
+class ProjectionTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with 6 transactions in two categories and 2 planned transactions and logs
+        the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        self.food = TransactionCategory.objects.create(category_type=0, category_name='food')
+        self.salary = TransactionCategory.objects.create(category_type=1, category_name='salary')
+        for i in range(6):
+            Transaction.objects.create(transaction_account=self.account, transaction_type=i % 2,
+                                       transaction_category=(self.food, self.salary)[i % 2],
+                                       transaction_date=date(2023, 2, 1 + i), transaction_sum=Decimal('1.50'),
+                                       transaction_comment=str(i))
+            if i < 2:
+                PlanningTransaction.objects.create(transaction_account_plan=self.account, transaction_type_plan=0,
+                                                   transaction_category_plan=self.food,
+                                                   transaction_date_plan=date(2023, 3, 1 + i),
+                                                   transaction_sum_plan=Decimal('5.00'),
+                                                   transaction_comment_plan=str(i))
+        self.client.force_login(self.user)
+
+    def test_fields(self):
+        """
+        This test checks that only the requested fields are returned and that the pagination still works.
+        """
+        response = self.client.get('/api/transaction/latest', {'fields': 'transaction_sum', 'limit': 4}).json()
+        self.assertEqual(response['transactions'], [{'transaction_sum': '1.50'}] * 4)
+        response = self.client.get('/api/transaction/latest', {'fields': 'transaction_sum',
+                                                               'after': response['next_cursor']}).json()
+        self.assertEqual(len(response['transactions']), 2)
+        self.assertIsNone(response['next_cursor'])
+        for params in ({'fields': 'id,account_balance'}, {'format': 'xml'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/transaction/filter', params).status_code, 400)
+
+    def test_columnar(self):
+        """
+        This test checks that the columnar format holds the same values as the rows, with category ids and the
+        category dictionary.
+        """
+        rows = self.client.get('/api/transaction/filter', {'transaction_start_date': '2023-02-02',
+                                                           'transaction_end_date': '2023-02-06'}).json()
+        get_catalog()
+        with CaptureQueriesContext(connection) as queries:
+            columnar = self.client.get('/api/transaction/filter', {'transaction_start_date': '2023-02-02',
+                                                                   'transaction_end_date': '2023-02-06',
+                                                                   'format': 'columnar'}).json()
+        # The category names come from the category cache
+        self.assertNotIn('JOIN', queries[-1]['sql'])
+        self.assertNotIn('transactioncategory', queries[-1]['sql'])
+        self.assertEqual(columnar['categories'], {str(self.food.id): 'food', str(self.salary.id): 'salary'})
+        self.assertEqual(columnar['transactions']['id'], [row['id'] for row in rows['transactions']])
+        self.assertEqual([columnar['categories'][str(category)]
+                          for category in columnar['transactions']['transaction_category']],
+                         [row['transaction_category__category_name'] for row in rows['transactions']])
+
+        planned = self.client.get('/api/planning/planned_transactions', {'format': 'columnar',
+                                                                         'fields': 'transaction_sum_plan'}).json()
+        self.assertEqual(planned, {'transactions': {'transaction_sum_plan': ['5.00', '5.00']}})
+
+
+class ConditionalGetTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account, a category and one transaction and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        category = TransactionCategory.objects.create(category_type=0, category_name='food')
+        Transaction.objects.create(transaction_account=self.account, transaction_type=0, transaction_category=category,
+                                   transaction_date=date(2023, 2, 1), transaction_sum=Decimal('1.00'),
+                                   transaction_comment='bread')
+        self.client.force_login(self.user)
+
+    def test_not_modified(self):
+        """
+        This test checks that a request with a matching If-None-Match or If-Modified-Since header gets an empty 304
+        response without a query of the transactions.
+        """
+        response = self.client.get('/api/transaction/latest')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get('/api/transaction/latest', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertFalse([query for query in queries if 'hb_api_app_transaction"' in query['sql']])
+        self.assertEqual(self.client.get('/api/transaction/latest',
+                                         HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.client.get('/api/transaction/latest', HTTP_IF_NONE_MATCH='"0-0"').status_code, 200)
+
+    def test_invalidated_by_every_write_view(self):
+        """
+        This test checks that every write view changes the ETag of the account resources.
+        """
+        data = {'transaction_type': '0', 'transaction_category': 'food', 'transaction_date': '2023-02-28',
+                'transaction_sum': '20.00', 'transaction_comment': 'bus'}
+        writes = {
+            'transaction_add': lambda: self.client.post('/api/transaction/add', data,
+                                                        content_type='application/json'),
+            'transaction_bulk_add': lambda: self.client.post('/api/transaction/bulk_add', [data],
+                                                             content_type='application/json'),
+            'transaction_import': lambda: self.client.post('/api/transaction/import', {'file': SimpleUploadedFile(
+                'statement.csv', b'date,amount,comment\n2023-03-01,-5.00,tea\n'), 'default_category': 'food'}),
+            'transaction_delete': lambda: self.client.post(f'/api/transaction/{Transaction.objects.last().id}/delete'),
+            'planned_transaction_add': lambda: self.client.post('/api/planning/transaction/add', data,
+                                                                content_type='application/json'),
+            'planned_transaction_delete': lambda: self.client.post(
+                f'/api/planning/transaction/{PlanningTransaction.objects.last().id}/delete'),
+        }
+        urls = ['/api/user/account', '/api/transaction/latest', '/api/transaction/filter',
+                '/api/planning/planned_transactions']
+        for name, write in writes.items():
+            with self.subTest(write=name):
+                etags = {url: self.client.get(url)['ETag'] for url in urls}
+                for url in urls:
+                    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code, 304)
+                self.assertEqual(write().status_code, 200)
+                for url in urls:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                    self.assertEqual(response.status_code, 200)
+                    self.assertNotEqual(response['ETag'], etags[url])
+
+    @override_settings(ROOT_URLCONF=AsyncReadUrls)
+    def test_async_views(self):
+        """
+        This test checks the conditional requests of the async views.
+        """
+        self.async_client.force_login(self.user)
+        response = async_to_sync(self.async_client.get)('/api/user/account')
+        self.assertEqual(response.status_code, 200)
+        not_modified = async_to_sync(self.async_client.get)('/api/user/account',
+                                                            headers={'If-None-Match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+
+
+class RecurrenceTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account and two categories and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        TransactionCategory.objects.create(category_type=0, category_name='rent')
+        TransactionCategory.objects.create(category_type=1, category_name='salary')
+        self.client.force_login(self.user)
+
+    def test_occurrences(self):
+        """
+        This test checks the arithmetic occurrence counts and the expansion against stepping through every
+        occurrence.
+        """
+        windows = [(date(2023, 1, 1), date(2023, 12, 31)), (date(2023, 2, 28), date(2023, 3, 30)),
+                   (date(2024, 2, 29), date(2024, 2, 29)), (date(2022, 1, 1), date(2022, 12, 31))]
+        for start in (date(2023, 1, 31), date(2023, 2, 28), date(2023, 3, 15)):
+            for recurrence, step in ((DAILY, lambda i: start + timedelta(days=i)),
+                                     (WEEKLY, lambda i: start + timedelta(weeks=i)),
+                                     (MONTHLY, lambda i: add_months(start, i))):
+                for end in (None, date(2023, 11, 30)):
+                    every = [step(i) for i in range(800) if end is None or step(i) <= end]
+                    for window_start, window_end in windows:
+                        expected = [day for day in every if window_start <= day <= window_end]
+                        with self.subTest(start=start, recurrence=recurrence, end=end, window=window_start):
+                            self.assertEqual(list(iter_occurrences(start, recurrence, end, window_start,
+                                                                   window_end)), expected)
+                            self.assertEqual(count_occurrences(start, recurrence, end, window_start, window_end),
+                                             len(expected))
+
+    def test_planned_views(self):
+        """
+        This test checks that a recurring planned transaction is stored once, listed once per occurrence in the
+        requested period and counted in the planned statistic.
+        """
+        rent = {'transaction_type': '0', 'transaction_category': 'rent', 'transaction_date': '2023-01-31',
+                'transaction_sum': '500.00', 'transaction_comment': 'rent', 'transaction_recurrence': 'monthly',
+                'transaction_recurrence_end': '2027-12-31'}
+        bonus = {'transaction_type': '1', 'transaction_category': 'salary', 'transaction_date': '2023-03-15',
+                 'transaction_sum': '300.00', 'transaction_comment': 'bonus'}
+        for data in (rent, bonus):
+            self.assertEqual(self.client.post('/api/planning/transaction/add', data,
+                                              content_type='application/json').status_code, 200)
+        self.assertEqual(PlanningTransaction.objects.count(), 2)
+        self.assertEqual(self.client.post('/api/planning/transaction/add', {**rent, 'transaction_recurrence': 'yearly'},
+                                          content_type='application/json').status_code, 400)
+
+        period = {'transaction_start_date': '2023-02-01', 'transaction_end_date': '2023-05-31'}
+        rows = self.client.get('/api/planning/planned_transactions', {
+            **period, 'fields': 'transaction_date_plan,transaction_sum_plan'}).json()['transactions']
+        self.assertEqual(rows, [{'transaction_date_plan': '2023-05-31', 'transaction_sum_plan': '500.00'},
+                                {'transaction_date_plan': '2023-04-30', 'transaction_sum_plan': '500.00'},
+                                {'transaction_date_plan': '2023-03-31', 'transaction_sum_plan': '500.00'},
+                                {'transaction_date_plan': '2023-03-15', 'transaction_sum_plan': '300.00'},
+                                {'transaction_date_plan': '2023-02-28', 'transaction_sum_plan': '500.00'}])
+        self.assertEqual(len(self.client.get('/api/planning/planned_transactions').json()['transactions']), 2)
+        with self.settings(HB_PLANNED_WINDOW_MAX_DAYS=120):
+            self.assertEqual(self.client.get('/api/planning/planned_transactions', period).status_code, 200)
+            response = self.client.get('/api/planning/planned_transactions', {**period, 'transaction_end_date':
+                                                                              '2023-06-01'})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/planning/planned_transactions', {
+            'transaction_start_date': '1900-01-01', 'transaction_end_date': '9999-12-31'})
+        self.assertEqual(response.json(), {'error': 'Period too long'})
+
+        statistic = self.client.get('/api/planning/transaction/statistic', period).json()['statistic_data']
+        self.assertEqual(statistic, [{'planned_income': 300.0}, {'planned_expense': 2000.0}])
+        statistic = self.client.get('/api/planning/transaction/statistic', {
+            'transaction_start_date': '2023-01-01', 'transaction_end_date': '2030-12-31'}).json()['statistic_data']
+        self.assertEqual(statistic, [{'planned_income': 300.0}, {'planned_expense': 500.0 * 60}])
+
+
+class PlanningVarianceTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with transactions, a planned transaction and a monthly planned salary and
+        logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        food = TransactionCategory.objects.create(category_type=0, category_name='food')
+        salary = TransactionCategory.objects.create(category_type=1, category_name='salary')
+        for day, category, transaction_type, transaction_sum in ((date(2023, 1, 5), food, 0, '30.00'),
+                                                                 (date(2023, 1, 20), food, 0, '100.00'),
+                                                                 (date(2023, 2, 1), salary, 1, '900.00'),
+                                                                 (date(2023, 2, 14), food, 0, '50.00'),
+                                                                 (date(2023, 2, 20), food, 0, '25.00')):
+            Transaction.objects.create(transaction_account=self.account, transaction_type=transaction_type,
+                                       transaction_category=category, transaction_date=day,
+                                       transaction_sum=Decimal(transaction_sum), transaction_comment='')
+        PlanningTransaction.objects.create(transaction_account_plan=self.account, transaction_type_plan=0,
+                                           transaction_category_plan=food, transaction_date_plan=date(2023, 2, 10),
+                                           transaction_sum_plan=Decimal('200.00'), transaction_comment_plan='')
+        PlanningTransaction.objects.create(transaction_account_plan=self.account, transaction_type_plan=1,
+                                           transaction_category_plan=salary, transaction_date_plan=date(2023, 1, 1),
+                                           transaction_sum_plan=Decimal('1000.00'), transaction_comment_plan='',
+                                           transaction_recurrence_plan=MONTHLY)
+        rebuild_rollup(self.account)
+        self.client.force_login(self.user)
+
+    def test_monthly_variance(self):
+        """
+        This test checks the planned and actual sums per month and category, including a full month read from the
+        rollup and partial months read from the transactions.
+        """
+        get_catalog()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/planning/variance', {'start': '2023-01-15', 'end': '2023-03-20'})
+        self.assertEqual(response.status_code, 200)
+        # session, user, account, response cache version, rollup, edge transactions, planned, schedules
+        self.assertLessEqual(len(queries), 8)
+        data = response.json()
+        self.assertEqual(data['categories'], [
+            {'period': '2023-01', 'category': 'food', 'type': 'Expense', 'planned': '0.00', 'actual': '100.00',
+             'variance': '100.00'},
+            {'period': '2023-02', 'category': 'food', 'type': 'Expense', 'planned': '200.00', 'actual': '75.00',
+             'variance': '-125.00'},
+            {'period': '2023-02', 'category': 'salary', 'type': 'Income', 'planned': '1000.00', 'actual': '900.00',
+             'variance': '-100.00'},
+            {'period': '2023-03', 'category': 'salary', 'type': 'Income', 'planned': '1000.00', 'actual': '0.00',
+             'variance': '-1000.00'},
+        ])
+        self.assertEqual(len(data['periods']), 6)
+        self.assertIn({'period': '2023-01', 'type': 'Income', 'planned': '0.00', 'actual': '0.00', 'variance': '0.00'},
+                      data['periods'])
+
+    def test_yearly_and_bad_parameters(self):
+        """
+        This test checks the yearly granularity and the responses for invalid parameters.
+        """
+        data = self.client.get('/api/planning/variance', {'start': '2023-01-01', 'end': '2023-12-31',
+                                                          'granularity': 'year'}).json()
+        self.assertEqual(data['periods'], [
+            {'period': '2023', 'type': 'Expense', 'planned': '200.00', 'actual': '205.00', 'variance': '5.00'},
+            {'period': '2023', 'type': 'Income', 'planned': '12000.00', 'actual': '900.00', 'variance': '-11100.00'},
+        ])
+        for params in ({'start': '2023-01-01'}, {'start': '2023-02-01', 'end': '2023-01-01'},
+                       {'start': '2023-01-01', 'end': '2023-12-31', 'granularity': 'week'},
+                       {'start': '9999-01-01', 'end': '9999-12-31'},
+                       {'start': '9999-01-01', 'end': '9999-12-31', 'granularity': 'year'},
+                       {'start': '2000-01-01', 'end': '2020-01-31'},
+                       {'start': '0001-01-01', 'end': '9000-12-31', 'granularity': 'year'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/planning/variance', params).status_code, 400)
+        data = self.client.get('/api/planning/variance', {'start': '9980-01-01', 'end': '9999-11-30',
+                                                          'granularity': 'year'}).json()
+        self.assertEqual(len(data['periods']), 40)
+
+
+class ForecastTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with expenses on the last two Mondays, a past salary, a weekly planned
+        salary, a monthly planned rent and a single planned expense, and logs the user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890',
+                                              account_balance=Decimal('1000.00'))
+        self.food = TransactionCategory.objects.create(category_type=0, category_name='food')
+        self.salary = TransactionCategory.objects.create(category_type=1, category_name='salary')
+        rent = TransactionCategory.objects.create(category_type=0, category_name='rent')
+        self.today = timezone.localdate()
+        self.start = self.today + timedelta(days=1)
+        last_monday = self.today - timedelta(days=self.today.weekday())
+        for day, category, transaction_type in ((last_monday, self.food, 0),
+                                                (last_monday - timedelta(days=7), self.food, 0),
+                                                (self.today, self.salary, 1)):
+            Transaction.objects.create(transaction_account=self.account, transaction_type=transaction_type,
+                                       transaction_category=category, transaction_date=day,
+                                       transaction_sum=Decimal('10.00'), transaction_comment='')
+        for day, category, transaction_type, transaction_sum, recurrence in (
+                (self.start, self.salary, 1, '100.00', WEEKLY),
+                (self.start - timedelta(days=40), rent, 0, '50.00', MONTHLY),
+                (self.start + timedelta(days=3), rent, 0, '20.00', 0),
+                (self.start + timedelta(days=30), self.food, 0, '5.00', 0)):
+            PlanningTransaction.objects.create(transaction_account_plan=self.account,
+                                               transaction_category_plan=category,
+                                               transaction_type_plan=transaction_type, transaction_date_plan=day,
+                                               transaction_sum_plan=Decimal(transaction_sum),
+                                               transaction_comment_plan='', transaction_recurrence_plan=recurrence)
+        self.client.force_login(self.user)
+
+    def expected_forecast(self, days: int) -> tuple:
+        """
+        Computes the forecast day by day: the planned occurrences plus 10.00 expense on every Monday. The amounts
+        are the Decimal strings of the response.
+        """
+        planned, expected, balances = [], [], []
+        balance = Decimal('1000.00')
+        for index in range(days):
+            day = self.start + timedelta(days=index)
+            amount = Decimal('100.00') if index % 7 == 0 else Decimal('0.00')
+            amount -= 50 if day in iter_occurrences(self.start - timedelta(days=40), MONTHLY, None, day, day) else 0
+            amount -= 20 if index == 3 else 0
+            amount -= 5 if index == 30 else 0
+            expense = Decimal('-10.00') if day.weekday() == 0 else Decimal('0.00')
+            balance += amount + expense
+            planned.append(str(amount))
+            expected.append(str(expense))
+            balances.append(str(balance))
+        return planned, expected, balances
+
+    def test_forecast(self):
+        """
+        This test checks the daily planned, expected and balance values and the weekday patterns, without the
+        categories that are planned in the forecast window.
+        """
+        response = self.client.get('/api/forecast', {'days': 20, 'history': 14})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        planned, expected, balances = self.expected_forecast(20)
+        self.assertEqual(data['start_date'], self.start.isoformat())
+        self.assertEqual(data['current_balance'], '1000.00')
+        self.assertEqual((data['planned'], data['expected'], data['balance']), (planned, expected, balances))
+        self.assertEqual(data['patterns'], [{'category': 'food', 'type': 'Expense',
+                                             'weekdays': ['-10.00'] + ['0.00'] * 6}])
+
+        # the planned food expense on day 30 replaces the food history
+        data = self.client.get('/api/forecast', {'days': 40, 'history': 14}).json()
+        self.assertEqual(data['patterns'], [])
+        self.assertEqual(data['planned'], self.expected_forecast(40)[0])
+        self.assertEqual(data['expected'], ['0.00'] * 40)
+
+    def test_engines_and_cache(self):
+        """
+        This test checks that the pure Python fallback computes the same forecast as NumPy, that the forecast is
+        cached until the next write and the responses for invalid parameters.
+        """
+        with mock.patch.object(forecast, 'numpy', None):
+            fallback = self.client.get('/api/forecast', {'days': 1825}).json()
+        cached = self.client.get('/api/forecast', {'days': 1825})
+        self.assertEqual(cached.json(), fallback)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(len(fallback['balance']), 1825)
+        caches['default'].clear()
+        self.assertEqual(self.client.get('/api/forecast', {'days': 1825}).json(), fallback)
+
+        self.client.post('/api/planning/transaction/add', json.dumps({
+            'transaction_type': '1', 'transaction_category': 'salary', 'transaction_date': str(self.start),
+            'transaction_sum': '1.00', 'transaction_comment': ''}), content_type='application/json')
+        response = self.client.get('/api/forecast', {'days': 1825})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(Decimal(response.json()['balance'][0]), Decimal(fallback['balance'][0]) + 1)
+
+        for params in ({'days': 0}, {'days': 5000}, {'days': 'x'}, {'history': 0}, {'history': 1000000000}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/forecast', params).status_code, 400)
+
+
+class TransactionTimeseriesTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with expenses and an income in January and an expense in March and logs the
+        user in.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        food = TransactionCategory.objects.create(category_type=0, category_name='food')
+        salary = TransactionCategory.objects.create(category_type=1, category_name='salary')
+        for day, category, transaction_type, transaction_sum in ((date(2023, 1, 2), food, 0, '10.00'),
+                                                                 (date(2023, 1, 4), food, 0, '5.00'),
+                                                                 (date(2023, 1, 20), salary, 1, '100.00'),
+                                                                 (date(2023, 3, 5), food, 0, '7.00')):
+            Transaction.objects.create(transaction_account=self.account, transaction_type=transaction_type,
+                                       transaction_category=category, transaction_date=day,
+                                       transaction_sum=Decimal(transaction_sum), transaction_comment='')
+        self.client.force_login(self.user)
+
+    def test_monthly_by_type(self):
+        """
+        This test checks the zero-filled monthly income and expense series and that they are read with one query.
+        """
+        get_catalog()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/transaction/timeseries', {'start': '2023-01-01', 'end': '2023-03-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([query for query in queries if 'FROM "hb_api_app_transaction"' in query['sql']]), 1)
+        self.assertEqual(response.json(), {
+            'bucket': 'month', 'group_by': 'type', 'buckets': ['2023-01-01', '2023-02-01', '2023-03-01'],
+            'series': {'Expense': ['15.00', '0.00', '7.00'], 'Income': ['100.00', '0.00', '0.00']},
+        })
+
+    def test_weekly_and_daily_by_category(self):
+        """
+        This test checks the weekly buckets, which start on Monday, the category series and the number of daily
+        buckets.
+        """
+        data = self.client.get('/api/transaction/timeseries', {'start': '2023-01-03', 'end': '2023-01-21',
+                                                               'bucket': 'week', 'group_by': 'category'}).json()
+        self.assertEqual(data['buckets'], ['2023-01-02', '2023-01-09', '2023-01-16'])
+        self.assertEqual(data['series'], {'food': ['5.00', '0.00', '0.00'], 'salary': ['0.00', '0.00', '100.00']})
+
+        data = self.client.get('/api/transaction/timeseries', {'start': '2023-01-01', 'end': '2023-01-31',
+                                                               'bucket': 'day'}).json()
+        self.assertEqual(len(data['buckets']), 31)
+        self.assertEqual(data['series']['Expense'][1], '10.00')
+        self.assertEqual(sum(Decimal(value) for value in data['series']['Expense']), Decimal('15.00'))
+
+    def test_bad_parameters(self):
+        """
+        This test checks the responses for missing dates, unknown buckets and groups and too many buckets.
+        """
+        for params in ({'start': '2023-01-01'}, {'start': '2023-02-01', 'end': '2023-01-01'},
+                       {'start': '2023-01-01', 'end': '2023-12-31', 'bucket': 'year'},
+                       {'start': '2023-01-01', 'end': '2023-12-31', 'group_by': 'comment'},
+                       {'start': '2000-01-01', 'end': '2023-12-31', 'bucket': 'day'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/transaction/timeseries', params).status_code, 400)
+
+    def test_last_buckets_before_date_max(self):
+        """
+        This test checks that ranges ending on 9999-12-31 end with the last bucket instead of overflowing.
+        """
+        for bucket, last in (('day', '9999-12-31'), ('week', '9999-12-27'), ('month', '9999-12-01')):
+            with self.subTest(bucket=bucket):
+                response = self.client.get('/api/transaction/timeseries', {'start': '9999-11-01', 'end': '9999-12-31',
+                                                                           'bucket': bucket})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['buckets'][-1], last)
+
+
+class BalanceHistoryTest(ViewTestCase):
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method creates a test user with an account and two categories, logs the user in and writes
+        transactions through the API: single and bulk adds in January, March and April, a back-dated expense in
+        December and the deletion of a January expense.
+        """
+        super().setUp()
+        self.user = User.objects.create_user(username='testuser', password='12345')
+        self.account = Account.objects.create(account_owner=self.user, account_number='1234567890')
+        TransactionCategory.objects.create(category_type=0, category_name='food')
+        TransactionCategory.objects.create(category_type=1, category_name='salary')
+        self.client.force_login(self.user)
+        for transaction_type, category, day, transaction_sum in (('1', 'salary', '2023-01-10', '1000.00'),
+                                                                 ('0', 'food', '2023-01-20', '100.00'),
+                                                                 ('0', 'food', '2023-03-05', '50.00'),
+                                                                 ('0', 'food', '2023-03-05', '20.00'),
+                                                                 ('0', 'food', '2022-12-31', '10.00')):
+            self.add(transaction_type, category, day, transaction_sum)
+        self.client.post('/api/transaction/bulk_add', [
+            {'transaction_type': '0', 'transaction_category': 'food', 'transaction_date': '2023-04-02',
+             'transaction_sum': '5.00', 'transaction_comment': ''},
+            {'transaction_type': '1', 'transaction_category': 'salary', 'transaction_date': '2023-05-10',
+             'transaction_sum': '1000.00', 'transaction_comment': ''},
+            {'transaction_type': '0', 'transaction_category': 'food', 'transaction_date': '2023-01-25',
+             'transaction_sum': '30.00', 'transaction_comment': ''},
+        ], content_type='application/json')
+        deleted = Transaction.objects.get(transaction_date=date(2023, 1, 20))
+        self.client.post(f'/api/transaction/{deleted.id}/delete')
+
+    def add(self, transaction_type, category, day, transaction_sum):
+        return self.client.post('/api/transaction/add', json.dumps({
+            'transaction_type': transaction_type, 'transaction_category': category, 'transaction_date': day,
+            'transaction_sum': transaction_sum, 'transaction_comment': ''}), content_type='application/json')
+
+    def expected_balance(self, day: date, last_id: int = None) -> Decimal:
+        """
+        Sums the signed transactions up to the day (on the day up to last_id) one by one.
+        """
+        return sum((row.transaction_sum if row.transaction_type == 1 else -row.transaction_sum
+                    for row in Transaction.objects.filter(transaction_account=self.account)
+                    if row.transaction_date < day or (row.transaction_date == day and
+                                                      (last_id is None or row.id <= last_id))), Decimal('0.00'))
+
+    def test_checkpoints_and_balance_on(self):
+        """
+        This test checks that the checkpoints maintained by the writes equal the rebuilt ones and the balance on
+        dates before, inside, between and after the months with transactions.
+        """
+        checkpoints = list(BalanceCheckpoint.objects.filter(checkpoint_account=self.account).order_by(
+            'checkpoint_month').values_list('checkpoint_month', 'checkpoint_balance'))
+        self.assertEqual(checkpoints, [(date(2022, 12, 1), Decimal('-10.00')), (date(2023, 1, 1), Decimal('960.00')),
+                                       (date(2023, 3, 1), Decimal('890.00')), (date(2023, 4, 1), Decimal('885.00')),
+                                       (date(2023, 5, 1), Decimal('1885.00'))])
+        rebuild_rollup(self.account)
+        self.assertEqual(list(BalanceCheckpoint.objects.filter(checkpoint_account=self.account).order_by(
+            'checkpoint_month').values_list('checkpoint_month', 'checkpoint_balance')), checkpoints)
+        self.assertEqual(Account.objects.get(pk=self.account.pk).account_balance, checkpoints[-1][1])
+
+        for day in (date(2022, 11, 30), date(2022, 12, 31), date(2023, 1, 9), date(2023, 1, 10), date(2023, 2, 14),
+                    date(2023, 3, 4), date(2023, 3, 5), date(2023, 4, 30), date(2024, 1, 1)):
+            with self.subTest(day=day):
+                self.assertEqual(balance_on(self.account.id, day), self.expected_balance(day))
+
+    def test_checkpoint_queries_and_backfill(self):
+        """
+        This test checks that a bulk add into many months without checkpoints reads the previous checkpoint once,
+        and that the backfill of the migration recreates the checkpoints from the rollup.
+        """
+        items = [{'transaction_type': '0', 'transaction_category': 'food', 'transaction_sum': '1.00',
+                  'transaction_date': f'{year}-{month:02}-15', 'transaction_comment': ''}
+                 for year in (2021, 2024) for month in range(1, 13)]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/api/transaction/bulk_add', items, content_type='application/json')
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('SELECT') and
+                              'FROM "hb_api_app_balancecheckpoint"' in query['sql']]), 2)
+        maintained = list(BalanceCheckpoint.objects.order_by('checkpoint_month').values_list(
+            'checkpoint_month', 'checkpoint_balance'))
+        self.assertEqual(maintained[12:17], [(date(2022, 12, 1), Decimal('-22.00')),
+                                             (date(2023, 1, 1), Decimal('948.00')),
+                                             (date(2023, 3, 1), Decimal('878.00')),
+                                             (date(2023, 4, 1), Decimal('873.00')),
+                                             (date(2023, 5, 1), Decimal('1873.00'))])
+        self.assertEqual(maintained[-1], (date(2024, 12, 1), Decimal('1861.00')))
+
+        BalanceCheckpoint.objects.all().delete()
+        backfill = import_module('hb_api_app.migrations.0011_backfill_balance_checkpoints')
+        backfill.backfill_checkpoints(django_apps, None)
+        self.assertEqual(list(BalanceCheckpoint.objects.order_by('checkpoint_month').values_list(
+            'checkpoint_month', 'checkpoint_balance')), maintained)
+
+    def test_balance_endpoint(self):
+        """
+        This test checks the point-in-time balance endpoint, its query count and the response for an invalid date.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/user/account/balance', {'date': '2023-03-20'})
+        self.assertEqual(response.json(), {'date': '2023-03-20', 'balance': '890.00'})
+        # session, user, account version, account, checkpoint, transactions of the month
+        self.assertLessEqual(len(queries), 6)
+        self.assertEqual(self.client.get('/api/user/account/balance').json()['balance'], '1885.00')
+        self.assertEqual(self.client.get('/api/user/account/balance', {'date': '2023-13-01'}).status_code, 400)
+
+    def test_running_balance(self):
+        """
+        This test checks the running_balance column of transaction_latest over several pages and in the columnar
+        format, and that it is not returned without the parameter.
+        """
+        rows, after = [], None
+        while True:
+            params = {'limit': 3, 'running_balance': 'true', 'fields': 'id,transaction_sum'}
+            data = self.client.get('/api/transaction/latest', {**params, **({'after': after} if after else {})}).json()
+            rows += data['transactions']
+            after = data['next_cursor']
+            if after is None:
+                break
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(set(rows[0]), {'id', 'transaction_sum', 'running_balance'})
+        for row in rows:
+            transaction = Transaction.objects.get(pk=row['id'])
+            self.assertEqual(Decimal(row['running_balance']),
+                             self.expected_balance(transaction.transaction_date, transaction.id))
+
+        data = self.client.get('/api/transaction/latest', {'running_balance': 'true', 'format': 'columnar'}).json()
+        self.assertEqual(data['transactions']['running_balance'], [row['running_balance'] for row in rows])
+        self.assertNotIn('running_balance', self.client.get('/api/transaction/latest').json()['transactions'][0])
+
+    @override_settings(ROOT_URLCONF=AsyncReadUrls)
+    def test_async_running_balance(self):
+        """
+        This test checks the running_balance column of the async transaction_latest view.
+        """
+        self.async_client.force_login(self.user)
+        rows = async_to_sync(self.async_client.get)('/api/transaction/latest',
+                                                     {'running_balance': 'true'}).json()['transactions']
+        self.assertEqual(len(rows), 7)
+        for row in rows:
+            self.assertEqual(Decimal(row['running_balance']),
+                             self.expected_balance(date.fromisoformat(row['transaction_date']), row['id']))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MigrationBackfillTest(TransactionTestCase):
+    migrate_from = ('hb_api_app', '0004_transaction_indexes')
+
+    def setUp(self):
+        """
+        Method called before each test case in order to set up initial data.
+        This method migrates the database back to the state before the rollup and creates an account with two
+        transactions through the historical models, like a database populated before the upgrade.
+        """
+        caches['default'].clear()
+        executor = MigrationExecutor(connection)
+        self.migrate_to = executor.loader.graph.leaf_nodes('hb_api_app')
+        executor.migrate([self.migrate_from])
+        old_apps = executor.loader.project_state([self.migrate_from]).apps
+        user = old_apps.get_model('auth', 'User').objects.create(username='testuser')
+        account = old_apps.get_model('hb_api_app', 'Account').objects.create(account_owner=user,
+                                                                             account_number='1234567890')
+        category = old_apps.get_model('hb_api_app', 'TransactionCategory').objects.create(category_type=1,
+                                                                                          category_name='salary')
+        for transaction_type, transaction_sum, day in ((1, Decimal('100.00'), 10), (0, Decimal('30.00'), 12)):
+            old_apps.get_model('hb_api_app', 'Transaction').objects.create(
+                transaction_account=account, transaction_type=transaction_type, transaction_category=category,
+                transaction_date=date(2023, 1, day), transaction_sum=transaction_sum, transaction_comment='test')
+        self.user_id = user.pk
+
+    def migrate(self):
+        """
+        Applies the remaining migrations.
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+
+    def test_rollup_backfill(self):
+        """
+        This test checks that the migration creating the rollup fills it from the existing transactions, so the
+        statistic of a full month answered from the rollup includes them.
+        """
+        self.migrate()
+        self.assertEqual(list(TransactionRollup.objects.order_by('rollup_type').values_list(
+            'rollup_month', 'rollup_type', 'rollup_sum', 'rollup_count')),
+            [(date(2023, 1, 1), 0, Decimal('30.00'), 1), (date(2023, 1, 1), 1, Decimal('100.00'), 1)])
+        self.client.force_login(User.objects.get(pk=self.user_id))
+        response = self.client.get('/api/transaction/statistic', {'transaction_start_date': '2023-01-01',
+                                                                  'transaction_end_date': '2023-01-31'})
+        self.assertEqual(response.json()['statistic_data'][:2], [{'overall_income': 100.0},
+                                                                 {'overall_expense': 30.0}])
+
+    def test_checkpoint_backfill(self):
+        """
+        This test checks that the checkpoint migration computes the balances from the existing transactions, so
+        the balance of a later month includes them.
+        """
+        self.migrate()
+        self.assertEqual(list(BalanceCheckpoint.objects.values_list('checkpoint_month', 'checkpoint_balance')),
+                         [(date(2023, 1, 1), Decimal('70.00'))])
+        account = Account.objects.get(account_owner_id=self.user_id)
+        self.assertEqual(balance_on(account.pk, date(2023, 2, 15)), Decimal('70.00'))
+        self.client.force_login(User.objects.get(pk=self.user_id))
+        response = self.client.get('/api/user/account/balance', {'date': '2023-02-15'})
+        self.assertEqual(response.json()['balance'], '70.00')
@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+
+from .category_cache import category_names
+from .models import Account, Transaction
+from .rollup import next_month
+
+# bucket: date truncation of the query
+BUCKETS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+# group_by: grouped field of the query
+GROUPS = {'type': 'transaction_type', 'category': 'transaction_category'}
+MAX_BUCKETS = 3660
+TYPE_NAMES = {0: 'Expense', 1: 'Income'}
+ZERO = Decimal('0.00')
+
+
+class TimeseriesError(ValueError):
+    """Raised when a time series request covers more than HB_TIMESERIES_MAX_BUCKETS buckets."""
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    """
+    Returns the first day of the bucket of a date: the day itself, the Monday of its week or the first of its month.
+    """
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def iter_buckets(start: date, end: date, bucket: str):
+    """
+    Yields the first days of all buckets of a range, the first bucket may start before the range. Stops at the last
+    bucket before date.max.
+    """
+    current = bucket_start(start, bucket)
+    while current <= end:
+        yield current
+        try:
+            current = next_month(current) if bucket == 'month' else current + timedelta(
+                days=7 if bucket == 'week' else 1)
+        except OverflowError:
+            return
+
+
+def timeseries_data(account: Account, start: date, end: date, bucket: str, group_by: str) -> dict:
+    """
+    Returns the transaction sums of a range per day, week or month and per type or category. All buckets come from
+    one query grouped by the truncated date, the buckets without transactions are filled with zeros.
+    :param account: The account of the user.
+    :type account: Account
+    :param start: First day of the range.
+    :type start: date
+    :param end: Last day of the range, inclusive.
+    :type end: date
+    :param bucket: day, week or month.
+    :type bucket: str
+    :param group_by: type or category.
+    :type group_by: str
+    :return: The first days of the buckets and one list of sums per type or category name.
+    :rtype: dict
+    :raises TimeseriesError: If the range has too many buckets.
+    """
+    buckets = []
+    for day in iter_buckets(start, end, bucket):
+        buckets.append(day)
+        if len(buckets) > getattr(settings, 'HB_TIMESERIES_MAX_BUCKETS', MAX_BUCKETS):
+            raise TimeseriesError('Too many buckets')
+    positions = {day: index for index, day in enumerate(buckets)}
+
+    rows = Transaction.objects.filter(
+        transaction_account=account, transaction_date__range=[start, end]
+    ).order_by().values(bucket=BUCKETS[bucket]('transaction_date'), group=F(GROUPS[group_by])).annotate(
+        total=Sum('transaction_sum'))
+    series = {}
+    for row in rows:
+        sums = series.setdefault(row['group'], [ZERO] * len(buckets))
+        sums[positions[row['bucket']]] = row['total'].quantize(ZERO)
+
+    names = TYPE_NAMES if group_by == 'type' else category_names(set(series))
+    if group_by == 'type':
+        for transaction_type in TYPE_NAMES:
+            series.setdefault(transaction_type, [ZERO] * len(buckets))
+    return {
+        'bucket': bucket,
+        'group_by': group_by,
+        'buckets': buckets,
+        'series': {names[group]: series[group] for group in sorted(series, key=lambda group: names[group] or '')},
+    }
@@ -1,23 +1,46 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import views, async_views
 
-urlpatterns = [
-    path('', views.index, name='index'),
-    path('auth_error', views.auth_error, name='auth_error'),
-    path('api/user/login', views.user_login, name='user_login'),
-    path('api/user/logout', views.user_logout, name='user_logout'),
-    path('api/user/register', views.user_register, name='user_register'),
-    path('api/user/account', views.user_account, name='user_account'),
-    path('api/transaction/latest', views.transaction_latest, name='transaction_latest'),
-    path('api/transaction/filter', views.transaction_filter, name='transaction_filter'),
-    path('api/transaction/add', views.transaction_add, name='transaction_add'),
-    path('api/transaction/<int:transaction_id>/delete', views.transaction_delete, name='transaction_delete'),
-    path('api/categories', views.categories, name='categories'),
-    path('api/transaction/statistic', views.transaction_statistic, name='transaction_statistic'),
-    path('api/planning/planned_transactions', views.planned_transactions, name='planned_transactions'),
-    path('api/planning/transaction/add', views.planned_transaction_add, name='planned_transaction_add'),
-    path('api/planning/transaction/<int:transaction_id>/delete', views.planned_transaction_delete,
-         name='planned_transaction_delete'),
-    path('api/planning/transaction/statistic', views.planned_transaction_statistic, name='planned_transaction_statistic'),
-]
+
+def url_patterns(read_views) -> list:
+    """
+    Returns the URL patterns of the app.
+    :param read_views: The module with the read-only views: views, or async_views under ASGI (HB_ASYNC_VIEWS).
+    :return: The list of URL patterns.
+    :rtype: list
+    """
+    return [
+        path('', views.index, name='index'),
+        path('auth_error', views.auth_error, name='auth_error'),
+        path('api/user/login', views.user_login, name='user_login'),
+        path('api/user/logout', views.user_logout, name='user_logout'),
+        path('api/user/register', views.user_register, name='user_register'),
+        path('api/user/account', read_views.user_account, name='user_account'),
+        path('api/user/account/balance', views.account_balance, name='account_balance'),
+        path('api/transaction/latest', read_views.transaction_latest, name='transaction_latest'),
+        path('api/transaction/filter', read_views.transaction_filter, name='transaction_filter'),
+        path('api/transaction/export', views.transaction_export, name='transaction_export'),
+        path('api/transaction/add', views.transaction_add, name='transaction_add'),
+        path('api/transaction/bulk_add', views.transaction_bulk_add, name='transaction_bulk_add'),
+        path('api/transaction/import', views.transaction_import, name='transaction_import'),
+        path('api/transaction/<int:transaction_id>/delete', views.transaction_delete, name='transaction_delete'),
+        path('api/categories', read_views.categories, name='categories'),
+        path('api/transaction/statistic', read_views.transaction_statistic, name='transaction_statistic'),
+        path('api/transaction/timeseries', views.transaction_timeseries, name='transaction_timeseries'),
+        path('api/planning/planned_transactions', views.planned_transactions, name='planned_transactions'),
+        path('api/planning/transaction/add', views.planned_transaction_add, name='planned_transaction_add'),
+        path('api/planning/transaction/<int:transaction_id>/delete', views.planned_transaction_delete,
+             name='planned_transaction_delete'),
+        path('api/planning/transaction/statistic', read_views.planned_transaction_statistic,
+             name='planned_transaction_statistic'),
+        path('api/planning/variance', views.planned_variance, name='planned_variance'),
+        path('api/forecast', views.forecast, name='forecast'),
+        path('api/sync', views.sync, name='sync'),
+        path('api/stats/cache', views.response_cache_stats, name='response_cache_stats'),
+        path('api/stats/timings', views.request_timings, name='request_timings'),
+    ]
+
+
+urlpatterns = url_patterns(async_views if getattr(settings, 'HB_ASYNC_VIEWS', False) else views)
@@ -0,0 +1,153 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .category_cache import category_names
+from .models import Account, Transaction, PlanningTransaction, TransactionRollup
+from .recurrence import NONE, count_occurrences, schedule_rows
+from .rollup import split_range, next_month
+
+GRANULARITIES = ('month', 'year')
+# The rollup month arithmetic needs the first day of the month after the range
+LAST_END = date(9999, 11, 30)
+MAX_PERIODS = 240
+TYPE_NAMES = {0: 'Expense', 1: 'Income'}
+ZERO = Decimal('0.00')
+
+
+class VarianceError(ValueError):
+    """Raised when a variance request covers more than HB_VARIANCE_MAX_PERIODS periods or ends after LAST_END."""
+
+
+def period_count(start: date, end: date, granularity: str) -> int:
+    """
+    Returns the number of months or years a range touches.
+    """
+    years = end.year - start.year
+    return years + 1 if granularity == 'year' else years * 12 + end.month - start.month + 1
+
+
+def period_start(day: date, granularity: str) -> date:
+    """
+    Returns the first day of the month or year of the given date.
+    """
+    return day.replace(day=1) if granularity == 'month' else date(day.year, 1, 1)
+
+
+def iter_periods(start: date, end: date, granularity: str):
+    """
+    Yields the (period start, first day, last day) triples of the months or years of a range, the first and last day
+    cut to the range.
+    """
+    current = period_start(start, granularity)
+    while True:
+        # The last day of the period, date(10000, 1, 1) does not exist
+        last_day = next_month(current) - timedelta(days=1) if granularity == 'month' else date(current.year, 12, 31)
+        yield current, max(current, start), min(last_day, end)
+        if last_day >= end:
+            return
+        current = last_day + timedelta(days=1)
+
+
+def period_label(day: date, granularity: str) -> str:
+    return f'{day:%Y-%m}' if granularity == 'month' else f'{day:%Y}'
+
+
+def actual_queries(account: Account, start: date, end: date) -> list:
+    """
+    Returns the grouped queries of the actual sums per month, type and category id: full months from the monthly
+    rollup, the partial months at the edges of the range from the raw transactions.
+    :rtype: list
+    """
+    months, edges = split_range(start, end)
+    queries = []
+    if months:
+        queries.append(TransactionRollup.objects.filter(
+            rollup_account=account, rollup_month__gte=months[0], rollup_month__lt=months[1], rollup_count__gt=0
+        ).order_by().values(month=F('rollup_month'), type=F('rollup_type'), category=F('rollup_category')).annotate(
+            total=Sum('rollup_sum')))
+    if edges:
+        edge_filter = Q()
+        for edge in edges:
+            edge_filter |= Q(transaction_date__range=edge)
+        queries.append(Transaction.objects.filter(edge_filter, transaction_account=account).order_by().values(
+            month=TruncMonth('transaction_date'), type=F('transaction_type'),
+            category=F('transaction_category')).annotate(total=Sum('transaction_sum')))
+    return queries
+
+
+def planned_query(account: Account, start: date, end: date):
+    """
+    Returns the grouped query of the single planned transactions per month, type and category id.
+    """
+    return PlanningTransaction.objects.filter(
+        transaction_account_plan=account, transaction_recurrence_plan=NONE, transaction_date_plan__range=[start, end]
+    ).order_by().values(month=TruncMonth('transaction_date_plan'), type=F('transaction_type_plan'),
+                        category=F('transaction_category_plan')).annotate(total=Sum('transaction_sum_plan'))
+
+
+def variance_data(account: Account, start: date, end: date, granularity: str = 'month') -> dict:
+    """
+    Builds the planning variance response: planned and actual sums and their difference (actual - planned) per
+    period and type, and per period, category and type. The actual sums come from the monthly rollup and the raw
+    transactions of the partial edge months, the single planned transactions are grouped in the database and the
+    occurrences of the schedules are counted per period, so the report costs at most four queries for any range.
+    :param account: The account of the user.
+    :type account: Account
+    :param start: First day of the report.
+    :type start: date
+    :param end: Last day of the report, inclusive.
+    :type end: date
+    :param granularity: month or year.
+    :type granularity: str
+    :return: The report with the periods and categories lists.
+    :rtype: dict
+    :raises VarianceError: If the range has too many periods or ends too close to date.max.
+    """
+    if end > LAST_END:
+        raise VarianceError('End date out of range')
+    if period_count(start, end, granularity) > getattr(settings, 'HB_VARIANCE_MAX_PERIODS', MAX_PERIODS):
+        raise VarianceError('Too many periods')
+    periods = list(iter_periods(start, end, granularity))
+    # (period start, type, category id) -> [planned, actual]
+    sums = {}
+
+    def add(month, transaction_type, category, total, column):
+        key = (period_start(month, granularity), transaction_type, category)
+        sums.setdefault(key, [ZERO, ZERO])[column] += total
+
+    for query in actual_queries(account, start, end):
+        for row in query:
+            add(row['month'], row['type'], row['category'], row['total'], 1)
+    for row in planned_query(account, start, end):
+        add(row['month'], row['type'], row['category'], row['total'], 0)
+    schedules = schedule_rows(PlanningTransaction.objects.filter(transaction_account_plan=account), start, end,
+                              'transaction_type_plan', 'transaction_category_plan', 'transaction_sum_plan')
+    for row in schedules:
+        for period, first_day, last_day in periods:
+            count = count_occurrences(row['transaction_date_plan'], row['transaction_recurrence_plan'],
+                                      row['transaction_recurrence_end_plan'], first_day, last_day)
+            if count:
+                add(period, row['transaction_type_plan'], row['transaction_category_plan'],
+                    row['transaction_sum_plan'] * count, 0)
+
+    names = category_names({category for _, _, category in sums})
+    totals = {(period, transaction_type): [ZERO, ZERO] for period, _, _ in periods for transaction_type in TYPE_NAMES}
+    categories = []
+    for (period, transaction_type, category), (planned, actual) in sums.items():
+        totals[period, transaction_type][0] += planned
+        totals[period, transaction_type][1] += actual
+        categories.append({'period': period_label(period, granularity), 'category': names[category],
+                           'type': TYPE_NAMES[transaction_type], 'planned': planned, 'actual': actual,
+                           'variance': actual - planned})
+    categories.sort(key=lambda row: (row['period'], row['type'], row['category'] or ''))
+    return {
+        'granularity': granularity,
+        'periods': [{'period': period_label(period, granularity), 'type': TYPE_NAMES[transaction_type],
+                     'planned': planned, 'actual': actual, 'variance': actual - planned}
+                    for (period, transaction_type), (planned, actual) in totals.items()],
+        'categories': categories,
+    }
@@ -1,17 +1,42 @@
+import io
 import json
 from datetime import datetime
 from decimal import Decimal
 
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
-from django.db.models import Sum, FloatField
+from django.db import transaction as db_transaction
 
-from django.http import HttpResponse, JsonResponse, HttpRequest
+from django.db.models import QuerySet
+from django.http import HttpResponse, HttpRequest, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.views.decorators.http import require_http_methods
 
-from .models import Account, Transaction, TransactionCategory, PlanningTransaction
+from .balance import balance_delta, apply_balance_delta
+from .balance_history import RUNNING_BALANCE_FIELDS, add_running_balances, balance_on
+from .category_cache import category_id, category_ids, get_catalog
+from .export import EXPORT_FIELDS, EXPORT_FORMATS
+from .forecast import ForecastError, forecast_params, forecast_data
+from .ingest import parse_transaction_item, save_transactions
+from .models import Account, Transaction, PlanningTransaction
+from .pagination import CursorError, page_limit, page_params, keyset_page
+from .projection import (TRANSACTION_FIELDS, PLANNED_TRANSACTION_FIELDS, ProjectionError, projection_params,
+                         projected_data)
+from .recurrence import RECURRENCE_NAMES, SCHEDULE_FIELDS, in_window, expand_rows
+from .instrumentation import histograms
+from .response_cache import cache_per_account, conditional_per_account, cache_stats
+from .responses import JsonResponse
+from .rollup import add_to_rollup
+from .routers import route_database
+from .statement_import import STATEMENT_FORMATS, StatementError, import_transactions
+from .stats import transaction_statistic_data, planned_transaction_statistic_data
+from .sync import TRANSACTION, PLANNING_TRANSACTION, SyncTokenExpired, add_tombstone, sync_changes
+from .timeseries import BUCKETS, GROUPS, TimeseriesError, timeseries_data
+from .variance import GRANULARITIES, VarianceError, variance_data
 
 
 # Create your views here.
@@ -99,6 +124,9 @@ def user_register(request: HttpRequest) -> JsonResponse:
 
 @login_required(login_url='/auth_error')
 @require_http_methods(["GET"])
+@route_database
+@conditional_per_account
+@cache_per_account('user_account')
 def user_account(request: HttpRequest) -> JsonResponse:
     """
     Returns account data for the authenticated user.
@@ -116,36 +144,68 @@ def user_account(request: HttpRequest) -> JsonResponse:
 
 @login_required(login_url='/auth_error')
 @require_http_methods(["GET"])
-def transaction_latest(request: HttpRequest) -> JsonResponse:
+@route_database
+@cache_per_account('account_balance')
+def account_balance(request: HttpRequest) -> JsonResponse:
     """
-    Returns the latest transactions for the authenticated user.
+    Returns the balance of the user's account at the end of a day (parameter date, default today), computed from
+    the monthly balance checkpoints and the transactions of one month.
     :param request: The HTTP request object.
     :type request: HttpRequest
-    :return: JSON object containing the latest transactions.
+    :return: JsonResponse object with the date and the balance.
     :rtype: JsonResponse
     """
     account_data = get_object_or_404(Account, account_owner=request.user)
-    transactions = Transaction.objects.filter(transaction_account=account_data).order_by('-transaction_date')
-    transactions = list(
-        transactions.values('id', 'transaction_date', 'transaction_type', 'transaction_category__category_name',
-                            'transaction_sum',
-                            'transaction_comment'))
-    return JsonResponse(status=200, data={"transactions": transactions})
+    day = request.GET.get("date")
+    try:
+        day = datetime.strptime(day, '%Y-%m-%d').date() if day else timezone.localdate()
+    except ValueError:
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    return JsonResponse(status=200, data={"date": day, "balance": balance_on(account_data.id, day)})
 
 
 @login_required(login_url='/auth_error')
 @require_http_methods(["GET"])
-def transaction_filter(request: HttpRequest) -> JsonResponse:
+@route_database
+@conditional_per_account
+@cache_per_account('transaction_latest')
+def transaction_latest(request: HttpRequest) -> JsonResponse:
     """
-    View function for filtering transactions based on various parameters.
+    Returns the latest transactions for the authenticated user, one page at a time. The fields and format parameters
+    select the columns and the row or columnar layout, see projection_params. With running_balance=true every row
+    has the balance after the transaction.
     :param request: The HTTP request object.
     :type request: HttpRequest
-    :return: A JSON response containing a list of filtered transactions.
+    :return: JSON object containing the latest transactions and the cursor of the next page.
     :rtype: JsonResponse
     """
     account_data = get_object_or_404(Account, account_owner=request.user)
-    transactions = Transaction.objects.filter(transaction_account=account_data).order_by('-transaction_date')
+    running_balance = request.GET.get("running_balance") == "true"
+    try:
+        limit, after = page_params(request)
+        projection = projection_params(request, TRANSACTION_FIELDS, 'transaction_category',
+                                       ('id', 'transaction_date') + (RUNNING_BALANCE_FIELDS if running_balance else ()))
+    except (CursorError, ProjectionError):
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    transactions = Transaction.objects.filter(transaction_account=account_data)
+    transactions, next_cursor = keyset_page(transactions, 'transaction_date', limit, after,
+                                            *projection.query_fields)
+    if running_balance:
+        projection = add_running_balances(account_data.id, transactions, projection)
+    return JsonResponse(status=200, data={**projected_data('transactions', transactions, projection),
+                                          "next_cursor": next_cursor})
 
+
+def filter_transactions(request: HttpRequest, transactions: QuerySet) -> QuerySet:
+    """
+    Applies the filters of transaction_filter and transaction_export to a Transaction queryset.
+    :param request: The HTTP request object with the filter parameters.
+    :type request: HttpRequest
+    :param transactions: The Transaction queryset of the user's account.
+    :type transactions: QuerySet
+    :return: The filtered queryset.
+    :rtype: QuerySet
+    """
     transaction_date = request.GET.get("transaction_date")
     transaction_type = request.GET.get("transaction_type")
     transaction_category = request.GET.get("transaction_category")
@@ -168,15 +228,72 @@ def transaction_filter(request: HttpRequest) -> JsonResponse:
     if transaction_category:
         transactions = transactions.filter(transaction_category__category_name=transaction_category)
 
-    transactions = list(
-        transactions.values('transaction_date', 'transaction_type', 'transaction_category__category_name',
-                            'transaction_sum', 'transaction_comment'))
+    return transactions
+
+
+@login_required(login_url='/auth_error')
+@require_http_methods(["GET"])
+@route_database
+@conditional_per_account
+def transaction_filter(request: HttpRequest) -> JsonResponse:
+    """
+    View function for filtering transactions based on various parameters, one page at a time. Accepts the fields and
+    format parameters of transaction_latest.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: A JSON response containing a list of filtered transactions and the cursor of the next page.
+    :rtype: JsonResponse
+    """
+    account_data = get_object_or_404(Account, account_owner=request.user)
+    try:
+        limit, after = page_params(request)
+        projection = projection_params(request, TRANSACTION_FIELDS, 'transaction_category',
+                                       ('id', 'transaction_date'))
+    except (CursorError, ProjectionError):
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    transactions = Transaction.objects.filter(transaction_account=account_data)
+
+    transactions = filter_transactions(request, transactions)
 
-    return JsonResponse(status=200, data={"transactions": transactions})
+    transactions, next_cursor = keyset_page(transactions, 'transaction_date', limit, after,
+                                            *projection.query_fields)
+
+    return JsonResponse(status=200, data={**projected_data('transactions', transactions, projection),
+                                          "next_cursor": next_cursor})
 
 
 @login_required(login_url='/auth_error')
 @require_http_methods(["GET"])
+@route_database
+def transaction_export(request: HttpRequest) -> HttpResponse:
+    """
+    Streams the transactions of the authenticated user as CSV or NDJSON, newest first. Accepts the filters of
+    transaction_filter. Rows are read with a server side cursor and encoded while they are sent, so the worker
+    memory does not depend on the size of the history.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: A streaming response with the exported transactions.
+    :rtype: HttpResponse
+    """
+    account_data = get_object_or_404(Account, account_owner=request.user)
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse(status=400, data={"error": "Unsupported format"})
+    transactions = filter_transactions(request, Transaction.objects.filter(transaction_account=account_data))
+    # The rows are read after the view returned, pin the database chosen by route_database now
+    rows = transactions.using(transactions.db).order_by('-transaction_date', '-id').values_list(
+        *EXPORT_FIELDS).iterator(
+        chunk_size=getattr(settings, 'HB_EXPORT_CHUNK_SIZE', 2000))
+    encoder, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(encoder(rows), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+    return response
+
+
+@login_required(login_url='/auth_error')
+@require_http_methods(["GET"])
+@route_database
+@cache_per_account('transaction_statistic')
 def transaction_statistic(request: HttpRequest) -> JsonResponse:
     """
     Function for statistics on transactions for the selected period. Gives the total amount of income and expenses
@@ -187,36 +304,52 @@ def transaction_statistic(request: HttpRequest) -> JsonResponse:
     :rtype: JsonResponse
     """
     account_data = get_object_or_404(Account, account_owner=request.user)
-    transactions = Transaction.objects.filter(transaction_account=account_data)
 
     transaction_start_date = request.GET.get("transaction_start_date")
     transaction_end_date = request.GET.get("transaction_end_date")
 
     if transaction_start_date and transaction_end_date:
-        transaction_start_date = datetime.strptime(transaction_start_date, '%Y-%m-%d')
-        transaction_end_date = datetime.strptime(transaction_end_date, '%Y-%m-%d')
-        transactions = transactions.filter(transaction_date__range=[transaction_start_date, transaction_end_date])
+        transaction_start_date = datetime.strptime(transaction_start_date, '%Y-%m-%d').date()
+        transaction_end_date = datetime.strptime(transaction_end_date, '%Y-%m-%d').date()
     else:
         return JsonResponse(status=400, data={"error": "Bad request"})
 
-    transaction_inc_sum = transactions.filter(transaction_type=1).aggregate(
-        overall_income=Sum('transaction_sum', output_field=FloatField()))
-    transaction_exp_sum = transactions.filter(transaction_type=0).aggregate(
-        overall_expense=Sum('transaction_sum', output_field=FloatField()))
+    statistic_data = transaction_statistic_data(account_data, transaction_start_date, transaction_end_date)
+    return JsonResponse(status=200, data={"statistic_data": statistic_data})
 
-    category_list = list(transactions.values('transaction_category__category_name'))
-    category_name_list = [
-        *set(category_list[i]['transaction_category__category_name'] for i in range(len(category_list)))]
-    statistic_data = [transaction_inc_sum, transaction_exp_sum]
-    for c in category_name_list:
-        statistic_data.append({c: transactions.filter(transaction_category__category_name=c).aggregate(
-            Sum('transaction_sum', output_field=FloatField()))["transaction_sum__sum"]})
 
-    return JsonResponse(status=200, data={"statistic_data": statistic_data})
+@login_required(login_url='/auth_error')
+@require_http_methods(["GET"])
+@route_database
+@cache_per_account('transaction_timeseries')
+def transaction_timeseries(request: HttpRequest) -> JsonResponse:
+    """
+    Returns the income and expense (group_by=type, default) or category (group_by=category) sums of the selected
+    period per day, week or month (parameter bucket, default month) for charts, buckets without transactions are 0.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JsonResponse object with the first days of the buckets and the sums of each series.
+    :rtype: JsonResponse
+    """
+    account_data = get_object_or_404(Account, account_owner=request.user)
+    bucket = request.GET.get("bucket", "month")
+    group_by = request.GET.get("group_by", "type")
+    try:
+        start = datetime.strptime(request.GET["start"], '%Y-%m-%d').date()
+        end = datetime.strptime(request.GET["end"], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    if start > end or bucket not in BUCKETS or group_by not in GROUPS:
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    try:
+        return JsonResponse(status=200, data=timeseries_data(account_data, start, end, bucket, group_by))
+    except TimeseriesError:
+        return JsonResponse(status=400, data={"error": "Too many buckets"})
 
 
 @login_required(login_url='/auth_error')
 @require_http_methods(["POST"])
+@route_database
 def transaction_add(request: HttpRequest) -> JsonResponse:
     """Add a new transaction to the account of the logged-in user.
     :param request: The HTTP request object.
@@ -229,31 +362,102 @@ def transaction_add(request: HttpRequest) -> JsonResponse:
     try:
         data = json.loads(request.body)
         transaction_type = int(data['transaction_type'])
-        transaction_category = TransactionCategory.objects.get(category_name=str(data['transaction_category']))
-        transaction_date = datetime.strptime(data['transaction_date'], '%Y-%m-%d')
+        transaction_category_id = category_id(str(data['transaction_category']))
+        transaction_date = datetime.strptime(data['transaction_date'], '%Y-%m-%d').date()
         transaction_sum = abs(Decimal(data['transaction_sum']))
         transaction_comment = str(data['transaction_comment'])
     except:
         return JsonResponse(status=400, data={"error": "Bad request"})
 
     transaction = Transaction(transaction_account=account_data, transaction_type=transaction_type,
-                              transaction_category=transaction_category, transaction_date=transaction_date,
+                              transaction_category_id=transaction_category_id, transaction_date=transaction_date,
                               transaction_sum=transaction_sum, transaction_comment=transaction_comment)
-    if transaction_type == 1:
-        account_data.account_balance += transaction_sum
-    elif transaction_type == 0:
-        account_data.account_balance -= transaction_sum
-    else:
+    if transaction_type not in (0, 1):
         return JsonResponse(status=400, data={"error": "Bad request"})
 
-    account_data.save()
-    transaction.save()
+    with db_transaction.atomic():
+        transaction.save()
+        apply_balance_delta(account_data.id, balance_delta(transaction_type, transaction_sum))
+        add_to_rollup(transaction)
 
     return JsonResponse(status=200, data={"transaction": transaction.id})
 
 
 @login_required(login_url='/auth_error')
 @require_http_methods(["POST"])
+@route_database
+def transaction_bulk_add(request: HttpRequest) -> JsonResponse:
+    """
+    Adds a list of transactions to the account of the logged-in user in one database transaction. All items are
+    validated first, if any of them is invalid nothing is saved.
+    :param request: The HTTP request object, the body is a JSON array of transactions.
+    :type request: HttpRequest
+    :return: JsonResponse object with the IDs of the added transactions.
+    A JsonResponse with the errors of every invalid item if the request fails.
+    :rtype: JsonResponse
+    """
+    account_data = get_object_or_404(Account, account_owner=request.user)
+    try:
+        items = json.loads(request.body)
+    except ValueError:
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    max_items = getattr(settings, 'HB_BULK_ADD_MAX_ITEMS', 10000)
+    if not isinstance(items, list) or not items or len(items) > max_items:
+        return JsonResponse(status=400, data={"error": f"Expected a list of 1 to {max_items} transactions"})
+
+    category_names = {str(item.get('transaction_category')) for item in items if isinstance(item, dict)}
+    category_id_map = category_ids(category_names)
+
+    transactions = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            transactions.append(Transaction(transaction_account=account_data,
+                                            **parse_transaction_item(item, category_id_map)))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    if errors:
+        return JsonResponse(status=400, data={"errors": errors})
+
+    save_transactions(account_data, transactions, getattr(settings, 'HB_BULK_ADD_BATCH_SIZE', 1000))
+
+    return JsonResponse(status=200, data={"transactions": [transaction.id for transaction in transactions]})
+
+
+@login_required(login_url='/auth_error')
+@require_http_methods(["POST"])
+@route_database
+def transaction_import(request: HttpRequest) -> JsonResponse:
+    """
+    Imports a CSV or OFX bank statement uploaded as the multipart field "file". The file is parsed as a stream and
+    saved in batches, rows that match an existing transaction by date, sum and comment are skipped.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JsonResponse object with the number of imported, duplicate and invalid rows and the row errors.
+    :rtype: JsonResponse
+    """
+    account_data = get_object_or_404(Account, account_owner=request.user)
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    statement_format = request.POST.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+    if statement_format not in STATEMENT_FORMATS:
+        return JsonResponse(status=400, data={"error": "Unsupported format"})
+    default_category = request.POST.get('default_category', 'None')
+
+    lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    rows = STATEMENT_FORMATS[statement_format](lines, default_category)
+    try:
+        result = import_transactions(account_data, rows, getattr(settings, 'HB_IMPORT_BATCH_SIZE', 1000))
+    except StatementError as e:
+        # Reports the batches saved before the unreadable part of the file
+        return JsonResponse(status=400, data={"error": str(e), **e.result})
+    return JsonResponse(status=200, data=result)
+
+
+@login_required(login_url='/auth_error')
+@require_http_methods(["POST"])
+@route_database
 def transaction_delete(request: HttpRequest, transaction_id: int) -> JsonResponse:
     """
     Delete a specific transaction record and update account balance
@@ -266,55 +470,86 @@ def transaction_delete(request: HttpRequest, transaction_id: int) -> JsonRespons
     """
     account_data = get_object_or_404(Account, account_owner=request.user)
     transaction = get_object_or_404(Transaction, pk=transaction_id, transaction_account=account_data)
-    if transaction.transaction_type == 1:
-        account_data.account_balance -= transaction.transaction_sum
-    else:
-        account_data.account_balance += transaction.transaction_sum
-    account_data.save()
     transaction_id = transaction.id
-    transaction.delete()
+    with db_transaction.atomic():
+        # Only the request that actually deletes the row changes the balance
+        deleted, _ = Transaction.objects.filter(pk=transaction_id).delete()
+        if deleted:
+            apply_balance_delta(account_data.id,
+                                -balance_delta(transaction.transaction_type, transaction.transaction_sum))
+            add_to_rollup(transaction, sign=-1)
+            add_tombstone(account_data.id, TRANSACTION, transaction_id)
+    if not deleted:
+        raise Http404("No Transaction matches the given query.")
     return JsonResponse(status=200, data={"transaction": transaction_id})
 
 
 # Categories
 @require_http_methods(["GET"])
-def categories(request: HttpRequest) -> JsonResponse:
+def categories(request: HttpRequest) -> HttpResponse:
     """
-    The function returns a list of transaction categories with their types.
+    The function returns a list of transaction categories with their types. The list is served from the in-process
+    category cache and carries an ETag, a request with a matching If-None-Match header gets an empty 304 response.
     :param request: The HTTP request object.
     :type request: HttpRequest
     :return: JsonResponse object with data on transaction categories
-    :rtype: JsonResponse
+    :rtype: HttpResponse
     """
-    category_list = list(TransactionCategory.objects.all().values('category_type', 'category_name'))
-    return JsonResponse(status=200, data={'data': category_list})
+    catalog = get_catalog()
+    etag = f'"{catalog.version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(status=200, data={'data': catalog.rows})
+    response['ETag'] = etag
+    return response
 
 
 # Planning
 @login_required(login_url='/auth_error')
 @require_http_methods(["GET"])
+@route_database
+@conditional_per_account
 def planned_transactions(request: HttpRequest) -> JsonResponse:
     """
-    Returns a list of planned transactions for the current user.
+    Returns a list of planned transactions for the current user. Accepts the fields and format parameters of
+    transaction_latest. With transaction_start_date and transaction_end_date the list holds the planned
+    transactions of that period (at most HB_PLANNED_WINDOW_MAX_DAYS days), recurring ones once per occurrence;
+    without them every planned transaction is listed once, with its recurrence.
     :param request: The HTTP request object.
     :type request: HttpRequest
     :return: A JSON response containing a list of planned transactions.
     :rtype: JsonResponse
     """
     account_data = get_object_or_404(Account, account_owner=request.user)
-    transactions = PlanningTransaction.objects.filter(transaction_account_plan=account_data).order_by(
-        '-transaction_date_plan')
-    transactions = list(
-        transactions.values('id', 'transaction_date_plan', 'transaction_type_plan',
-                            'transaction_category_plan__category_name',
-                            'transaction_sum_plan',
-                            'transaction_comment_plan'))
+    transaction_start_date = request.GET.get("transaction_start_date")
+    transaction_end_date = request.GET.get("transaction_end_date")
+    window = transaction_start_date and transaction_end_date
+    try:
+        projection = projection_params(request, PLANNED_TRANSACTION_FIELDS, 'transaction_category_plan',
+                                       SCHEDULE_FIELDS if window else ())
+        if window:
+            transaction_start_date = datetime.strptime(transaction_start_date, '%Y-%m-%d').date()
+            transaction_end_date = datetime.strptime(transaction_end_date, '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    # Every day of the period can add one row per daily schedule
+    if window and (transaction_end_date - transaction_start_date).days >= getattr(
+            settings, 'HB_PLANNED_WINDOW_MAX_DAYS', 3660):
+        return JsonResponse(status=400, data={"error": "Period too long"})
+    transactions = PlanningTransaction.objects.filter(transaction_account_plan=account_data)
+    if window:
+        transactions = transactions.filter(in_window(transaction_start_date, transaction_end_date))
+        transactions = expand_rows(list(transactions.values(*projection.query_fields)), transaction_start_date,
+                                   transaction_end_date)
+    else:
+        transactions = list(transactions.order_by('-transaction_date_plan').values(*projection.query_fields))
 
-    return JsonResponse(status=200, data={"transactions": transactions})
+    return JsonResponse(status=200, data=projected_data('transactions', transactions, projection))
 
 
 @login_required(login_url='/auth_error')
 @require_http_methods(["POST"])
+@route_database
 def planned_transaction_add(request: HttpRequest) -> JsonResponse:
     """
     Adds a new planned transaction to the specified account.
@@ -328,26 +563,37 @@ def planned_transaction_add(request: HttpRequest) -> JsonResponse:
     try:
         data = json.loads(request.body)
         transaction_type = int(data['transaction_type'])
-        transaction_category = TransactionCategory.objects.get(category_name=str(data['transaction_category']))
+        transaction_category_id = category_id(str(data['transaction_category']))
         transaction_date = datetime.strptime(data['transaction_date'], '%Y-%m-%d')
         transaction_sum = abs(Decimal(data['transaction_sum']))
         transaction_comment = str(data['transaction_comment'])
+        transaction_recurrence = RECURRENCE_NAMES[str(data.get('transaction_recurrence', 'none')).lower()]
+        transaction_recurrence_end = data.get('transaction_recurrence_end')
+        if transaction_recurrence_end:
+            transaction_recurrence_end = datetime.strptime(transaction_recurrence_end, '%Y-%m-%d').date()
+            if transaction_recurrence_end < transaction_date.date():
+                raise ValueError('The recurrence ends before the first occurrence')
     except:
         return JsonResponse(status=400, data={"error": "Bad request"})
 
     transaction = PlanningTransaction(transaction_account_plan=account_data, transaction_type_plan=transaction_type,
-                                      transaction_category_plan=transaction_category,
+                                      transaction_category_plan_id=transaction_category_id,
                                       transaction_date_plan=transaction_date,
                                       transaction_sum_plan=transaction_sum,
-                                      transaction_comment_plan=transaction_comment)
+                                      transaction_comment_plan=transaction_comment,
+                                      transaction_recurrence_plan=transaction_recurrence,
+                                      transaction_recurrence_end_plan=transaction_recurrence_end or None)
 
-    transaction.save()
+    with db_transaction.atomic():
+        # The post_save signal increments the account version
+        transaction.save()
 
     return JsonResponse(status=200, data={"transaction": transaction.id})
 
 
 @login_required(login_url='/auth_error')
 @require_http_methods(["POST"])
+@route_database
 def planned_transaction_delete(request: HttpRequest, transaction_id: int) -> JsonResponse:
     """
     This function deletes a planned transaction for the authenticated user.
@@ -361,12 +607,16 @@ def planned_transaction_delete(request: HttpRequest, transaction_id: int) -> Jso
     account_data = get_object_or_404(Account, account_owner=request.user)
     transaction = get_object_or_404(PlanningTransaction, pk=transaction_id, transaction_account_plan=account_data)
     transaction_id = transaction.id
-    transaction.delete()
+    with db_transaction.atomic():
+        transaction.delete()
+        add_tombstone(account_data.id, PLANNING_TRANSACTION, transaction_id)
     return JsonResponse(status=200, data={"transaction": transaction_id})
 
 
 @login_required(login_url='/auth_error')
 @require_http_methods(["GET"])
+@route_database
+@cache_per_account('planned_transaction_statistic')
 def planned_transaction_statistic(request: HttpRequest) -> JsonResponse:
     """
     Function for statistics on transactions for the selected period. Gives the total amount of income and expenses.
@@ -382,15 +632,116 @@ def planned_transaction_statistic(request: HttpRequest) -> JsonResponse:
     transaction_end_date = request.GET.get("transaction_end_date")
 
     if transaction_start_date and transaction_end_date:
-        transaction_start_date = datetime.strptime(transaction_start_date, '%Y-%m-%d')
-        transaction_end_date = datetime.strptime(transaction_end_date, '%Y-%m-%d')
-        transactions = transactions.filter(transaction_date_plan__range=[transaction_start_date, transaction_end_date])
+        transaction_start_date = datetime.strptime(transaction_start_date, '%Y-%m-%d').date()
+        transaction_end_date = datetime.strptime(transaction_end_date, '%Y-%m-%d').date()
     else:
         return JsonResponse(status=400, data={"error": "Bad request"})
 
-    transaction_inc_sum = transactions.filter(transaction_type_plan=1).aggregate(
-        planned_income=Sum('transaction_sum_plan', output_field=FloatField()))
-    transaction_exp_sum = transactions.filter(transaction_type_plan=0).aggregate(
-        planned_expense=Sum('transaction_sum_plan', output_field=FloatField()))
-    statistic_data = [transaction_inc_sum, transaction_exp_sum]
+    statistic_data = planned_transaction_statistic_data(transactions, transaction_start_date,
+                                                        transaction_end_date)
     return JsonResponse(status=200, data={"statistic_data": statistic_data})
+
+
+@login_required(login_url='/auth_error')
+@require_http_methods(["GET"])
+@route_database
+@cache_per_account('planned_variance')
+def planned_variance(request: HttpRequest) -> JsonResponse:
+    """
+    Compares the planned with the actual income and expense of a period: planned and actual sums and their variance
+    per month (or year, parameter granularity) and type, and per month, category and type.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JsonResponse object with the variance report.
+    :rtype: JsonResponse
+    """
+    account_data = get_object_or_404(Account, account_owner=request.user)
+    granularity = request.GET.get("granularity", "month")
+    try:
+        start = datetime.strptime(request.GET["start"], '%Y-%m-%d').date()
+        end = datetime.strptime(request.GET["end"], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    if start > end or granularity not in GRANULARITIES:
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    try:
+        return JsonResponse(status=200, data=variance_data(account_data, start, end, granularity))
+    except VarianceError as e:
+        return JsonResponse(status=400, data={"error": str(e)})
+
+
+# Forecast
+@login_required(login_url='/auth_error')
+@require_http_methods(["GET"])
+@route_database
+@cache_per_account('forecast')
+def forecast(request: HttpRequest) -> JsonResponse:
+    """
+    Projects the daily balance of the user's account for the next days (parameter days, default 90): the planned
+    transactions and the average amount per weekday of the other categories over the last history days (default
+    HB_FORECAST_HISTORY_DAYS) are added to the current balance.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JsonResponse object with the daily planned, expected and balance lists.
+    :rtype: JsonResponse
+    """
+    account_data = get_object_or_404(Account, account_owner=request.user)
+    try:
+        days, history = forecast_params(request)
+    except ForecastError:
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    return JsonResponse(status=200, data=forecast_data(account_data, days, history))
+
+
+# Sync
+@login_required(login_url='/auth_error')
+@require_http_methods(["GET"])
+def sync(request: HttpRequest) -> JsonResponse:
+    """
+    Returns the transactions and planned transactions added or changed, and the ids of those deleted, since the
+    token of the previous sync (parameter since, all rows without it), at most limit rows of each kind. The client
+    stores next_token and repeats the request while has_more is true. A token older than the tombstone retention
+    gets a 410 response, the client then syncs from scratch. Reads from the primary database, a replica that lags
+    behind could make the token skip changes.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JsonResponse object with the changes, next_token and has_more.
+    :rtype: JsonResponse
+    """
+    account_data = get_object_or_404(Account, account_owner=request.user)
+    try:
+        changes = sync_changes(account_data, request.GET.get("since"), page_limit(request))
+    except CursorError:
+        return JsonResponse(status=400, data={"error": "Bad request"})
+    except SyncTokenExpired:
+        return JsonResponse(status=410, data={"error": "Sync token expired"})
+    return JsonResponse(status=200, data=changes)
+
+
+# Monitoring
+@user_passes_test(lambda user: user.is_staff, login_url='/auth_error')
+@require_http_methods(["GET"])
+def response_cache_stats(request: HttpRequest) -> JsonResponse:
+    """
+    Returns the response cache hit and miss counters of this process for staff users.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JsonResponse object with the counters per endpoint.
+    :rtype: JsonResponse
+    """
+    return JsonResponse(status=200, data={"cache": cache_stats()})
+
+
+@user_passes_test(lambda user: user.is_staff, login_url='/auth_error')
+@require_http_methods(["GET"])
+def request_timings(request: HttpRequest) -> JsonResponse:
+    """
+    Returns the p50, p95 and p99 of the request time, SQL time and query count per route, collected by the
+    instrumentation middleware in this process, for staff users.
+    :param request: The HTTP request object.
+    :type request: HttpRequest
+    :return: JsonResponse object with the histograms per route.
+    :rtype: JsonResponse
+    """
+    return JsonResponse(status=200, data={"enabled": getattr(settings, 'HB_INSTRUMENTATION', False),
+                                          "routes": histograms.summary()})
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hb_api_project.settings")
+# Serve the read-only endpoints with async views, set HB_ASYNC_VIEWS=0 to use the sync views
+os.environ.setdefault("HB_ASYNC_VIEWS", "1")
 
 application = get_asgi_application()
@@ -11,6 +11,9 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 import os
 from pathlib import Path
+
+import django
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv())
@@ -44,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "hb_api_app.middleware.instrumentation_middleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     # "django.middleware.csrf.CsrfViewMiddleware",
@@ -76,10 +80,84 @@ WSGI_APPLICATION = "hb_api_project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
+# HB_DB_PROFILE selects the database: "sqlite" (default) or "postgres"
+HB_DB_PROFILE = os.environ.get("HB_DB_PROFILE", "sqlite")
+# Seconds a connection is kept open for the next request, 0 closes it after every request
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", "60"))
+
+if HB_DB_PROFILE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            # Seconds to wait for a lock held by another connection
+            "OPTIONS": {"timeout": 20},
+            # File backed test database, the concurrency tests share it between threads
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+        }
+    }
+    if django.VERSION >= (5, 1):
+        # Take the write lock when a transaction starts. A deferred transaction that reads first can not wait for
+        # the lock when it later writes and fails with "database is locked" at once.
+        DATABASES["default"]["OPTIONS"]["transaction_mode"] = "IMMEDIATE"
+elif HB_DB_PROFILE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "hb_api"),
+            "USER": os.environ.get("POSTGRES_USER", "postgres"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+    }
+    if os.environ.get("DB_POOL") == "1":
+        # Connection pool of psycopg 3 (needs Django 5.1+ and psycopg-pool), replaces persistent connections
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+            "timeout": 10,
+        }
+else:
+    raise ImproperlyConfigured(f"Unknown HB_DB_PROFILE {HB_DB_PROFILE!r}, use sqlite or postgres")
+
+# Optional read replica for the GET requests of the API views, see hb_api_app/routers.py. SQLITE_REPLICA_PATH is a
+# second SQLite file standing in for a replica, POSTGRES_REPLICA_HOST a PostgreSQL hot standby.
+if HB_DB_PROFILE == "sqlite" and os.environ.get("SQLITE_REPLICA_PATH"):
+    DATABASES["replica"] = {**DATABASES["default"], "NAME": os.environ["SQLITE_REPLICA_PATH"],
+                            "OPTIONS": dict(DATABASES["default"]["OPTIONS"]), "TEST": {"MIRROR": "default"}}
+elif HB_DB_PROFILE == "postgres" and os.environ.get("POSTGRES_REPLICA_HOST"):
+    DATABASES["replica"] = {**DATABASES["default"], "HOST": os.environ["POSTGRES_REPLICA_HOST"],
+                            "OPTIONS": dict(DATABASES["default"]["OPTIONS"]), "TEST": {"MIRROR": "default"}}
+HB_REPLICA_DATABASE = "replica" if "replica" in DATABASES else None
+# Seconds the reads of a user go to the primary after the user wrote, so the user sees the own changes
+HB_REPLICA_STICKY_SECONDS = int(os.environ.get("HB_REPLICA_STICKY_SECONDS", "10"))
+DATABASE_ROUTERS = ["hb_api_app.routers.PrimaryReplicaRouter"]
+
+# PRAGMAs run on every new SQLite connection, see hb_api_app/db.py
+HB_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 20000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+# The cached responses are keyed by the account version read from the database, so a process-local cache serves no
+# stale responses. The replica sticky flags have to be shared by all worker processes, with HB_REPLICA_DATABASE set
+# LocMemCache fails the system checks (hb_api_app/checks.py), use Redis or Memcached then.
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "hb_api"),
     }
 }
 
@@ -130,3 +208,61 @@ CORS_ALLOW_CREDENTIALS = True
 
 SESSION_COOKIE_SAMESITE = 'None'
 SESSION_COOKIE_SECURE = True
+
+# Keyset pagination of transaction_latest and transaction_filter
+HB_PAGE_SIZE = 100
+HB_MAX_PAGE_SIZE = 1000
+
+# Limits of api/transaction/bulk_add
+HB_BULK_ADD_MAX_ITEMS = 10000
+HB_BULK_ADD_BATCH_SIZE = 1000
+
+# Rows per batch of api/transaction/import and the import_statement command
+HB_IMPORT_BATCH_SIZE = 1000
+
+# Rows fetched per round trip by api/transaction/export
+HB_EXPORT_CHUNK_SIZE = 2000
+
+# api/sync: how far a caught-up sync token restarts in the past, and how long the tombstones of deletions are kept
+HB_SYNC_OVERLAP_SECONDS = 5
+HB_SYNC_TOMBSTONE_DAYS = 90
+
+# Most buckets of one api/transaction/timeseries response (10 years of days)
+HB_TIMESERIES_MAX_BUCKETS = 3660
+
+# Most months (or years) of one api/planning/variance response
+HB_VARIANCE_MAX_PERIODS = 240
+
+# Longest period in days of api/planning/planned_transactions, whose recurring transactions are listed per occurrence
+HB_PLANNED_WINDOW_MAX_DAYS = 3660
+
+# api/forecast: longest forecast in days, default and longest days of transaction history of the weekday patterns
+HB_FORECAST_MAX_DAYS = 1830
+HB_FORECAST_HISTORY_DAYS = 365
+HB_FORECAST_MAX_HISTORY_DAYS = 3660
+
+# Seconds before the in-process category cache is reloaded to pick up changes made by other processes
+HB_CATEGORY_CACHE_TIMEOUT = 300
+# Minimum seconds between the reloads caused by unknown category names or ids
+HB_CATEGORY_RELOAD_INTERVAL = 5
+
+# Per-account response cache of the read endpoints
+HB_RESPONSE_CACHE_ALIAS = "default"
+HB_RESPONSE_CACHE_TIMEOUT = 300
+
+# JSON encoder of the API responses: "auto" (orjson when installed), "orjson" or "stdlib"
+HB_JSON_ENCODER = os.environ.get("HB_JSON_ENCODER", "auto")
+
+# Serve the read-only endpoints with the async views of async_views.py, set by asgi.py
+HB_ASYNC_VIEWS = os.environ.get("HB_ASYNC_VIEWS", "") == "1"
+
+# Query count and timing instrumentation (Server-Timing headers, JSON log lines and api/stats/timings)
+HB_INSTRUMENTATION = os.environ.get("HB_INSTRUMENTATION", "") == "1"
+HB_INSTRUMENTATION_SAMPLES = 1000
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"hb_api_app.instrumentation": {"handlers": ["console"], "level": "INFO", "propagate": False}},
+}